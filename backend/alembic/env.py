@@ -0,0 +1,49 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.partitions import is_partition_name
+# Register every model on Base.metadata for autogenerate
+from app.db.models import user, dialysis, food_intake, fhir_outbox, fhir_reconcile, session_counter, vitals_snapshot, daily_rollup, fhir_cache_generation  # noqa: F401
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # Partitions are created at runtime (app/db/partitions.py), not by the models
+    return not (type_ == "table" and is_partition_name(name))
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (alembic upgrade --sql)."""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # The app's engine already carries the Azure SSL / managed identity connect args
+    from app.db.session import engine
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_name=include_name)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,111 @@
+"""Baseline schema
+
+The tables as they existed before migrations were introduced (pd_management.sql
+plus the tables Base.metadata.create_all added since). Each table is only
+created when missing, so databases restored from the dump or built by
+create_all can be upgraded in place.
+
+Revision ID: 11da52eedebc
+Revises:
+Create Date: 2026-10-17 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '11da52eedebc'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table_name):
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("notifications", sa.JSON(), nullable=True),
+            sa.Column("patients", postgresql.ARRAY(sa.Integer()), nullable=True),
+            sa.Column("sex", sa.String(), nullable=False),
+            sa.Column("height", sa.Float(), nullable=False),
+            sa.Column("birth_date", sa.Date(), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if _missing("dialysis_sessions"):
+        op.create_table(
+            "dialysis_sessions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("session_type", sa.String(), nullable=False),
+            sa.Column("session_id", sa.Integer(), nullable=False),
+            sa.Column("weight", sa.Float(), nullable=False),
+            sa.Column("diastolic", sa.Integer(), nullable=False),
+            sa.Column("systolic", sa.Integer(), nullable=False),
+            sa.Column("effluent_volume", sa.Float(), nullable=False),
+            sa.Column("session_date", sa.DateTime(), nullable=False),
+            sa.Column("session_duration", sa.String(), nullable=True),
+            sa.Column("protein", sa.Float(), nullable=False),
+        )
+        op.create_index("ix_dialysis_sessions_id", "dialysis_sessions", ["id"])
+
+    if _missing("food_intake"):
+        op.create_table(
+            "food_intake",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("food_name", sa.String(), nullable=False),
+            sa.Column("protein_grams", sa.Float(), nullable=False),
+            sa.Column("meal_time", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_food_intake_id", "food_intake", ["id"])
+
+    if _missing("fhir_outbox"):
+        op.create_table(
+            "fhir_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("resource_type", sa.String(), nullable=False),
+            sa.Column("resource_id", sa.String(), nullable=False),
+            sa.Column("patient_id", sa.Integer(), nullable=True),
+            sa.Column("operation", sa.String(), nullable=False),
+            sa.Column("payload", sa.JSON(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+            sa.Column("claimed_at", sa.DateTime(), nullable=True),
+            sa.Column("last_error", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("processed_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_fhir_outbox_id", "fhir_outbox", ["id"])
+        op.create_index("ix_fhir_outbox_resource_id", "fhir_outbox", ["resource_id"])
+        op.create_index("ix_fhir_outbox_status", "fhir_outbox", ["status"])
+
+    if _missing("fhir_reconcile_checksums"):
+        op.create_table(
+            "fhir_reconcile_checksums",
+            sa.Column("patient_id", sa.Integer(), primary_key=True),
+            sa.Column("month", sa.Date(), primary_key=True),
+            sa.Column("checksum", sa.String(), nullable=False),
+            sa.Column("verified_at", sa.DateTime(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("fhir_reconcile_checksums")
+    op.drop_table("fhir_outbox")
+    op.drop_table("food_intake")
+    op.drop_table("dialysis_sessions")
+    op.drop_table("users")
@@ -0,0 +1,40 @@
+"""patient_session_counters
+
+Per-patient counter of the last session_id handed out, so new session_ids are
+allocated with an atomic UPDATE ... RETURNING instead of MAX(session_id) + 1
+(see app/db/session_ids.py). Counters are seeded from the highest existing
+session_id of every patient with sessions.
+
+Revision ID: 3e3fc3babf11
+Revises: 82a20986110f
+Create Date: 2026-10-17 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e3fc3babf11'
+down_revision = '82a20986110f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("patient_session_counters"):
+        op.create_table(
+            "patient_session_counters",
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("last_session_id", sa.Integer(), nullable=False),
+        )
+    op.execute("""
+        INSERT INTO patient_session_counters (patient_id, last_session_id)
+        SELECT patient_id, max(session_id) FROM dialysis_sessions GROUP BY patient_id
+        ON CONFLICT (patient_id) DO UPDATE
+        SET last_session_id = greatest(patient_session_counters.last_session_id, excluded.last_session_id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("patient_session_counters")
@@ -0,0 +1,34 @@
+"""vitals snapshot notification stamps
+
+Records which version of a patient's vitals snapshot (its updated_at) the
+flags in users.notifications were computed from, and when. GET
+/analytics/notifications only recomputes and writes the flags when the
+snapshot has changed since.
+
+Revision ID: 5b0e93c7d2a4
+Revises: c41d7e2a9f06
+Create Date: 2026-10-17 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e93c7d2a4'
+down_revision = 'c41d7e2a9f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("patient_vitals_snapshot")}
+    if "notifications_snapshot_at" not in columns:
+        op.add_column("patient_vitals_snapshot", sa.Column("notifications_snapshot_at", sa.DateTime(), nullable=True))
+    if "notifications_computed_at" not in columns:
+        op.add_column("patient_vitals_snapshot", sa.Column("notifications_computed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("patient_vitals_snapshot", "notifications_computed_at")
+    op.drop_column("patient_vitals_snapshot", "notifications_snapshot_at")
@@ -0,0 +1,81 @@
+"""dialysis_sessions unique session_id and session day
+
+Adds session_day, a stored generated column holding session_date's (UTC) day,
+and two unique indexes that POST /dialysis/sessions upserts against with
+INSERT ... ON CONFLICT:
+
+- (patient_id, session_id), which replaces the plain index of the same
+  columns;
+- (patient_id, session_type, session_day): at most one pre and one post
+  session per patient per day. The endpoint used to check this with a
+  separate query.
+
+Existing duplicates would make the unique indexes fail to build, so they are
+reported and the upgrade stops before anything changes. Adding the generated
+column rewrites dialysis_sessions under an exclusive lock.
+
+Revision ID: 82a20986110f
+Revises: b3b8de592025
+Create Date: 2026-10-17 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '82a20986110f'
+down_revision = 'b3b8de592025'
+branch_labels = None
+depends_on = None
+
+DUPLICATE_CHECKS = {
+    "session_id": """
+        SELECT patient_id, session_id, count(*) FROM dialysis_sessions
+        GROUP BY patient_id, session_id HAVING count(*) > 1
+    """,
+    "session type per day": """
+        SELECT patient_id, session_type, session_date::date, count(*) FROM dialysis_sessions
+        GROUP BY patient_id, session_type, session_date::date HAVING count(*) > 1
+    """,
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    problems = []
+    for name, query in DUPLICATE_CHECKS.items():
+        rows = bind.execute(sa.text(query)).fetchall()
+        if rows:
+            problems.append(f"{len(rows)} duplicate {name} group(s), e.g. {[tuple(r) for r in rows[:5]]}")
+    if problems:
+        raise RuntimeError(
+            "dialysis_sessions has duplicates that the new unique indexes would reject; "
+            "merge or delete them and rerun the upgrade: " + "; ".join(problems)
+        )
+
+    op.execute(
+        "ALTER TABLE dialysis_sessions ADD COLUMN IF NOT EXISTS session_day date "
+        "GENERATED ALWAYS AS ((session_date)::date) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_dialysis_sessions_patient_id_session_id "
+            "ON dialysis_sessions (patient_id, session_id)"
+        )
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_dialysis_sessions_patient_id_session_type_session_day "
+            "ON dialysis_sessions (patient_id, session_type, session_day)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_dialysis_sessions_patient_id_session_id")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_dialysis_sessions_patient_id_session_id "
+            "ON dialysis_sessions (patient_id, session_id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_dialysis_sessions_patient_id_session_type_session_day")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_dialysis_sessions_patient_id_session_id")
+    op.drop_column("dialysis_sessions", "session_day")
@@ -0,0 +1,193 @@
+"""partition dialysis_sessions by month
+
+Rebuilds dialysis_sessions as a table partitioned by RANGE (session_date), with
+one partition per month (see app/db/partitions.py):
+
+- the primary key becomes (id, session_date), since Postgres requires the
+  partition key in it;
+- the unique (patient_id, session_id) and (patient_id, session_type,
+  session_day) indexes become unique indexes on each partition;
+- the two session_date indexes are recreated on the partitioned table, which
+  builds them on every partition.
+
+Partitions are created from the month of the oldest session to
+DB_PARTITION_MONTHS_AHEAD months from now, plus a default partition. The rows
+are then copied over and the old table is dropped. The id sequence and foreign
+keys carry over. dialysis_sessions is locked against reads and writes for the
+whole copy, so on a large table run the upgrade in a maintenance window.
+
+A dialysis_sessions that is already partitioned is left as it is. That is
+the table Base.metadata.create_all builds from the current models, together
+with its partitions; such a database already has the whole schema and is
+stamped (alembic stamp head) rather than upgraded through the earlier
+revisions, which expect the unpartitioned table.
+
+Revision ID: 85011707d9d2
+Revises: 3e3fc3babf11
+Create Date: 2026-10-17 22:20:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '85011707d9d2'
+down_revision = '3e3fc3babf11'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, patient_id, session_type, session_id, weight, diastolic, systolic, "
+    "effluent_volume, session_date, session_duration, protein"
+)
+COLUMN_DEFINITIONS = """
+    id               integer          NOT NULL DEFAULT nextval('{sequence}'),
+    patient_id       integer          NOT NULL,
+    session_type     varchar          NOT NULL,
+    session_id       integer          NOT NULL,
+    weight           double precision NOT NULL,
+    diastolic        integer          NOT NULL,
+    systolic         integer          NOT NULL,
+    effluent_volume  double precision NOT NULL,
+    session_date     timestamp        NOT NULL,
+    session_day      date GENERATED ALWAYS AS ((session_date)::date) STORED,
+    session_duration varchar,
+    protein          double precision NOT NULL
+"""
+# DB_PARTITION_MONTHS_AHEAD's default; the API's partition maintainer creates later months
+MONTHS_AHEAD = 3
+# Unique indexes created on each partition, named <partition>_<suffix>
+SESSION_KEYS = (
+    ("session_id_key", "patient_id, session_id"),
+    ("session_day_key", "patient_id, session_type, session_day"),
+)
+
+
+def _is_partitioned(bind):
+    return bind.execute(sa.text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('dialysis_sessions')"
+    )).scalar() or False
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(name, bounds):
+    op.execute(f"CREATE TABLE {name} PARTITION OF dialysis_sessions {bounds}")
+    for suffix, columns in SESSION_KEYS:
+        op.execute(f"CREATE UNIQUE INDEX {name}_{suffix} ON {name} ({columns})")
+
+
+def _create_partitions(bind, first_session):
+    """Monthly partitions from first_session's month to MONTHS_AHEAD months from now, and the default one."""
+    this_month = bind.execute(sa.text("SELECT date_trunc('month', now() AT TIME ZONE 'UTC')::date")).scalar()
+    month = first_session.date().replace(day=1) if first_session else this_month
+    while month <= _add_months(this_month, MONTHS_AHEAD):
+        next_month = _add_months(month, 1)
+        _create_partition(
+            f"dialysis_sessions_p{month:%Y%m}",
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')",
+        )
+        month = next_month
+    _create_partition("dialysis_sessions_default", "DEFAULT")
+
+
+def _set_aside(bind, new_name):
+    """
+    Rename dialysis_sessions to new_name and free its index and constraint
+    names for the replacement table. Returns the id sequence and the foreign
+    key definitions to carry over.
+    """
+    op.execute("LOCK TABLE dialysis_sessions IN ACCESS EXCLUSIVE MODE")
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('dialysis_sessions', 'id')")).scalar()
+    foreign_keys = bind.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = 'dialysis_sessions'::regclass AND contype = 'f'"
+    )).fetchall()
+    op.execute(f"ALTER TABLE dialysis_sessions RENAME TO {new_name}")
+    constraints = bind.execute(sa.text(
+        f"SELECT conname FROM pg_constraint WHERE conrelid = '{new_name}'::regclass AND contype IN ('p', 'u')"
+    )).scalars().all()
+    for name in constraints:
+        op.execute(f"ALTER TABLE {new_name} DROP CONSTRAINT {name}")
+    indexes = bind.execute(sa.text(
+        f"SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = '{new_name}'::regclass"
+    )).scalars().all()
+    for name in indexes:
+        op.execute(f"DROP INDEX {name}")
+    if sequence is None:
+        sequence = "dialysis_sessions_id_seq"
+        op.execute(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+        op.execute(f"SELECT setval('{sequence}', coalesce((SELECT max(id) FROM {new_name}), 0) + 1, false)")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    return sequence, foreign_keys
+
+
+def _take_over(old_name, sequence, foreign_keys):
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE dialysis_sessions ADD CONSTRAINT {name} {definition}")
+    op.execute(f"INSERT INTO dialysis_sessions ({COLUMNS}) SELECT {COLUMNS} FROM {old_name}")
+    op.execute(f"DROP TABLE {old_name}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY dialysis_sessions.id")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if _is_partitioned(bind):
+        # Built by Base.metadata.create_all, partitions included
+        return
+
+    first_session = bind.execute(sa.text("SELECT min(session_date) FROM dialysis_sessions")).scalar()
+    sequence, foreign_keys = _set_aside(bind, "dialysis_sessions_unpartitioned")
+    op.execute(f"""
+        CREATE TABLE dialysis_sessions (
+            {COLUMN_DEFINITIONS.format(sequence=sequence)},
+            PRIMARY KEY (id, session_date)
+        ) PARTITION BY RANGE (session_date)
+    """)
+    _create_partitions(bind, first_session)
+    _take_over("dialysis_sessions_unpartitioned", sequence, foreign_keys)
+    # After the copy, so each partition's index is built in one pass
+    op.execute(
+        "CREATE INDEX ix_dialysis_sessions_patient_id_session_date "
+        "ON dialysis_sessions (patient_id, session_date)"
+    )
+    op.execute(
+        "CREATE INDEX ix_dialysis_sessions_patient_id_session_type_session_date "
+        "ON dialysis_sessions (patient_id, session_type, session_date DESC)"
+    )
+    # Autovacuum analyzes the partitions but never the partitioned table itself
+    op.execute("ANALYZE dialysis_sessions")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    sequence, foreign_keys = _set_aside(bind, "dialysis_sessions_partitioned")
+    op.execute(f"""
+        CREATE TABLE dialysis_sessions (
+            {COLUMN_DEFINITIONS.format(sequence=sequence)},
+            PRIMARY KEY (id)
+        )
+    """)
+    _take_over("dialysis_sessions_partitioned", sequence, foreign_keys)
+    op.execute(
+        "CREATE INDEX ix_dialysis_sessions_patient_id_session_date "
+        "ON dialysis_sessions (patient_id, session_date)"
+    )
+    op.execute(
+        "CREATE INDEX ix_dialysis_sessions_patient_id_session_type_session_date "
+        "ON dialysis_sessions (patient_id, session_type, session_date DESC)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX uq_dialysis_sessions_patient_id_session_id "
+        "ON dialysis_sessions (patient_id, session_id)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX uq_dialysis_sessions_patient_id_session_type_session_day "
+        "ON dialysis_sessions (patient_id, session_type, session_day)"
+    )
@@ -0,0 +1,157 @@
+"""dialysis_daily_rollup
+
+Per patient and day, sums and counts of the sessions' weights, blood
+pressures and effluent volumes, for GET /analytics/daily. Statement-level
+triggers on dialysis_sessions keep it current (see app/db/daily_rollup.py).
+Existing sessions are rolled up. The function and trigger DDL is this
+revision's copy, so later changes to the app code do not alter it.
+
+Revision ID: 9d3f1a6b8e25
+Revises: 5b0e93c7d2a4
+Create Date: 2026-10-18 00:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f1a6b8e25'
+down_revision = '5b0e93c7d2a4'
+branch_labels = None
+depends_on = None
+
+# Columns computed from one patient-day's sessions, shared by the trigger and the backfill
+AGGREGATES_SQL = """
+    count(*) AS sessions,
+    count(*) FILTER (WHERE d.session_type = 'pre') AS pre_sessions,
+    count(*) FILTER (WHERE d.session_type = 'post') AS post_sessions,
+    coalesce(sum(d.weight) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_weight_sum,
+    coalesce(sum(d.systolic) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_systolic_sum,
+    coalesce(sum(d.diastolic) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_diastolic_sum,
+    coalesce(sum(d.weight) FILTER (WHERE d.session_type = 'post'), 0) AS post_weight_sum,
+    coalesce(sum(d.systolic) FILTER (WHERE d.session_type = 'post'), 0) AS post_systolic_sum,
+    coalesce(sum(d.diastolic) FILTER (WHERE d.session_type = 'post'), 0) AS post_diastolic_sum,
+    coalesce(sum(d.effluent_volume) FILTER (WHERE d.session_type = 'post'), 0) AS post_effluent_sum
+"""
+AGGREGATE_COLUMNS = [
+    "sessions", "pre_sessions", "post_sessions",
+    "pre_weight_sum", "pre_systolic_sum", "pre_diastolic_sum",
+    "post_weight_sum", "post_systolic_sum", "post_diastolic_sum", "post_effluent_sum",
+]
+
+REFRESH_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION refresh_dialysis_daily_rollup(patient_ids integer[], days date[]) RETURNS void
+LANGUAGE plpgsql
+-- Planned once per connection; the month's partition is picked when the plan runs
+SET plan_cache_mode = force_generic_plan
+AS $$
+BEGIN
+    -- Users being deleted cascade to their sessions; their rollup rows go with them
+    INSERT INTO dialysis_daily_rollup (patient_id, day)
+    SELECT k.patient_id, k.day FROM unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = k.patient_id)
+    ORDER BY 1, 2
+    ON CONFLICT (patient_id, day) DO NOTHING;
+    PERFORM 1 FROM dialysis_daily_rollup r, unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE r.patient_id = k.patient_id AND r.day = k.day
+    ORDER BY r.patient_id, r.day FOR UPDATE OF r;
+
+    UPDATE dialysis_daily_rollup r
+    SET {", ".join(f"{c} = s.{c}" for c in AGGREGATE_COLUMNS)}
+    FROM unnest(patient_ids, days) AS k(patient_id, day)
+    CROSS JOIN LATERAL (
+        SELECT {AGGREGATES_SQL}
+        FROM dialysis_sessions d
+        WHERE d.patient_id = k.patient_id
+          AND d.session_date >= k.day AND d.session_date < k.day + 1
+    ) s
+    WHERE r.patient_id = k.patient_id AND r.day = k.day;
+
+    -- Days whose last session was deleted
+    DELETE FROM dialysis_daily_rollup r
+    USING unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE r.patient_id = k.patient_id AND r.day = k.day AND r.sessions = 0;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION dialysis_sessions_refresh_daily_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    patient_ids integer[];
+    days date[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT DISTINCT patient_id, session_day FROM new_sessions) t;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT DISTINCT patient_id, session_day FROM old_sessions) t;
+    ELSE
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT patient_id, session_day FROM old_sessions
+              UNION SELECT patient_id, session_day FROM new_sessions) t;
+    END IF;
+    IF patient_ids IS NOT NULL THEN
+        PERFORM refresh_dialysis_daily_rollup(patient_ids, days);
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_insert
+    AFTER INSERT ON dialysis_sessions REFERENCING NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_update
+    AFTER UPDATE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_delete
+    AFTER DELETE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_insert ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_update ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_delete ON dialysis_sessions;
+DROP FUNCTION IF EXISTS dialysis_sessions_refresh_daily_rollup();
+DROP FUNCTION IF EXISTS refresh_dialysis_daily_rollup(integer[], date[]);
+"""
+
+BACKFILL_SQL = f"""
+INSERT INTO dialysis_daily_rollup (patient_id, day, {", ".join(AGGREGATE_COLUMNS)})
+SELECT d.patient_id, d.session_day, {AGGREGATES_SQL}
+FROM dialysis_sessions d
+GROUP BY d.patient_id, d.session_day
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("dialysis_daily_rollup"):
+        op.create_table(
+            "dialysis_daily_rollup",
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("sessions", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("pre_sessions", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("post_sessions", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("pre_weight_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("pre_systolic_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("pre_diastolic_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("post_weight_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("post_systolic_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("post_diastolic_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("post_effluent_sum", sa.Float(), nullable=False, server_default="0"),
+        )
+    op.execute(REFRESH_FUNCTION_SQL)
+    op.execute(TRIGGERS_SQL)
+    op.execute("DELETE FROM dialysis_daily_rollup")
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.execute(DROP_SQL)
+    op.drop_table("dialysis_daily_rollup")
@@ -0,0 +1,78 @@
+"""fhir cache generations; drop fhir_outbox.processed_at
+
+Adds fhir_cache_generations, a per-patient counter that triggers on
+fhir_outbox bump whenever a patient's FHIR writes are queued or pushed, so
+every API process can tell that its cached FHIR results for the patient are
+stale (see app/db/fhir_cache_generations.py).
+
+fhir_outbox.processed_at is dropped: pushed entries are deleted, never
+marked done, so it was never set.
+
+Revision ID: a6c4e0f3b7d1
+Revises: 9d3f1a6b8e25
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c4e0f3b7d1'
+down_revision = '9d3f1a6b8e25'
+branch_labels = None
+depends_on = None
+
+FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION fhir_outbox_bump_cache_generation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO fhir_cache_generations (patient_id, generation)
+        SELECT DISTINCT patient_id, 1 FROM new_entries WHERE patient_id IS NOT NULL ORDER BY 1
+        ON CONFLICT (patient_id) DO UPDATE SET generation = fhir_cache_generations.generation + 1;
+    ELSE
+        INSERT INTO fhir_cache_generations (patient_id, generation)
+        SELECT DISTINCT patient_id, 1 FROM old_entries WHERE patient_id IS NOT NULL ORDER BY 1
+        ON CONFLICT (patient_id) DO UPDATE SET generation = fhir_cache_generations.generation + 1;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER fhir_outbox_cache_generation_insert
+    AFTER INSERT ON fhir_outbox REFERENCING NEW TABLE AS new_entries
+    FOR EACH STATEMENT EXECUTE FUNCTION fhir_outbox_bump_cache_generation();
+CREATE OR REPLACE TRIGGER fhir_outbox_cache_generation_delete
+    AFTER DELETE ON fhir_outbox REFERENCING OLD TABLE AS old_entries
+    FOR EACH STATEMENT EXECUTE FUNCTION fhir_outbox_bump_cache_generation();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS fhir_outbox_cache_generation_insert ON fhir_outbox;
+DROP TRIGGER IF EXISTS fhir_outbox_cache_generation_delete ON fhir_outbox;
+DROP FUNCTION IF EXISTS fhir_outbox_bump_cache_generation();
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("fhir_cache_generations"):
+        op.create_table(
+            "fhir_cache_generations",
+            sa.Column("patient_id", sa.Integer(), primary_key=True),
+            sa.Column("generation", sa.BigInteger(), nullable=False),
+        )
+    op.execute(FUNCTION_SQL)
+    op.execute(TRIGGERS_SQL)
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("fhir_outbox")}
+    if "processed_at" in columns:
+        op.drop_column("fhir_outbox", "processed_at")
+
+
+def downgrade() -> None:
+    op.add_column("fhir_outbox", sa.Column("processed_at", sa.DateTime(), nullable=True))
+    op.execute(DROP_SQL)
+    op.drop_table("fhir_cache_generations")
@@ -0,0 +1,52 @@
+"""dialysis_sessions hot query indexes
+
+- (patient_id, session_type, session_date DESC): latest pre/post session
+  lookups (get_latest_edw, get_user_notifications) and the same-day duplicate
+  check in log_dialysis_session, now written as a session_date range.
+- (patient_id, session_id): session_id lookups on update/delete and the
+  per-patient max(session_id) when a new one is allocated.
+- (patient_id, session_date): GET /dialysis/sessions and
+  get_provider_patients. It is declared on the model but create_all only
+  built it for fresh tables.
+- fhir_outbox (id) WHERE status IN ('pending', 'processing'): the outbox
+  worker's claim scan, which parked failed entries would otherwise slow down.
+
+Built CONCURRENTLY so the tables stay writable during the upgrade.
+scripts/check_query_plans.py checks that the planner uses them.
+
+Revision ID: b3b8de592025
+Revises: 11da52eedebc
+Create Date: 2026-10-17 20:35:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3b8de592025'
+down_revision = '11da52eedebc'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_dialysis_sessions_patient_id_session_type_session_date":
+        "dialysis_sessions (patient_id, session_type, session_date DESC)",
+    "ix_dialysis_sessions_patient_id_session_id":
+        "dialysis_sessions (patient_id, session_id)",
+    "ix_dialysis_sessions_patient_id_session_date":
+        "dialysis_sessions (patient_id, session_date)",
+    "ix_fhir_outbox_active_id":
+        "fhir_outbox (id) WHERE status IN ('pending', 'processing')",
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
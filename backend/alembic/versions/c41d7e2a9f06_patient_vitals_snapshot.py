@@ -0,0 +1,164 @@
+"""patient_vitals_snapshot
+
+One row per patient with their newest pre/post vitals, EDW and 30-day
+averages, for GET /analytics/notifications. Statement-level triggers on
+dialysis_sessions keep it current (see app/db/vitals_snapshot.py). Existing
+patients are backfilled. The function and trigger DDL is this revision's
+copy, so later changes to the app code do not alter it.
+
+Revision ID: c41d7e2a9f06
+Revises: 85011707d9d2
+Create Date: 2026-10-17 23:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e2a9f06'
+down_revision = '85011707d9d2'
+branch_labels = None
+depends_on = None
+
+REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION refresh_patient_vitals_snapshot(patient_ids integer[]) RETURNS void
+LANGUAGE plpgsql
+-- Planned once per connection: a custom plan would be re-planned over every partition on each call
+SET plan_cache_mode = force_generic_plan
+AS $$
+BEGIN
+    -- Users being deleted cascade to their sessions; their snapshot rows go with them
+    INSERT INTO patient_vitals_snapshot (patient_id)
+    SELECT id FROM users WHERE id = ANY (patient_ids) ORDER BY id
+    ON CONFLICT (patient_id) DO NOTHING;
+    PERFORM 1 FROM patient_vitals_snapshot WHERE patient_id = ANY (patient_ids) ORDER BY patient_id FOR UPDATE;
+
+    UPDATE patient_vitals_snapshot s
+    SET latest_session_date = greatest(pre.session_date, post.session_date),
+        pre_session_id = pre.session_id, pre_session_date = pre.session_date, pre_weight = pre.weight,
+        pre_systolic = pre.systolic, pre_diastolic = pre.diastolic,
+        post_session_id = post.session_id, post_session_date = post.session_date, post_weight = post.weight,
+        post_systolic = post.systolic, post_diastolic = post.diastolic,
+        post_effluent_volume = post.effluent_volume, edw = post.weight,
+        sessions_30d = stats.sessions, avg_pre_weight_30d = stats.pre_weight,
+        avg_post_weight_30d = stats.post_weight, avg_systolic_30d = stats.systolic,
+        avg_diastolic_30d = stats.diastolic, avg_effluent_volume_30d = stats.effluent_volume,
+        avg_protein_30d = stats.protein, updated_at = now() AT TIME ZONE 'utc'
+    FROM unnest(patient_ids) AS p(id)
+    LEFT JOIN LATERAL (
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'pre' AND d.session_date >= now() - interval '90 days'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'pre'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        LIMIT 1
+    ) pre ON true
+    LEFT JOIN LATERAL (
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'post' AND d.session_date >= now() - interval '90 days'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'post'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        LIMIT 1
+    ) post ON true
+    LEFT JOIN LATERAL (
+        SELECT count(*) AS sessions,
+               avg(d.weight) FILTER (WHERE d.session_type = 'pre') AS pre_weight,
+               avg(d.weight) FILTER (WHERE d.session_type = 'post') AS post_weight,
+               avg(d.systolic) AS systolic, avg(d.diastolic) AS diastolic,
+               avg(d.effluent_volume) FILTER (WHERE d.session_type = 'post') AS effluent_volume,
+               avg(d.protein) AS protein
+        FROM dialysis_sessions d
+        WHERE d.patient_id = p.id
+          AND d.session_date > greatest(pre.session_date, post.session_date) - interval '30 days'
+          AND d.session_date <= greatest(pre.session_date, post.session_date)
+    ) stats ON true
+    WHERE s.patient_id = p.id;
+
+    -- Patients whose last session was deleted
+    DELETE FROM patient_vitals_snapshot
+    WHERE patient_id = ANY (patient_ids) AND latest_session_date IS NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION dialysis_sessions_refresh_vitals_snapshot() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM new_sessions));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM old_sessions));
+    ELSE
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(
+            SELECT patient_id FROM old_sessions UNION SELECT patient_id FROM new_sessions
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_insert
+    AFTER INSERT ON dialysis_sessions REFERENCING NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_update
+    AFTER UPDATE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_delete
+    AFTER DELETE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_insert ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_update ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_delete ON dialysis_sessions;
+DROP FUNCTION IF EXISTS dialysis_sessions_refresh_vitals_snapshot();
+DROP FUNCTION IF EXISTS refresh_patient_vitals_snapshot(integer[]);
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("patient_vitals_snapshot"):
+        op.create_table(
+            "patient_vitals_snapshot",
+            sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("latest_session_date", sa.DateTime(), nullable=True),
+            sa.Column("pre_session_id", sa.Integer(), nullable=True),
+            sa.Column("pre_session_date", sa.DateTime(), nullable=True),
+            sa.Column("pre_weight", sa.Float(), nullable=True),
+            sa.Column("pre_systolic", sa.Integer(), nullable=True),
+            sa.Column("pre_diastolic", sa.Integer(), nullable=True),
+            sa.Column("post_session_id", sa.Integer(), nullable=True),
+            sa.Column("post_session_date", sa.DateTime(), nullable=True),
+            sa.Column("post_weight", sa.Float(), nullable=True),
+            sa.Column("post_systolic", sa.Integer(), nullable=True),
+            sa.Column("post_diastolic", sa.Integer(), nullable=True),
+            sa.Column("post_effluent_volume", sa.Float(), nullable=True),
+            sa.Column("edw", sa.Float(), nullable=True),
+            sa.Column("sessions_30d", sa.Integer(), nullable=True),
+            sa.Column("avg_pre_weight_30d", sa.Float(), nullable=True),
+            sa.Column("avg_post_weight_30d", sa.Float(), nullable=True),
+            sa.Column("avg_systolic_30d", sa.Float(), nullable=True),
+            sa.Column("avg_diastolic_30d", sa.Float(), nullable=True),
+            sa.Column("avg_effluent_volume_30d", sa.Float(), nullable=True),
+            sa.Column("avg_protein_30d", sa.Float(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+    op.execute(REFRESH_FUNCTION_SQL)
+    op.execute(TRIGGERS_SQL)
+    op.execute(
+        "SELECT refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM dialysis_sessions))"
+    )
+
+
+def downgrade() -> None:
+    op.execute(DROP_SQL)
+    op.drop_table("patient_vitals_snapshot")
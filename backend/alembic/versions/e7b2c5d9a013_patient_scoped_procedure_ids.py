@@ -0,0 +1,114 @@
+"""patient-scoped FHIR Procedure ids
+
+Procedure ids were "KIDNEKT-PROCEDURE-ID-<session_id>", but session_id is
+only unique per patient, so the sessions of different patients overwrote
+each other's Procedure. Ids are now "KIDNEKT-PROCEDURE-ID-<patient_id>-<session_id>".
+
+Queued outbox entries are moved to the new ids. Then every session is queued
+as an upsert under its new id, followed by a delete of each old id, so FHIR
+gets the full data set under the new ids and loses the old ones once the
+outbox worker has drained them.
+
+Downgrading moves queued entries back to the old ids and drops the queued
+deletes of them; Procedures already pushed under the new ids stay on the
+FHIR server.
+
+Revision ID: e7b2c5d9a013
+Revises: a6c4e0f3b7d1
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c5d9a013'
+down_revision = 'a6c4e0f3b7d1'
+branch_labels = None
+depends_on = None
+
+ID_BASE = "KIDNEKT-PROCEDURE-ID-"
+BATCH_SIZE = 5000
+
+outbox = sa.table(
+    "fhir_outbox",
+    sa.column("resource_type", sa.String),
+    sa.column("resource_id", sa.String),
+    sa.column("patient_id", sa.Integer),
+    sa.column("operation", sa.String),
+    sa.column("payload", sa.JSON),
+    sa.column("status", sa.String),
+    sa.column("attempts", sa.Integer),
+    sa.column("next_attempt_at", sa.DateTime),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def _duration_minutes(session_duration):
+    # As the outbox converts the UI's duration timestamp when it queues a session
+    try:
+        duration = datetime.strptime(session_duration, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except (TypeError, ValueError):
+        return None
+    return (duration.hour - datetime.now().hour) * 60 + duration.minute
+
+
+def _entry(resource_id, patient_id, operation, payload, now):
+    return {
+        "resource_type": "Procedure", "resource_id": resource_id, "patient_id": patient_id,
+        "operation": operation, "payload": payload, "status": "pending", "attempts": 0,
+        "next_attempt_at": now, "created_at": now,
+    }
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "UPDATE fhir_outbox SET resource_id = :base || patient_id || '-' || (payload->>'session_id') "
+        "WHERE resource_type = 'Procedure' AND patient_id IS NOT NULL AND payload->>'session_id' IS NOT NULL"
+    ), {"base": ID_BASE})
+
+    now = datetime.utcnow()
+    rows = conn.execute(sa.text(
+        "SELECT patient_id, session_id, session_date, session_type, weight, diastolic, systolic, "
+        "effluent_volume, session_duration, protein FROM dialysis_sessions ORDER BY patient_id, session_id"
+    ).execution_options(stream_results=True, yield_per=BATCH_SIZE))
+    old_ids = set()
+    for batch in rows.partitions():
+        entries = []
+        for row in batch:
+            payload = {
+                "session_id": row.session_id,
+                "patient_id": row.patient_id,
+                "date": row.session_date.date().isoformat(),
+                "session_type": row.session_type,
+                "weight": row.weight,
+                "diastolic": row.diastolic,
+                "systolic": row.systolic,
+                "effluent_volume": row.effluent_volume,
+                "duration": _duration_minutes(row.session_duration),
+                "protein": row.protein,
+            }
+            entries.append(_entry(f"{ID_BASE}{row.patient_id}-{row.session_id}", row.patient_id, "upsert", payload, now))
+            old_ids.add(row.session_id)
+        op.bulk_insert(outbox, entries)
+
+    deletes = [_entry(f"{ID_BASE}{session_id}", None, "delete", {"session_id": session_id}, now)
+               for session_id in sorted(old_ids)]
+    for start in range(0, len(deletes), BATCH_SIZE):
+        op.bulk_insert(outbox, deletes[start:start + BATCH_SIZE])
+
+
+def downgrade():
+    conn = op.get_bind()
+    # The old ids are live again; drop the deletes of them the upgrade queued (the only entries without a patient)
+    conn.execute(sa.text(
+        "DELETE FROM fhir_outbox WHERE resource_type = 'Procedure' AND operation = 'delete' AND patient_id IS NULL"
+    ))
+    conn.execute(sa.text(
+        "UPDATE fhir_outbox SET resource_id = :base || (payload->>'session_id') "
+        "WHERE resource_type = 'Procedure' AND patient_id IS NOT NULL AND payload->>'session_id' IS NOT NULL"
+    ), {"base": ID_BASE})
@@ -2,12 +2,18 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from typing import Optional, Dict, Tuple, List
+from typing import Optional, Dict, List
 
 from app.db.session import get_db
-from app.db.models.dialysis import DialysisSession
+from app.db.routing import get_read_db
+from app.db.dialysis_reads import has_sessions_between
+from app.db.daily_rollup import daily_averages
+from app.db.vitals_snapshot import patient_vitals_snapshot
 from app.db.models.user import User
+from app.db.models.vitals_snapshot import PatientVitalsSnapshot
+from app.db.notification_refresh import notifications_are_current, store_notifications
 from app.core.security import get_current_user
+from app.core.notifications import default_notifications, evaluate_notifications, evaluate_notifications_batch
 from app.db.schemas.analytics import DialysisAnalyticsResponse
 
 logger = logging.getLogger(__name__)
@@ -15,200 +21,16 @@ logger = logging.getLogger(__name__)
 #  Fix Prefix to Avoid Route Conflicts
 router = APIRouter(prefix="/analytics", tags=["Dialysis Analytics"])
 
-# Blood Pressure Reference Data - Based on 90th and 50th percentiles by age, gender, and height
-# This is a simplified version. In a real application, this would be more comprehensive
-# Reference: https://kidneyfoundation.cachefly.net/professionals/KDOQI/guidelines_bp/guide_13.htm
-# This simplified implementation includes 3 height percentiles (5th, 50th, 95th) for accurate BP assessment
-# Height percentile definitions: "short" (5th), "medium" (50th), "tall" (95th)
-BP_REFERENCE = {
-    "male": {
-        # Age ranges with height percentiles: (high_systolic, high_diastolic, low_systolic, low_diastolic)
-        # High is 90th percentile, Low is 50th percentile
-        "1-3": {
-            "short": {"90th": (106, 70), "50th": (91, 52)},
-            "medium": {"90th": (110, 74), "50th": (95, 55)},
-            "tall": {"90th": (114, 76), "50th": (99, 57)}
-        },
-        "4-6": {
-            "short": {"90th": (110, 74), "50th": (97, 57)},
-            "medium": {"90th": (114, 76), "50th": (100, 60)},
-            "tall": {"90th": (118, 78), "50th": (104, 63)}
-        },
-        "7-10": {
-            "short": {"90th": (114, 76), "50th": (102, 62)},
-            "medium": {"90th": (118, 78), "50th": (105, 65)},
-            "tall": {"90th": (122, 80), "50th": (109, 68)}
-        },
-        "11-14": {
-            "short": {"90th": (118, 78), "50th": (107, 63)},
-            "medium": {"90th": (122, 80), "50th": (110, 65)},
-            "tall": {"90th": (126, 82), "50th": (114, 67)}
-        },
-        "15-17": {
-            "short": {"90th": (126, 80), "50th": (113, 68)},
-            "medium": {"90th": (130, 82), "50th": (115, 70)},
-            "tall": {"90th": (134, 84), "50th": (119, 72)}
-        }
-    },
-    "female": {
-        "1-3": {
-            "short": {"90th": (104, 70), "50th": (91, 52)},
-            "medium": {"90th": (108, 72), "50th": (95, 55)},
-            "tall": {"90th": (112, 74), "50th": (99, 57)}
-        },
-        "4-6": {
-            "short": {"90th": (108, 72), "50th": (97, 57)},
-            "medium": {"90th": (112, 74), "50th": (100, 60)},
-            "tall": {"90th": (116, 76), "50th": (104, 63)}
-        },
-        "7-10": {
-            "short": {"90th": (112, 74), "50th": (102, 62)},
-            "medium": {"90th": (116, 76), "50th": (105, 65)},
-            "tall": {"90th": (120, 78), "50th": (109, 68)}
-        },
-        "11-14": {
-            "short": {"90th": (116, 76), "50th": (107, 63)},
-            "medium": {"90th": (120, 78), "50th": (110, 65)},
-            "tall": {"90th": (124, 80), "50th": (113, 67)}
-        },
-        "15-17": {
-            "short": {"90th": (120, 78), "50th": (112, 68)},
-            "medium": {"90th": (124, 80), "50th": (115, 70)},
-            "tall": {"90th": (128, 82), "50th": (118, 72)}
-        }
-    }
-}
-
-# Standard height ranges (cm) by age and gender for percentile calculation
-# Values represent 5th, 50th, and 95th percentiles
-# Reference: CDC Growth Charts, 2000
-# Source: https://www.cdc.gov/growthcharts/cdc-data-files.htm
-# Data from: Stature-for-age charts, 2 to 20 years, LMS parameters and
-# selected smoothed stature percentiles in centimeters, by sex and age
-HEIGHT_REFERENCE = {
-    "male": {
-        "1-3": [80.0, 91.9, 103.4],  # 5th, 50th, 95th percentiles
-        "4-6": [99.9, 112.2, 124.4],
-        "7-10": [119.2, 133.3, 147.4],
-        "11-14": [142.2, 160.7, 179.0],
-        "15-17": [163.3, 176.2, 188.7]
-    },
-    "female": {
-        "1-3": [78.9, 90.7, 102.0],
-        "4-6": [99.1, 110.9, 123.1],
-        "7-10": [118.2, 132.4, 146.2],
-        "11-14": [142.4, 158.0, 172.3],
-        "15-17": [154.2, 163.7, 173.6]
-    }
-}
-
-
-def determine_height_percentile(height: float, age: int, gender: str) -> str:
-    """Determine height percentile category (short, medium, tall) based on height, age, and gender"""
-    gender = gender.lower()
-
-    # Determine age range
-    if 1 <= age <= 3:
-        age_range = "1-3"
-    elif 4 <= age <= 6:
-        age_range = "4-6"
-    elif 7 <= age <= 10:
-        age_range = "7-10"
-    elif 11 <= age <= 14:
-        age_range = "11-14"
-    elif age >= 15:
-        age_range = "15-17"
-    else:
-        # For children under 1 year, use the 1-3 range as default
-        age_range = "1-3"
-
-    # Get reference heights for this age/gender
-    percentiles = HEIGHT_REFERENCE[gender][age_range]
-
-    # Determine percentile category
-    if height < percentiles[0]:
-        return "short"  # Below 5th percentile
-    elif height < percentiles[1]:
-        return "short"  # Between 5th and 50th, closer to 5th
-    elif height < percentiles[2]:
-        return "medium"  # Between 50th and 95th, closer to 50th
-    else:
-        return "tall"  # Above 95th percentile
-
-
-def get_bp_reference_values(age: int, gender: str, height: float) -> Dict[str, Tuple[int, int]]:
-    """Get blood pressure reference values based on age, gender, and height"""
-    gender = gender.lower()
-
-    # Determine age range
-    if 1 <= age <= 3:
-        age_range = "1-3"
-    elif 4 <= age <= 6:
-        age_range = "4-6"
-    elif 7 <= age <= 10:
-        age_range = "7-10"
-    elif 11 <= age <= 14:
-        age_range = "11-14"
-    elif age >= 15:
-        age_range = "15-17"
-    else:
-        # For children under 1 year, use the 1-3 range as default
-        age_range = "1-3"
-
-    # Determine height percentile
-    height_category = determine_height_percentile(height, age, gender)
-
-    return BP_REFERENCE[gender][age_range][height_category]
-
-
-def analyze_blood_pressure(pre_systolic, pre_diastolic, post_systolic, post_diastolic, age, gender, height) -> Dict[
-    str, bool]:
-    bp_ref = get_bp_reference_values(age, gender, height)
-    high_systolic, high_diastolic = bp_ref["90th"]
-    low_systolic, low_diastolic = bp_ref["50th"]
-
-    return {
-        "highBloodPressure": any([
-            pre_systolic > high_systolic,
-            pre_diastolic > high_diastolic,
-            post_systolic > high_systolic,
-            post_diastolic > high_diastolic
-        ]),
-        "lowBloodPressure": any([
-            pre_systolic < low_systolic,
-            pre_diastolic < low_diastolic,
-            post_systolic < low_systolic,
-            post_diastolic < low_diastolic
-        ])
-    }
-
-
-def analyze_weight(pre_weight: float, post_weight: float, edw: float, uf_volume: float) -> Dict[str, bool]:
-    pre_edw_diff_percent = abs((pre_weight - edw) / edw) * 100
-    post_edw_diff_percent = abs((post_weight - edw) / edw) * 100
-    pre_post_diff_percent = ((post_weight - pre_weight) / pre_weight) * 100
-
-    return {
-        "fluidOverloadHigh": pre_edw_diff_percent > 3 or pre_post_diff_percent >= 1,
-        "fluidOverloadWatch": post_weight < edw and abs(post_edw_diff_percent) > 2,
-        "dialysisGrowthAdjustment": pre_edw_diff_percent > 3
-    }
-
 
 def get_latest_edw(patient_id: int, db: Session) -> float:
     """
     Get the patient's latest Estimated Dry Weight (EDW) from their records.
-    First tries to use last recorded post-dialysis weight as proxy for EDW.
-    If that's not available, uses the weight from patient's chart as fallback.
+    The last recorded post-dialysis weight is used as proxy for EDW; it is kept
+    in the patient's vitals snapshot.
     """
-    # Try to get the latest post-dialysis session weight
     # Return a default weight if no data is available
-    latest_session = db.query(DialysisSession).filter(
-        DialysisSession.patient_id == patient_id,
-        DialysisSession.session_type == 'post'
-    ).order_by(DialysisSession.session_date.desc()) \
-        .first()
-    return latest_session.weight if latest_session else 0.0
+    snapshot = patient_vitals_snapshot(db, patient_id)
+    return snapshot.edw if snapshot and snapshot.edw is not None else 0.0
 
 
 # todo: future work could include analyzing uf volume based on patient weight and session time and set alerts if it is, min expected volume or above max expected volume
@@ -219,10 +41,16 @@ def get_user_notifications(
         user_id: Optional[int] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
+        read_db: Session = Depends(get_read_db),
         db: Session = Depends(get_db),
         user: User = Depends(get_current_user)
 ) -> Dict:
-    """Retrieve notifications for the logged-in user or a specific user if the role is provider."""
+    """
+    Retrieve notifications for the logged-in user or a specific user if the role is provider.
+    The analysis reads from a replica when one is available. Stored flags are
+    returned as they are while they match the vitals snapshot; otherwise they are
+    recomputed and written to the primary.
+    """
     try:
         if user.role == "patient":
             target_user_id = user.id
@@ -234,70 +62,25 @@ def get_user_notifications(
             raise HTTPException(status_code=403, detail="Access denied")
 
         # Get the target user
-        target_user = db.query(User).filter(User.id == target_user_id).first()
+        target_user = read_db.query(User).filter(User.id == target_user_id).first()
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Initialize notification flags
-        notifications = {
-            "protein": False,
-            "effluentVolume": False,
-            "lowBloodPressure": False,
-            "fluidOverloadHigh": False,
-            "highBloodPressure": False,
-            "fluidOverloadWatch": False,
-            "dialysisGrowthAdjustment": False
-        }
-
-        # Get dialysis sessions
-        query = db.query(DialysisSession).filter(DialysisSession.patient_id == target_user_id)
-        if start_date:
-            query = query.filter(DialysisSession.session_date >= start_date)
-        if end_date:
-            query = query.filter(DialysisSession.session_date <= end_date)
-        sessions = query.order_by(DialysisSession.session_date.desc()).all()
-
-        if sessions:
-            latest_edw = get_latest_edw(target_user_id, db)
-            latest_session = sessions[0]  # Most recent session
-            latest_pre_session = db.query(DialysisSession).filter(
-                DialysisSession.patient_id == target_user_id,
-                DialysisSession.session_type == 'pre'
-            ).order_by(DialysisSession.session_date.desc()) \
-                .first()
-
-            latest_post_session = db.query(DialysisSession).filter(
-                DialysisSession.patient_id == target_user_id,
-                DialysisSession.session_type == 'post'
-            ).order_by(DialysisSession.session_date.desc()) \
-                .first()
-            # get bday
-            birth_date = target_user.birth_date
-            today = date.today()
-            age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-            # Blood pressure analysis
-            notifications.update(analyze_blood_pressure(
-                latest_pre_session.systolic,
-                latest_pre_session.diastolic,
-                latest_post_session.systolic,
-                latest_post_session.diastolic,
-                age,
-                target_user.sex,
-                target_user.height
-            ))
+        # Newest pre/post vitals and EDW, kept current by triggers on dialysis_sessions
+        snapshot = patient_vitals_snapshot(read_db, target_user_id)
+        if snapshot is None:
+            return default_notifications()
+        if (start_date or end_date) and not has_sessions_between(read_db, target_user_id, start_date, end_date):
+            return default_notifications()
 
-            # Weight analysis
-            weight_notifications = analyze_weight(
-                latest_pre_session.weight,
-                latest_post_session.weight,
-                latest_edw,
-                latest_post_session.effluent_volume
-            )
-            notifications.update(weight_notifications)
+        # Flags are computed after session writes (app/db/notification_refresh.py);
+        # only recompute here if they are older than the snapshot or from another day
+        if notifications_are_current(snapshot):
+            return {**default_notifications(), **(target_user.notifications or {})}
 
-            target_user.notifications = notifications
+        notifications = evaluate_notifications(target_user, snapshot)
+        if store_notifications(db, target_user_id, notifications, snapshot.updated_at):
             db.commit()
-
         return notifications
 
     except Exception as e:
@@ -305,6 +88,63 @@ def get_user_notifications(
         raise HTTPException(status_code=500, detail="Failed to retrieve notifications")
 
 
+@router.get("/provider/notifications")
+def get_provider_notifications(
+        read_db: Session = Depends(get_read_db),
+        user: User = Depends(get_current_user)
+) -> List[Dict]:
+    """
+    Notification flags for every patient assigned to the logged-in provider,
+    computed together from the patients' vitals snapshots. Nothing is stored.
+    """
+    if user.role != "provider":
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not user.patients:
+        return []
+
+    patients = read_db.query(User).filter(User.id.in_(user.patients)).order_by(User.id).all()
+    snapshots = {
+        snapshot.patient_id: snapshot
+        for snapshot in read_db.query(PatientVitalsSnapshot).filter(PatientVitalsSnapshot.patient_id.in_(user.patients))
+    }
+    notifications = evaluate_notifications_batch(patients, snapshots)
+    return [{"patient_id": patient.id, "notifications": notifications[patient.id]} for patient in patients]
+
+
+@router.get("/daily", response_model=List[DialysisAnalyticsResponse])
+def get_daily_analytics(
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        read_db: Session = Depends(get_read_db),
+        user: User = Depends(get_current_user)
+) -> List[DialysisAnalyticsResponse]:
+    """
+    Daily averages of the logged-in patient's sessions, or for a provider of one
+    assigned patient (user_id) or of all of them together, between start_date
+    and end_date (whole days, inclusive). One row per day with sessions.
+    """
+    if user.role == "patient":
+        patient_ids = [user.id]
+    elif user.role == "provider":
+        assigned = user.patients or []
+        if user_id is not None and user_id not in assigned:
+            raise HTTPException(status_code=403, detail="Access denied")
+        patient_ids = [user_id] if user_id is not None else assigned
+    else:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not patient_ids:
+        return []
+
+    rows = daily_averages(
+        read_db,
+        patient_ids,
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None,
+    )
+    return [DialysisAnalyticsResponse.model_validate(row) for row in rows]
+
+
 @router.put("/notifications")
 def update_user_notifications(
         notifications: Dict,
@@ -330,6 +170,10 @@ def update_user_notifications(
 
         # Update the notifications field
         target_user.notifications = notifications
+        # Dismissals last until the next GET, as before the flags were stored:
+        # marking the stored flags stale makes that GET recompute them
+        db.query(PatientVitalsSnapshot).filter(PatientVitalsSnapshot.patient_id == target_user_id).update(
+            {PatientVitalsSnapshot.notifications_snapshot_at: None}, synchronize_session=False)
         db.commit()
         return {"message": "Notifications updated successfully"}
 
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta, timezone
 
 from jose import jwt, JWTError
 
-from app.db.fhir_integration import fhir_create_patient_resource
+from app.db.fhir_integration import sync_fhir_create_patient_resource
 from app.db.schemas.user import UserCreate, UserResponse
 from app.db.models.user import User
 from app.core.security import create_access_token, verify_password, hash_password, create_refresh_token
@@ -69,15 +69,16 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to save user to database")
 
     # 3) Try to create the FHIR resource
+    # This handler runs in the threadpool, so use the pooled sync client rather
+    # than spinning up an event loop that cannot share the async pool.
     try:
-        import asyncio
-        asyncio.run(fhir_create_patient_resource(
+        sync_fhir_create_patient_resource(
             patient_id=db_user.id,
             name=db_user.name,
             birth_date=user.birth_date,
             gender=db_user.sex,
             height=db_user.height
-        ))
+        )
     except Exception as fhir_err:
         logger.error(f"User saved in DB, but FHIR creation failed: {fhir_err}")
         raise HTTPException(
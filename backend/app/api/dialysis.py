@@ -1,25 +1,39 @@
 import logging
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy import or_, func
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from types import SimpleNamespace
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_, exists, false, literal, select, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
 from typing import List, Optional, Set
 from datetime import datetime
 
-from app.db.fhir_integration import (
-    fhir_create_dialysis_session_resource,
-    fhir_search_dialysis_sessions, fhir_delete_dialysis_session_resource,
+from app.db.fhir_cache import cached_fhir_search_dialysis_sessions, fhir_session_cache
+from app.db.fhir_integration import fhir_iter_dialysis_session_pages
+from app.db.dialysis_reads import dialysis_session_as_dict, dialysis_sessions_statement, query_dialysis_sessions
+from app.db.session_read_compare import has_pending_fhir_writes, session_read_comparator
+from app.db.fhir_outbox import (
+    enqueue_dialysis_session_upsert, enqueue_dialysis_session_delete, fhir_outbox_worker,
 )
-from app.db.session import get_db
+from app.db.notification_refresh import notification_refresher
+from app.db.session import get_async_db
+from app.db.routing import db_router, get_async_read_db, issue_read_token_async, read_token_from
+from app.db.session_ids import allocate_session_ids_cte, advance_session_counter_statement, advance_session_counter
+from app.db.partitions import SESSION_DAY_KEY
 from app.db.models.dialysis import DialysisSession
 from app.db.models.user import User
 from app.db.schemas.dialysis import DialysisSessionCreate, DialysisSessionResponse
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.helpers.date_time import normalize_to_utc_day_bounds
+from app.helpers.date_time import normalize_to_utc_day_bounds, calendar_day_range, to_naive_utc
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dialysis", tags=["Dialysis"])
+DATA_SOURCE_HEADER = "X-Data-Source"
+# Rows fetched per round trip when stream=true is served from Postgres
+POSTGRES_STREAM_BATCH = 500
 active_connections: Set[WebSocket] = set()
 
 @router.websocket("/ws")
@@ -45,147 +59,172 @@ async def notify_clients(data: dict):
     for conn in disconnected:
         active_connections.remove(conn)
 
+_UPSERT_FIELDS = (
+    "session_type", "weight", "diastolic", "systolic",
+    "effluent_volume", "session_date", "session_duration", "protein",
+)
+
+def _stored_value(session_data: DialysisSessionCreate, field: str):
+    # session_date is a naive UTC timestamp column, which asyncpg won't bind an aware datetime to
+    value = getattr(session_data, field)
+    return to_naive_utc(value) if field == "session_date" else value
+
+def _violates(error: IntegrityError, key: str) -> bool:
+    # Unique indexes are per partition, named <partition>_<key>
+    return key in str(error.orig)
+
+def _upsert_session_statement(session_data: DialysisSessionCreate):
+    """
+    One statement that checks the patient and inserts or updates the session.
+    Without a session_id, one is allocated from the patient's counter and
+    the row is inserted unless that day already has a session of this type.
+    With one, the patient's session of that id is updated, or inserted if
+    it doesn't exist.
+
+    The statement yields no row for an unknown patient and a row of NULLs
+    when a unique conflict skipped the insert; that is the same-day duplicate
+    check unless the counter is behind (see _same_day_session_statement).
+    Otherwise it yields the stored session plus an `inserted` flag.
+    """
+    table = DialysisSession.__table__
+    patient = select(User.id).where(User.id == session_data.patient_id, User.role == "patient").cte("patient")
+    values = [literal(_stored_value(session_data, f), table.c[f].type) for f in _UPSERT_FIELDS]
+    if session_data.session_id is None:
+        allocated = allocate_session_ids_cte(patient)
+        stmt = pg_insert(table).from_select(
+            ["patient_id", "session_id", *_UPSERT_FIELDS],
+            select(patient.c.id, select(allocated.c.last_session_id).scalar_subquery(), *values),
+        )
+        # No conflict target: the per-day key is a per-partition index, which
+        # only the untargeted form can use as its arbiter.
+        upserted = stmt.on_conflict_do_nothing().returning(*table.c, true().label("inserted")).cte("upserted")
+    else:
+        # session_id isn't unique across partitions, so this is an UPDATE or
+        # else INSERT rather than ON CONFLICT. An UPDATE that changes the
+        # month moves the row to that month's partition.
+        updated = (
+            update(table)
+            .where(table.c.patient_id.in_(select(patient.c.id)), table.c.session_id == session_data.session_id)
+            .values({f: v for f, v in zip(_UPSERT_FIELDS, values)})
+            .returning(*table.c, false().label("inserted"))
+            .cte("updated")
+        )
+        created = (
+            pg_insert(table)
+            .from_select(
+                ["patient_id", "session_id", *_UPSERT_FIELDS],
+                select(patient.c.id, literal(session_data.session_id), *values)
+                .where(~exists(select(updated.c.id))),
+            )
+            .returning(*table.c, true().label("inserted"))
+            .cte("created")
+        )
+        upserted = union_all(select(updated), select(created)).cte("upserted")
+    return select(patient.c.id.label("found_patient"), upserted).select_from(
+        patient.outerjoin(upserted, true())
+    )
+
+def _same_day_session_statement(session_data: DialysisSessionCreate):
+    """Whether the patient already has a session of this type on the session's UTC day (the per-day key)."""
+    return select(exists().where(
+        DialysisSession.patient_id == session_data.patient_id,
+        DialysisSession.session_type == session_data.session_type,
+        DialysisSession.session_day == _stored_value(session_data, "session_date").date(),
+    ))
+
+def _claim_session_id_statement(session_data: DialysisSessionCreate):
+    """
+    Advance the patient's counter past a caller-chosen session_id. Its row
+    lock makes concurrent writers of the same session_id run one after the
+    other, so the second one updates the row the first one inserted.
+    """
+    patient = select(User.id).where(User.id == session_data.patient_id, User.role == "patient").cte("patient")
+    return advance_session_counter_statement(patient.c.id, literal(session_data.session_id))
+
 @router.post("/sessions", response_model=DialysisSessionResponse)
 async def log_dialysis_session(
     session_data: DialysisSessionCreate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    """Log or update a dialysis session and mirror it to FHIR."""
-    patient = (
-        db.query(User)
-        .filter(User.id == session_data.patient_id, User.role == "patient")
-        .first()
-    )
-    if not patient:
-        logger.error(f"Patient {session_data.patient_id} does not exist")
-        raise HTTPException(400, "Invalid patient ID")
-    # Update existing by session_id
-    if session_data.session_id is not None:
-        existing = (
-            db.query(DialysisSession)
-            .filter(
-                DialysisSession.session_id == session_data.session_id,
-                DialysisSession.patient_id == session_data.patient_id,
-            )
-            .first()
-        )
-        if existing:
-            for field in (
-                "session_type","weight","diastolic","systolic",
-                "effluent_volume","session_date","session_duration","protein",
-            ):
-                setattr(existing, field, getattr(session_data, field))
-            try:
-                db.commit(); db.refresh(existing)
-                logger.info(f"DB: updated session {existing.session_id}")
-            except Exception as db_err:
-                db.rollback(); logger.error(f"DB error: {db_err}")
-                raise HTTPException(500, "Failed to update session")
-
-            logger.info(f"FHIR: about to update session with date {existing.session_date.date()}")
-            try:
-                duration = datetime.strptime(existing.session_duration, '%Y-%m-%dT%H:%M:%S.%fZ')
-                hrs, mins = duration.hour, duration.minute
-                hrs -= datetime.now().hour
-                true_duration = hrs * 60 + mins
-                await fhir_create_dialysis_session_resource(
-                    session_id=existing.session_id,
-                    patient_id=existing.patient_id,
-                    date=existing.session_date.date(),
-                    session_type=existing.session_type,
-                    weight=existing.weight,
-                    diastolic=existing.diastolic,
-                    systolic=existing.systolic,
-                    effluent_volume=existing.effluent_volume,
-                    duration=true_duration,
-                    protein=existing.protein,
-                )
-                logger.info(f"FHIR: updated session {existing.session_id}")
-            except Exception as fhir_err:
-                logger.error(f"FHIR error: {fhir_err}")
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail="Session updated locally but failed to update FHIR",
-                )
-            await notify_clients({"message": "Session updated", "session": existing})
-            return existing
-    # Duplicate same-day check
-    dup = (
-        db.query(DialysisSession)
-        .filter(
-            DialysisSession.patient_id == session_data.patient_id,
-            DialysisSession.session_type == session_data.session_type,
-            func.date(DialysisSession.session_date) == session_data.session_date.date(),
-        )
-        .first()
-    )
-    if dup:
-        logger.warning("Duplicate session")
-        raise HTTPException(400, f"{session_data.session_type.capitalize()} session already logged today")
-    # Auto-generate session_id
-    if session_data.session_id is None:
-        last = (
-            db.query(DialysisSession)
-            .filter(DialysisSession.patient_id == session_data.patient_id)
-            .order_by(DialysisSession.session_id.desc())
-            .first()
-        )
-        session_data.session_id = (last.session_id + 1) if last else 1
-    # Insert new
+    """Log or update a dialysis session and queue its FHIR mirror write."""
+    duplicate = HTTPException(400, f"{session_data.session_type.capitalize()} session already logged today")
     try:
-        new_sess = DialysisSession(**session_data.dict())
-        db.add(new_sess); db.commit(); db.refresh(new_sess)
-        logger.info(f"DB: created session {new_sess.session_id}")
+        if session_data.session_id is not None:
+            await db.execute(_claim_session_id_statement(session_data))
+        row = (await db.execute(_upsert_session_statement(session_data))).mappings().first()
     except IntegrityError as ie:
-        db.rollback(); logger.error(f"Integrity error: {ie}")
+        await db.rollback()
+        if _violates(ie, SESSION_DAY_KEY):
+            logger.warning("Duplicate session")
+            raise duplicate
+        logger.error(f"Integrity error: {ie}")
         raise HTTPException(400, "Integrity error: possible duplicate")
     except Exception as db_err:
-        db.rollback(); logger.error(f"DB error: {db_err}")
+        await db.rollback(); logger.error(f"DB error: {db_err}")
         raise HTTPException(500, "Failed to log dialysis session")
-    # logger.info(f"FHIR: about to create session with date {new_sess.session_date.date().strftime('%Y-%m-%d'), type(new_sess.session_date.date().strftime('%Y-%m-%d'))}")
-    # logger.info(f"{new_sess.session_id} {new_sess.patient_id} {new_sess.session_date.date()} {new_sess.session_type} "
-    #             f"{new_sess.weight} {new_sess.diastolic} {new_sess.systolic} {new_sess.effluent_volume} "
-    #             f"{datetime.strptime(new_sess.session_duration, '%Y-%m-%dT%H:%M:%S.%fZ').minute} "
-    #             f"{new_sess.protein}")
-    try:
-        duration = datetime.strptime(new_sess.session_duration, '%Y-%m-%dT%H:%M:%S.%fZ')
-        hrs, mins = duration.hour, duration.minute
-        hrs -= datetime.now().hour
-        true_duration = hrs * 60 + mins
-        await fhir_create_dialysis_session_resource(
-            session_id=new_sess.session_id,
-            patient_id=new_sess.patient_id,
-            date=new_sess.session_date.date(),
-            session_type=new_sess.session_type,
-            weight=new_sess.weight,
-            diastolic=new_sess.diastolic,
-            systolic=new_sess.systolic,
-            effluent_volume=new_sess.effluent_volume,
-            duration=true_duration,
-            protein=new_sess.protein,
-        )
-        logger.info(f"FHIR: created session {new_sess.session_id}")
-    except Exception as fhir_err:
-        logger.error(f"FHIR error: {fhir_err}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Session saved locally but failed to create on FHIR",
+    if row is None:
+        logger.error(f"Patient {session_data.patient_id} does not exist")
+        raise HTTPException(400, "Invalid patient ID")
+    if row["id"] is None:
+        # The untargeted ON CONFLICT also skips conflicts on (patient_id, session_id)
+        # and the primary key; only the per-day key makes this a duplicate
+        same_day = await db.scalar(_same_day_session_statement(session_data))
+        await db.rollback()
+        if same_day:
+            logger.warning("Duplicate session")
+            raise duplicate
+        logger.error(
+            f"Session for patient {session_data.patient_id} conflicts with a stored session_id; "
+            f"their session counter is behind and is moved past their highest session_id"
         )
-    await notify_clients({"message": "New session logged", "session": new_sess})
-    return new_sess
+        # Rows written outside session_ids.py; resync so the client's retry gets a free id
+        await db.execute(advance_session_counter_statement(literal(session_data.patient_id), literal(0)))
+        await db.commit()
+        raise HTTPException(500, "Failed to log dialysis session")
+    session = DialysisSession(**{c.key: row[c.key] for c in DialysisSession.__table__.c})
+    enqueue_dialysis_session_upsert(db, session)
+    try:
+        await db.commit()
+    except Exception as db_err:
+        await db.rollback(); logger.error(f"DB error: {db_err}")
+        raise HTTPException(500, "Failed to log dialysis session")
+    await issue_read_token_async(response, db)
+    fhir_session_cache.invalidate_patient(session.patient_id)
+    fhir_outbox_worker.notify()
+    notification_refresher.mark(session.patient_id)
+    if row["inserted"]:
+        logger.info(f"DB: created session {session.session_id}")
+        await notify_clients({"message": "New session logged", "session": session})
+    else:
+        logger.info(f"DB: updated session {session.session_id}")
+        await notify_clients({"message": "Session updated", "session": session})
+    return session
 
 @router.get(
     "/sessions",
     response_model=List[DialysisSessionResponse],
 )
 async def get_dialysis_sessions(
+    request:    Request,
+    response:   Response,
+    background_tasks: BackgroundTasks,
     start_date: Optional[datetime] = None,
     end_date:   Optional[datetime] = None,
     patient_id: Optional[int]      = None,
-    db:         Session            = Depends(get_db),
+    stream:     bool               = False,
+    db:         AsyncSession       = Depends(get_async_read_db),
     user:       User               = Depends(get_current_user),
 ):
+    """
+    List a patient's sessions, newest first, from the source picked by
+    DIALYSIS_READ_SOURCE. With stream=true the full history is streamed:
+    FHIR pages as they arrive, Postgres rows through a server-side cursor.
+    In fhir mode reads fall back
+    to Postgres when FHIR fails, misses the read deadline or its circuit
+    breaker is open. The X-Data-Source header names the source used.
+    """
     # auth & patient resolution
     if user.role == "patient":
         if patient_id and patient_id != user.id:
@@ -198,19 +237,123 @@ async def get_dialysis_sessions(
         patient_id = patient_id or user.id
     # normalize dates
     start_dt, end_dt = normalize_to_utc_day_bounds(start_date, end_date)
-    # FHIR search
+    limit = 1000
+    if settings.DIALYSIS_READ_SOURCE == "fhir":
+        fhir_response = await _read_dialysis_sessions_from_fhir(response, db, patient_id, start_dt, end_dt, stream)
+        if fhir_response is not None:
+            return fhir_response
+    # Postgres is the system of record; FHIR is mirrored from it by the outbox.
     try:
-        fhir_sessions = await fhir_search_dialysis_sessions(
-            patient_id=patient_id,
-            start_date=start_dt,
-            end_date=end_dt,
-            limit=1000,
+        if stream:
+            return await _stream_dialysis_sessions_from_postgres(request, patient_id, start_dt, end_dt)
+        sessions = await db.run_sync(query_dialysis_sessions, patient_id, start_dt, end_dt, limit)
+    except (OperationalError, PoolTimeoutError) as db_err:
+        # No connection to be had (pool exhausted, database down): worth retrying
+        logger.error(f"DB unavailable: {db_err}")
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Database unavailable")
+    except Exception as db_err:
+        logger.error(f"DB error: {db_err}")
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to fetch dialysis sessions")
+    if settings.DIALYSIS_READ_SOURCE == "compare" and session_read_comparator.should_sample():
+        if await db.run_sync(has_pending_fhir_writes, patient_id):
+            # FHIR is known to lag behind; a diff now would only report the outbox backlog.
+            session_read_comparator.skip_pending()
+        else:
+            background_tasks.add_task(
+                session_read_comparator.compare, patient_id, start_dt, end_dt, limit, sessions
+            )
+    response.headers[DATA_SOURCE_HEADER] = "postgres"
+    return [DialysisSessionResponse(**s) for s in sessions]
+
+async def _read_dialysis_sessions_from_fhir(response, db, patient_id, start_dt, end_dt, stream):
+    """Session list from FHIR, or None when the caller should fall back to Postgres."""
+    if stream:
+        return await _stream_dialysis_sessions(patient_id, start_dt, end_dt)
+    # FHIR search, bounded by the read deadline; the circuit breaker makes
+    # this fail fast while HAPI is known to be down.
+    try:
+        fhir_sessions = await asyncio.wait_for(
+            cached_fhir_search_dialysis_sessions(
+                patient_id=patient_id,
+                start_date=start_dt,
+                end_date=end_dt,
+                limit=1000,
+                db=db,
+            ),
+            timeout=settings.FHIR_READ_DEADLINE_SECONDS,
         )
     except Exception as fhir_err:
-        logger.error(f"FHIR error: {fhir_err}")
-        raise HTTPException(status.HTTP_502_BAD_GATEWAY, "Failed to fetch from FHIR server")
+        logger.warning(f"FHIR read failed ({type(fhir_err).__name__}: {fhir_err}), serving sessions from Postgres")
+        return None
+    response.headers[DATA_SOURCE_HEADER] = "fhir"
     return [DialysisSessionResponse(**s) for s in fhir_sessions]
 
+async def _stream_dialysis_sessions(patient_id, start_dt, end_dt):
+    """StreamingResponse over every FHIR page, or None if the first page cannot be fetched."""
+    pages = fhir_iter_dialysis_session_pages(patient_id=patient_id, start_date=start_dt, end_date=end_dt)
+    # Fetch the first page up front so a failing FHIR server can still fall back.
+    try:
+        first_page = await asyncio.wait_for(pages.__anext__(), timeout=settings.FHIR_READ_DEADLINE_SECONDS)
+    except StopAsyncIteration:
+        first_page = []
+    except Exception as fhir_err:
+        logger.warning(f"FHIR stream failed ({type(fhir_err).__name__}: {fhir_err}), serving sessions from Postgres")
+        return None
+
+    async def body():
+        separator = "["
+        page = first_page
+        try:
+            while True:
+                for s in page:
+                    yield separator + DialysisSessionResponse(**s).model_dump_json()
+                    separator = ","
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    break
+        except Exception as fhir_err:
+            # Headers are already sent; cut the array short so the client sees invalid JSON.
+            logger.error(f"FHIR error while streaming sessions for patient {patient_id}: {fhir_err}")
+            await pages.aclose()
+            return
+        yield "[]" if separator == "[" else "]"
+
+    return StreamingResponse(body(), media_type="application/json", headers={DATA_SOURCE_HEADER: "fhir"})
+
+async def _stream_dialysis_sessions_from_postgres(request, patient_id, start_dt, end_dt):
+    """StreamingResponse over the full history, POSTGRES_STREAM_BATCH rows at a time."""
+    # The request's session is closed when the endpoint returns, before the
+    # body is sent, so the cursor gets a session of its own.
+    db = db_router.async_read_session(read_token_from(request))
+    try:
+        statement = dialysis_sessions_statement(patient_id, start_dt, end_dt, limit=None)
+        rows = await db.stream_scalars(statement.execution_options(yield_per=POSTGRES_STREAM_BATCH))
+        # Fetch the first batch up front so a failing read still gets an error status.
+        first_batch = await rows.fetchmany(POSTGRES_STREAM_BATCH)
+    except Exception:
+        await db.close()
+        raise
+
+    async def body():
+        separator = "["
+        batch = first_batch
+        try:
+            while batch:
+                for session in batch:
+                    yield separator + DialysisSessionResponse(**dialysis_session_as_dict(session)).model_dump_json()
+                    separator = ","
+                batch = await rows.fetchmany(POSTGRES_STREAM_BATCH)
+        except Exception as db_err:
+            # Headers are already sent; cut the array short so the client sees invalid JSON.
+            logger.error(f"DB error while streaming sessions for patient {patient_id}: {db_err}")
+            return
+        finally:
+            await db.close()
+        yield "[]" if separator == "[" else "]"
+
+    return StreamingResponse(body(), media_type="application/json", headers={DATA_SOURCE_HEADER: "postgres"})
+
 @router.put(
     "/sessions/{session_id}",
     response_model=DialysisSessionResponse,
@@ -218,87 +361,81 @@ async def get_dialysis_sessions(
 async def update_dialysis_session(
     session_id:    int,
     session_data:  DialysisSessionCreate,
-    db:            Session = Depends(get_db),
-    user:          User    = Depends(get_current_user),
+    response:      Response,
+    db:            AsyncSession = Depends(get_async_db),
+    user:          User         = Depends(get_current_user),
 ):
-    session = (
-        db.query(DialysisSession)
-        .filter(DialysisSession.id == session_id,
-                DialysisSession.patient_id == user.id)
-        .first()
-    )
+    session = (await db.execute(
+        select(DialysisSession)
+        .where(DialysisSession.id == session_id,
+               DialysisSession.patient_id == user.id)
+    )).scalars().first()
     if not session:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
+    previous = SimpleNamespace(session_id=session.session_id, patient_id=session.patient_id)
     for field in (
         "session_type","session_id","weight","diastolic",
         "systolic","effluent_volume","session_date",
         "session_duration","protein",
     ):
-        setattr(session, field, getattr(session_data, field))
+        setattr(session, field, _stored_value(session_data, field))
+    if previous.session_id != session.session_id:
+        # session_id is only unique per partition; the counter's row lock
+        # serialises this check with other writers of the patient's ids.
+        await db.run_sync(advance_session_counter, session.patient_id, session.session_id)
+        taken = (await db.execute(
+            select(exists().where(
+                DialysisSession.patient_id == session.patient_id,
+                DialysisSession.session_id == session.session_id,
+                DialysisSession.id != session.id,
+            ))
+        )).scalar()
+        if taken:
+            await db.rollback()
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Integrity error: possible duplicate")
+        # The FHIR id is derived from session_id, so drop the old resource.
+        enqueue_dialysis_session_delete(db, previous)
+    enqueue_dialysis_session_upsert(db, session)
     try:
-        db.commit(); db.refresh(session)
+        await db.commit(); await db.refresh(session)
     except Exception as db_err:
-        db.rollback(); logger.error(f"DB error: {db_err}")
+        await db.rollback(); logger.error(f"DB error: {db_err}")
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to save session")
-    try:
-        duration = datetime.strptime(session.session_duration, '%Y-%m-%dT%H:%M:%S.%fZ')
-        hrs, mins = duration.hour, duration.minute
-        hrs -= datetime.now().hour
-        true_duration = hrs * 60 + mins
-        await fhir_create_dialysis_session_resource(
-            session_id=session.session_id,
-            patient_id=session.patient_id,
-            date=session.session_date.date(),
-            session_type=session.session_type,
-            weight=session.weight,
-            diastolic=session.diastolic,
-            systolic=session.systolic,
-            effluent_volume=session.effluent_volume,
-            duration=true_duration,
-            protein=session.protein,
-        )
-    except Exception as fhir_err:
-        logger.error(f"FHIR error: {fhir_err}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Session saved locally but failed to update FHIR",
-        )
+    await issue_read_token_async(response, db)
+    fhir_session_cache.invalidate_patient(session.patient_id)
+    fhir_outbox_worker.notify()
+    notification_refresher.mark(session.patient_id)
     return DialysisSessionResponse.from_orm(session)
 
 
 @router.delete("/sessions/{session_id}", status_code=204)
 async def delete_dialysis_session(
     session_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
     patients_list = user.patients if isinstance(user.patients, list) else [user.patients]
-    session = (
-        db.query(DialysisSession)
-        .filter(
+    session = (await db.execute(
+        select(DialysisSession)
+        .where(
             DialysisSession.session_id == session_id
         )
-        .first()
-    )
+    )).scalars().first()
     if not session:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Session not found")
-    # Delete from the FHIR server
-    try:
-        await fhir_delete_dialysis_session_resource(session_id=session.session_id)
-        logger.info(f"FHIR: deleted session {session.session_id}")
-    except Exception as fhir_err:
-        logger.error(f"FHIR delete error: {fhir_err}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail="Failed to delete session on FHIR server",
-        )
-    # Delete from the database
+    # Delete from the database; the FHIR delete is queued in the same transaction
     try:
-        db.delete(session)
-        db.commit()
+        enqueue_dialysis_session_delete(db, session)
+        await db.delete(session)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Delete error: {e}")
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Failed to delete session from database")
+    await issue_read_token_async(response, db)
+    fhir_session_cache.invalidate_patient(session.patient_id)
+    fhir_outbox_worker.notify()
+    notification_refresher.mark(session.patient_id)
 
     return
\ No newline at end of file
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -9,9 +10,22 @@ from app.api.auth import router as auth_router
 from app.api.dialysis import router as dialysis_router
 from app.api.analytics import router as analytics_router
 from app.api.provider import router as provider_router
-from app.db.session import Base, engine
+from app.api.middlewares import RequestTrackingMiddleware
+from app.db.session import Base, engine, async_engine, get_db
+from app.db.pool_liveness import db_pool_liveness
+from app.db.query_stats import sql_instrumentation
+from app.db.routing import db_router, READ_TOKEN_HEADER
+from app.db.partitions import dialysis_partition_maintainer
+from app.db.fhir_integration import init_fhir_clients, close_fhir_clients, fhir_pool_stats
+from app.db.fhir_cache import fhir_session_cache
+from app.db.fhir_outbox import fhir_outbox_worker
+from app.db.fhir_breaker import fhir_circuit_breaker
+from app.db.session_read_compare import session_read_comparator
+from app.db.fhir_reconcile import fhir_reconcile_job
+from app.db.notification_refresh import notification_refresher
 from app.core.logging_config import logger
 from datetime import datetime
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import Annotated
 import os
@@ -19,8 +33,31 @@ import os
 #  Ensure database tables exist
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    init_fhir_clients()
+    db_router.start()
+    dialysis_partition_maintainer.start()
+    notification_refresher.start()
+    if settings.FHIR_OUTBOX_ENABLED:
+        fhir_outbox_worker.start()
+    if settings.FHIR_RECONCILE_INTERVAL_HOURS > 0:
+        fhir_reconcile_job.start()
+    yield
+    await fhir_reconcile_job.stop()
+    await fhir_outbox_worker.stop()
+    await notification_refresher.stop()
+    await dialysis_partition_maintainer.stop()
+    await db_router.stop()
+    await close_fhir_clients()
+    await async_engine.dispose()
+    await db_router.dispose()
+
+
 # Create FastAPI App
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 #  CORS Middleware
 app.add_middleware(
@@ -29,8 +66,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # The UI runs on another origin, so it can only read the read token (and
+    # echo it on its next requests, see read-token.interceptor.ts) if exposed
+    expose_headers=[READ_TOKEN_HEADER],
 )
 
+#  Request IDs, request logging and per-request SQL statement counts
+app.add_middleware(RequestTrackingMiddleware)
+
 #  Register API Routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(dialysis_router) 
@@ -62,7 +105,7 @@ async def health_check(db: Annotated[Session, Depends(get_db)]):
     if settings.HEALTH_CHECK_INCLUDE_DB:
         try:
             # Execute simple query to verify DB connection
-            db.execute("SELECT 1")
+            db.execute(text("SELECT 1"))
             health_data["checks"]["database"] = "connected"
         except Exception as e:
             health_data["status"] = "unhealthy"
@@ -87,6 +130,29 @@ async def health_check(db: Annotated[Session, Depends(get_db)]):
     
     return health_data
 
+#  Runtime Metrics Route
+@app.get("/metrics", status_code=200, tags=["Health"])
+async def runtime_metrics():
+    """
+    Connection pool and cache counters used to size the deployment.
+
+    Returns:
+        dict: Metrics grouped by subsystem
+    """
+    return {
+        "db_pool": db_pool_liveness.stats(),
+        "db_routing": db_router.stats(),
+        "db_statements": sql_instrumentation.stats(),
+        "dialysis_partitions": dialysis_partition_maintainer.stats(),
+        "fhir_pool": fhir_pool_stats(),
+        "fhir_cache": fhir_session_cache.stats(),
+        "fhir_outbox": fhir_outbox_worker.stats(),
+        "fhir_breaker": fhir_circuit_breaker.stats(),
+        "session_read_compare": session_read_comparator.stats(),
+        "fhir_reconcile": fhir_reconcile_job.stats(),
+        "notification_refresh": notification_refresher.stats(),
+    }
+
 #  Global Exception Handling
 @app.exception_handler(Exception)
 def global_exception_handler(request, exc):
@@ -8,6 +8,7 @@ import logging
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.logging_config import get_request_id
+from app.db.query_stats import sql_instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -49,31 +50,46 @@ class RequestTrackingMiddleware(BaseHTTPMiddleware):
             extra=logger_extra
         )
         
-        # Process the request and capture any exceptions
-        try:
-            response = await call_next(request)
-            
-            # Add correlation ID header to response for client tracing
-            response.headers["X-Correlation-ID"] = correlation_id
-            response.headers["X-Request-ID"] = request_id
-            
-            # Calculate processing time
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            # Log completion with status code and processing time
-            logger.info(
-                f"Request completed: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.3f}s",
-                extra=logger_extra
-            )
-            
-            return response
-        
-        except Exception as e:
-            # Log exceptions with full details
-            process_time = time.time() - start_time
-            logger.exception(
-                f"Request failed: {request.method} {request.url.path} - Error: {str(e)} - Time: {process_time:.3f}s",
-                extra=logger_extra
-            )
-            raise  # Re-raise for FastAPI's exception handlers
\ No newline at end of file
+        # Process the request and capture any exceptions; SQL statements it runs are charged to request_id
+        with sql_instrumentation.track(request_id) as queries:
+            try:
+                response = await call_next(request)
+            except Exception as e:
+                # Log exceptions with full details
+                process_time = time.time() - start_time
+                logger.exception(
+                    f"Request failed: {request.method} {request.url.path} - Error: {str(e)} - Time: {process_time:.3f}s",
+                    extra={**logger_extra, "db": queries.summary()}
+                )
+                raise  # Re-raise for FastAPI's exception handlers
+
+        # Add correlation ID header to response for client tracing
+        response.headers["X-Correlation-ID"] = correlation_id
+        response.headers["X-Request-ID"] = request_id
+
+        # Calculate processing time (up to the headers; the body may still be streaming)
+        process_time = time.time() - start_time
+        response.headers["X-Process-Time"] = str(process_time)
+
+        # The body runs after dispatch returns, and a streamed one (such as
+        # GET /dialysis/sessions?stream=true) keeps executing SQL until it is
+        # sent, so completion is logged once the last chunk has gone out.
+        body_iterator = response.body_iterator
+
+        async def body_then_log():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                # Log completion with status code, total time and database usage
+                total_time = time.time() - start_time
+                db = queries.summary()
+                logger.info(
+                    f"Request completed: {request.method} {request.url.path} - Status: {response.status_code} - Time: {total_time:.3f}s"
+                    f" - DB: {db['statements']} statements, {db['time_ms']:.1f}ms",
+                    extra={**logger_extra, "db": db}
+                )
+                sql_instrumentation.report(queries, f"{request.method} {request.url.path}", logger_extra)
+
+        response.body_iterator = body_then_log()
+        return response
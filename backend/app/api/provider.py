@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import List
 from app.db.schemas.dialysis import DialysisSessionCreate, DialysisSessionResponse
 from app.db.schemas.user import UserResponse, ProviderPatientsResponse
 from app.db.session import get_db
+from app.db.routing import get_read_db, issue_read_token
 from app.db.models.dialysis import DialysisSession
+from app.db.session_ids import reserve_session_ids, advance_session_counter
+from app.db.fhir_outbox import enqueue_dialysis_session_upsert, fhir_outbox_worker
+from app.db.fhir_cache import fhir_session_cache
+from app.db.notification_refresh import notification_refresher
 from app.core.security import get_current_user
 from app.db.models.user import User
+from app.helpers.date_time import to_naive_utc
 import logging
 
 
@@ -17,7 +24,7 @@ router = APIRouter(prefix="/provider", tags=["Provider"])
 
 @router.get("/patients", response_model=List[dict])
 def get_provider_patients(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user)
 ):
     """
@@ -64,7 +71,7 @@ def get_provider_patients(
 @router.get("/patients/{patient_id}/dialysis", response_model=List[DialysisSessionResponse])
 def get_patient_dialysis_info(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user)
 ):
     """
@@ -86,6 +93,7 @@ def get_patient_dialysis_info(
 def create_dialysis_session(
     patient_id: int,
     session_data: DialysisSessionCreate,
+    response: Response,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
@@ -102,6 +110,9 @@ def create_dialysis_session(
     try:
         # Check if session_id exists in the request
         if session_data.session_id:
+            # Lock the patient's counter first: session_id is only unique per
+            # partition, so concurrent writers of one id must queue here.
+            advance_session_counter(db, patient_id, session_data.session_id)
             existing_session = db.query(DialysisSession).filter(
                 DialysisSession.session_id == session_data.session_id,
                 DialysisSession.patient_id == patient_id
@@ -113,20 +124,20 @@ def create_dialysis_session(
                 existing_session.diastolic = session_data.diastolic
                 existing_session.systolic = session_data.systolic
                 existing_session.effluent_volume = session_data.effluent_volume
-                existing_session.session_date = session_data.session_date
+                existing_session.session_date = to_naive_utc(session_data.session_date)
                 existing_session.session_duration = session_data.session_duration
                 existing_session.protein = session_data.protein
 
+                enqueue_dialysis_session_upsert(db, existing_session)
                 db.commit()
                 db.refresh(existing_session)
+                issue_read_token(response, db)
+                fhir_session_cache.invalidate_patient(patient_id)
+                fhir_outbox_worker.notify()
+                notification_refresher.mark(patient_id)
                 return DialysisSessionResponse.from_orm(existing_session)
         else:
-            # Fetch the last session ID for the patient
-            last_session = db.query(DialysisSession).filter(
-                DialysisSession.patient_id == patient_id
-            ).order_by(DialysisSession.session_date.desc()).first()
-
-            session_data.session_id = last_session.session_id + 1 if last_session else 1
+            session_data.session_id = reserve_session_ids(db, patient_id)[0]
 
         # Create a new dialysis session
         new_session = DialysisSession(
@@ -137,16 +148,26 @@ def create_dialysis_session(
             diastolic=session_data.diastolic,
             systolic=session_data.systolic,
             effluent_volume=session_data.effluent_volume,
-            session_date=session_data.session_date,
+            session_date=to_naive_utc(session_data.session_date),
             session_duration=session_data.session_duration,
             protein=session_data.protein
         )
 
         db.add(new_session)
+        enqueue_dialysis_session_upsert(db, new_session)
         db.commit()
         db.refresh(new_session)
+        issue_read_token(response, db)
+        fhir_session_cache.invalidate_patient(patient_id)
+        fhir_outbox_worker.notify()
+        notification_refresher.mark(patient_id)
         return DialysisSessionResponse.from_orm(new_session)
 
+    except IntegrityError as e:
+        # One session of each type per day, or a session_id taken within the month
+        db.rollback()
+        logger.warning(f"Integrity error: {e}")
+        raise HTTPException(status_code=400, detail="Integrity error: possible duplicate")
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating or updating dialysis session: {e}")
@@ -0,0 +1,193 @@
+"""
+Blood pressure and height reference values for the notification analysis.
+
+The reference tables are given per age band below. At import they are
+expanded into one row per year of age (0 to MAX_AGE), held both as Python
+tuples for single lookups and as NumPy arrays for whole panels:
+
+- HEIGHT_PERCENTILES[sex, age]: 5th, 50th and 95th percentile height (cm);
+- BP_LIMITS[sex, age, height category]: high systolic, high diastolic,
+  low systolic and low diastolic (the 90th and 50th BP percentiles).
+
+A lookup indexes the age directly, instead of walking the bands, and finds
+the height category with bisect on that age's percentiles. The vectorized
+variants do the same for arrays. Ages under 1 use the 1-year row and ages
+past MAX_AGE the last one. Per-year data (e.g. the full CDC stature and
+KDOQI/NHBPEP blood pressure tables) replaces the banded values by editing
+the rows built in _per_year_rows; the lookups stay the same.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Blood Pressure Reference Data - Based on 90th and 50th percentiles by age, gender, and height
+# This is a simplified version. In a real application, this would be more comprehensive
+# Reference: https://kidneyfoundation.cachefly.net/professionals/KDOQI/guidelines_bp/guide_13.htm
+# This simplified implementation includes 3 height percentiles (5th, 50th, 95th) for accurate BP assessment
+# Height percentile definitions: "short" (5th), "medium" (50th), "tall" (95th)
+BP_REFERENCE = {
+    "male": {
+        # Age ranges with height percentiles: (high_systolic, high_diastolic, low_systolic, low_diastolic)
+        # High is 90th percentile, Low is 50th percentile
+        "1-3": {
+            "short": {"90th": (106, 70), "50th": (91, 52)},
+            "medium": {"90th": (110, 74), "50th": (95, 55)},
+            "tall": {"90th": (114, 76), "50th": (99, 57)}
+        },
+        "4-6": {
+            "short": {"90th": (110, 74), "50th": (97, 57)},
+            "medium": {"90th": (114, 76), "50th": (100, 60)},
+            "tall": {"90th": (118, 78), "50th": (104, 63)}
+        },
+        "7-10": {
+            "short": {"90th": (114, 76), "50th": (102, 62)},
+            "medium": {"90th": (118, 78), "50th": (105, 65)},
+            "tall": {"90th": (122, 80), "50th": (109, 68)}
+        },
+        "11-14": {
+            "short": {"90th": (118, 78), "50th": (107, 63)},
+            "medium": {"90th": (122, 80), "50th": (110, 65)},
+            "tall": {"90th": (126, 82), "50th": (114, 67)}
+        },
+        "15-17": {
+            "short": {"90th": (126, 80), "50th": (113, 68)},
+            "medium": {"90th": (130, 82), "50th": (115, 70)},
+            "tall": {"90th": (134, 84), "50th": (119, 72)}
+        }
+    },
+    "female": {
+        "1-3": {
+            "short": {"90th": (104, 70), "50th": (91, 52)},
+            "medium": {"90th": (108, 72), "50th": (95, 55)},
+            "tall": {"90th": (112, 74), "50th": (99, 57)}
+        },
+        "4-6": {
+            "short": {"90th": (108, 72), "50th": (97, 57)},
+            "medium": {"90th": (112, 74), "50th": (100, 60)},
+            "tall": {"90th": (116, 76), "50th": (104, 63)}
+        },
+        "7-10": {
+            "short": {"90th": (112, 74), "50th": (102, 62)},
+            "medium": {"90th": (116, 76), "50th": (105, 65)},
+            "tall": {"90th": (120, 78), "50th": (109, 68)}
+        },
+        "11-14": {
+            "short": {"90th": (116, 76), "50th": (107, 63)},
+            "medium": {"90th": (120, 78), "50th": (110, 65)},
+            "tall": {"90th": (124, 80), "50th": (113, 67)}
+        },
+        "15-17": {
+            "short": {"90th": (120, 78), "50th": (112, 68)},
+            "medium": {"90th": (124, 80), "50th": (115, 70)},
+            "tall": {"90th": (128, 82), "50th": (118, 72)}
+        }
+    }
+}
+
+# Standard height ranges (cm) by age and gender for percentile calculation
+# Values represent 5th, 50th, and 95th percentiles
+# Reference: CDC Growth Charts, 2000
+# Source: https://www.cdc.gov/growthcharts/cdc-data-files.htm
+# Data from: Stature-for-age charts, 2 to 20 years, LMS parameters and
+# selected smoothed stature percentiles in centimeters, by sex and age
+HEIGHT_REFERENCE = {
+    "male": {
+        "1-3": [80.0, 91.9, 103.4],  # 5th, 50th, 95th percentiles
+        "4-6": [99.9, 112.2, 124.4],
+        "7-10": [119.2, 133.3, 147.4],
+        "11-14": [142.2, 160.7, 179.0],
+        "15-17": [163.3, 176.2, 188.7]
+    },
+    "female": {
+        "1-3": [78.9, 90.7, 102.0],
+        "4-6": [99.1, 110.9, 123.1],
+        "7-10": [118.2, 132.4, 146.2],
+        "11-14": [142.4, 158.0, 172.3],
+        "15-17": [154.2, 163.7, 173.6]
+    }
+}
+
+
+SEXES = ("male", "female")
+HEIGHT_CATEGORIES = ("short", "medium", "tall")
+MAX_AGE = 17
+# Age bands of the tables above; ages under 1 use the first band
+AGE_BANDS = {"1-3": (0, 3), "4-6": (4, 6), "7-10": (7, 10), "11-14": (11, 14), "15-17": (15, MAX_AGE)}
+
+_SEX_INDEX = {sex: i for i, sex in enumerate(SEXES)}
+
+
+def _per_year_rows():
+    """(heights, limits) per sex and year of age, from the banded tables."""
+    heights = {sex: [None] * (MAX_AGE + 1) for sex in SEXES}
+    limits = {sex: [None] * (MAX_AGE + 1) for sex in SEXES}
+    for sex in SEXES:
+        for band, (first, last) in AGE_BANDS.items():
+            for age in range(first, last + 1):
+                heights[sex][age] = tuple(HEIGHT_REFERENCE[sex][band])
+                limits[sex][age] = tuple(
+                    BP_REFERENCE[sex][band][category]["90th"] + BP_REFERENCE[sex][band][category]["50th"]
+                    for category in HEIGHT_CATEGORIES
+                )
+    return heights, limits
+
+
+_HEIGHT_ROWS, _LIMIT_ROWS = _per_year_rows()
+# Single lookups: the 50th and 95th percentiles bound the height categories
+_CATEGORY_BOUNDS = [[row[1:] for row in _HEIGHT_ROWS[sex]] for sex in SEXES]
+_BP_ROWS = [
+    [[{"90th": limits[:2], "50th": limits[2:]} for limits in row] for row in _LIMIT_ROWS[sex]]
+    for sex in SEXES
+]
+
+HEIGHT_PERCENTILES = np.array([_HEIGHT_ROWS[sex] for sex in SEXES], dtype=float)
+BP_LIMITS = np.array([_LIMIT_ROWS[sex] for sex in SEXES])
+
+
+def age_index(age: int) -> int:
+    """Row of `age` in the per-year tables."""
+    return min(max(age, 0), MAX_AGE)
+
+
+def height_category(height: float, age: int, sex: str) -> int:
+    """Index into HEIGHT_CATEGORIES: below the 50th percentile is short, below the 95th medium, else tall."""
+    return bisect_right(_CATEGORY_BOUNDS[_SEX_INDEX[sex.lower()]][age_index(age)], height)
+
+
+def bp_reference(age: int, sex: str, height: float) -> Dict[str, Tuple[int, int]]:
+    """{"90th": (systolic, diastolic), "50th": (systolic, diastolic)} for a patient."""
+    sex_row = _SEX_INDEX[sex.lower()]
+    age_row = age_index(age)
+    return _BP_ROWS[sex_row][age_row][bisect_right(_CATEGORY_BOUNDS[sex_row][age_row], height)]
+
+
+def sex_indices(sexes) -> np.ndarray:
+    """Row of each sex in the arrays; raises ValueError for an unknown one."""
+    try:
+        return np.array([_SEX_INDEX[sex.lower()] for sex in sexes], dtype=np.intp)
+    except KeyError:
+        raise ValueError(f"Unknown sex(es): {sorted({s for s in sexes if s.lower() not in _SEX_INDEX})}")
+
+
+def age_indices(ages) -> np.ndarray:
+    return np.clip(np.asarray(ages), 0, MAX_AGE).astype(np.intp)
+
+
+def _categories(heights, bounds) -> np.ndarray:
+    # Counts the bounds at or below each height, as bisect_right does (NaN counts as above both)
+    heights = np.asarray(heights, dtype=float)
+    return (~(heights < bounds[:, 1])).astype(np.intp) + ~(heights < bounds[:, 2])
+
+
+def height_categories(heights, ages, sexes) -> np.ndarray:
+    """height_category for arrays."""
+    return _categories(heights, HEIGHT_PERCENTILES[sex_indices(sexes), age_indices(ages)])
+
+
+def bp_reference_batch(ages, sexes, heights) -> np.ndarray:
+    """bp_reference for arrays: rows of (high systolic, high diastolic, low systolic, low diastolic)."""
+    sex = sex_indices(sexes)
+    age = age_indices(ages)
+    return BP_LIMITS[sex, age, _categories(heights, HEIGHT_PERCENTILES[sex, age])]
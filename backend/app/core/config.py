@@ -14,6 +14,26 @@ class Settings(BaseSettings):
     DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
     DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Recycle connections after 30 minutes
     DB_MAX_RETRIES: int = int(os.getenv("DB_MAX_RETRIES", 5))
+    DB_PING_IDLE_SECONDS: float = float(os.getenv("DB_PING_IDLE_SECONDS", 30))  # Ping pooled connections idle longer than this on checkout
+
+    # Read replicas (app/db/routing.py); with none configured every read goes to the primary
+    DB_REPLICA_URLS: str = os.getenv("DB_REPLICA_URLS", "")  # Comma-separated replica database URLs
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5.0))  # Replicas further behind are skipped
+    DB_REPLICA_POLL_SECONDS: float = float(os.getenv("DB_REPLICA_POLL_SECONDS", 1.0))  # How often replica lag is measured
+    DB_READ_TOKEN_TTL_SECONDS: int = int(os.getenv("DB_READ_TOKEN_TTL_SECONDS", 60))  # Lifetime of the read-your-writes cookie
+
+    # Monthly partitions of dialysis_sessions (app/db/partitions.py)
+    DB_PARTITION_MONTHS_AHEAD: int = int(os.getenv("DB_PARTITION_MONTHS_AHEAD", 3))  # Future months kept created ahead of today
+    DB_PARTITION_CHECK_SECONDS: float = float(os.getenv("DB_PARTITION_CHECK_SECONDS", 3600))  # How often missing partitions are created
+
+    # Per-request SQL statement instrumentation (app/db/query_stats.py)
+    SQL_INSTRUMENTATION: bool = os.getenv("SQL_INSTRUMENTATION", "true").lower() == "true"  # Count and time statements per request
+    SQL_SLOWEST_LOGGED: int = int(os.getenv("SQL_SLOWEST_LOGGED", 3))  # Slowest statements included in each request log
+    SQL_DETECT_N_PLUS_ONE: bool = os.getenv("SQL_DETECT_N_PLUS_ONE", "false").lower() == "true"  # Dev mode: warn about repeated statement shapes
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))  # Executions of one shape in a request that count as N+1
+
+    # Notification flags recomputed after session writes (app/db/notification_refresh.py)
+    NOTIFICATION_REFRESH_DEBOUNCE_SECONDS: float = float(os.getenv("NOTIFICATION_REFRESH_DEBOUNCE_SECONDS", 2.0))  # Writes within this window are evaluated once
 
     # SSL Configuration for PostgreSQL
     POSTGRES_USE_SSL: bool = os.getenv("POSTGRES_USE_SSL", "false").lower() == "true"
@@ -48,7 +68,60 @@ class Settings(BaseSettings):
 
     # HAPI FHIR Server Base url
     HAPI_FHIR_BASE_URL: str = os.getenv("HAPI_BASE_URL", "http://hapi:8080/fhir/")
-    
+
+    # Shared HAPI FHIR HTTP client pool
+    FHIR_MAX_CONNECTIONS: int = int(os.getenv("FHIR_MAX_CONNECTIONS", 50))
+    FHIR_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("FHIR_MAX_KEEPALIVE_CONNECTIONS", 20))
+    FHIR_KEEPALIVE_EXPIRY: float = float(os.getenv("FHIR_KEEPALIVE_EXPIRY", 30.0))  # Seconds an idle connection is kept
+    FHIR_CONNECT_TIMEOUT: float = float(os.getenv("FHIR_CONNECT_TIMEOUT", 5.0))
+    FHIR_READ_TIMEOUT: float = float(os.getenv("FHIR_READ_TIMEOUT", 15.0))
+    FHIR_WRITE_TIMEOUT: float = float(os.getenv("FHIR_WRITE_TIMEOUT", 15.0))
+    FHIR_POOL_TIMEOUT: float = float(os.getenv("FHIR_POOL_TIMEOUT", 5.0))  # Seconds to wait for a free pooled connection
+    FHIR_HTTP2: bool = os.getenv("FHIR_HTTP2", "false").lower() == "true"  # Only negotiated over TLS (Azure)
+
+    # Source for GET /dialysis/sessions: postgres | fhir | compare (postgres, diffed against FHIR on a sample)
+    DIALYSIS_READ_SOURCE: str = os.getenv("DIALYSIS_READ_SOURCE", "postgres").lower()
+    DIALYSIS_READ_COMPARE_PERCENT: float = float(os.getenv("DIALYSIS_READ_COMPARE_PERCENT", 5.0))  # % of reads diffed in compare mode
+
+    # FHIR circuit breaker and read fallback
+    FHIR_BREAKER_ENABLED: bool = os.getenv("FHIR_BREAKER_ENABLED", "true").lower() == "true"
+    FHIR_BREAKER_WINDOW_SIZE: int = int(os.getenv("FHIR_BREAKER_WINDOW_SIZE", 20))  # Recent calls considered
+    FHIR_BREAKER_MIN_CALLS: int = int(os.getenv("FHIR_BREAKER_MIN_CALLS", 10))  # Calls needed before the breaker can trip
+    FHIR_BREAKER_FAILURE_RATE: float = float(os.getenv("FHIR_BREAKER_FAILURE_RATE", 0.5))
+    FHIR_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("FHIR_BREAKER_SLOW_CALL_SECONDS", 2.0))
+    FHIR_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("FHIR_BREAKER_SLOW_CALL_RATE", 0.8))
+    FHIR_BREAKER_OPEN_SECONDS: float = float(os.getenv("FHIR_BREAKER_OPEN_SECONDS", 30.0))  # Fail-fast period before probing
+    FHIR_BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("FHIR_BREAKER_HALF_OPEN_PROBES", 3))
+    FHIR_READ_DEADLINE_SECONDS: float = float(os.getenv("FHIR_READ_DEADLINE_SECONDS", 3.0))  # Then serve reads from Postgres
+
+    # FHIR searches
+    FHIR_SEARCH_PAGE_SIZE: int = int(os.getenv("FHIR_SEARCH_PAGE_SIZE", 200))  # _count per searchset page
+    FHIR_STRICT_PARSING: bool = os.getenv("FHIR_STRICT_PARSING", "false").lower() == "true"  # Validate results with fhir.resources models
+
+    # FHIR batch/transaction Bundle writes
+    FHIR_BULK_CHUNK_SIZE: int = int(os.getenv("FHIR_BULK_CHUNK_SIZE", 100))  # Entries per Bundle
+    FHIR_BULK_CONCURRENCY: int = int(os.getenv("FHIR_BULK_CONCURRENCY", 4))  # Bundles in flight at once
+
+    # FHIR session search cache (per process)
+    FHIR_CACHE_ENABLED: bool = os.getenv("FHIR_CACHE_ENABLED", "true").lower() == "true"
+    FHIR_CACHE_TTL_SECONDS: float = float(os.getenv("FHIR_CACHE_TTL_SECONDS", 300))
+    FHIR_CACHE_MAX_ENTRIES: int = int(os.getenv("FHIR_CACHE_MAX_ENTRIES", 2000))
+
+    # FHIR outbox worker
+    FHIR_OUTBOX_ENABLED: bool = os.getenv("FHIR_OUTBOX_ENABLED", "true").lower() == "true"
+    FHIR_OUTBOX_POLL_INTERVAL: float = float(os.getenv("FHIR_OUTBOX_POLL_INTERVAL", 2.0))  # Seconds between idle polls
+    FHIR_OUTBOX_BATCH_SIZE: int = int(os.getenv("FHIR_OUTBOX_BATCH_SIZE", 50))
+    FHIR_OUTBOX_CONCURRENCY: int = int(os.getenv("FHIR_OUTBOX_CONCURRENCY", 8))
+    FHIR_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("FHIR_OUTBOX_MAX_ATTEMPTS", 12))
+    FHIR_OUTBOX_BACKOFF_BASE: float = float(os.getenv("FHIR_OUTBOX_BACKOFF_BASE", 2.0))
+    FHIR_OUTBOX_BACKOFF_MAX: float = float(os.getenv("FHIR_OUTBOX_BACKOFF_MAX", 600.0))
+    FHIR_OUTBOX_LEASE_SECONDS: int = int(os.getenv("FHIR_OUTBOX_LEASE_SECONDS", 120))  # Reclaim entries a crashed worker held
+
+    # Postgres <-> FHIR reconciliation
+    FHIR_RECONCILE_INTERVAL_HOURS: float = float(os.getenv("FHIR_RECONCILE_INTERVAL_HOURS", 0))  # 0 disables the in-app job
+    FHIR_RECONCILE_REVERIFY_DAYS: int = int(os.getenv("FHIR_RECONCILE_REVERIFY_DAYS", 30))  # Re-fetch matching ranges this old
+    FHIR_RECONCILE_CONCURRENCY: int = int(os.getenv("FHIR_RECONCILE_CONCURRENCY", 4))  # Patients reconciled at once
+
     # Health Check Settings
     HEALTH_CHECK_INCLUDE_DB: bool = os.getenv("HEALTH_CHECK_INCLUDE_DB", "true").lower() == "true"
 
@@ -35,6 +35,9 @@ class JsonFormatter(logging.Formatter):
             log_record["user_id"] = record.user_id
         if hasattr(record, "correlation_id"):
             log_record["correlation_id"] = record.correlation_id
+        # Per-request SQL statement counts and timings (app/db/query_stats.py)
+        if hasattr(record, "db"):
+            log_record["db"] = record.db
             
         return json.dumps(log_record)
 
@@ -0,0 +1,192 @@
+"""
+Notification analysis: the flags of GET /analytics/notifications computed
+from a patient's latest pre/post vitals and EDW.
+
+analyze_blood_pressure and analyze_weight judge one patient;
+analyze_notifications_batch does the same for a whole provider panel in one
+NumPy pass. evaluate_notifications and evaluate_notifications_batch apply
+them to users and their vitals snapshots (app/db/vitals_snapshot.py).
+Nothing here touches the database.
+"""
+
+import logging
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.core.bp_reference import HEIGHT_CATEGORIES, SEXES, bp_reference, bp_reference_batch, height_category
+from app.db.models.user import User
+from app.db.models.vitals_snapshot import PatientVitalsSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def determine_height_percentile(height: float, age: int, gender: str) -> str:
+    """Determine height percentile category (short, medium, tall) based on height, age, and gender"""
+    return HEIGHT_CATEGORIES[height_category(height, age, gender)]
+
+
+def get_bp_reference_values(age: int, gender: str, height: float) -> Dict[str, Tuple[int, int]]:
+    """Get blood pressure reference values based on age, gender, and height"""
+    return bp_reference(age, gender, height)
+
+
+def analyze_blood_pressure(pre_systolic, pre_diastolic, post_systolic, post_diastolic, age, gender, height) -> Dict[
+    str, bool]:
+    bp_ref = get_bp_reference_values(age, gender, height)
+    high_systolic, high_diastolic = bp_ref["90th"]
+    low_systolic, low_diastolic = bp_ref["50th"]
+
+    return {
+        "highBloodPressure": any([
+            pre_systolic > high_systolic,
+            pre_diastolic > high_diastolic,
+            post_systolic > high_systolic,
+            post_diastolic > high_diastolic
+        ]),
+        "lowBloodPressure": any([
+            pre_systolic < low_systolic,
+            pre_diastolic < low_diastolic,
+            post_systolic < low_systolic,
+            post_diastolic < low_diastolic
+        ])
+    }
+
+
+def analyze_weight(pre_weight: float, post_weight: float, edw: float, uf_volume: float) -> Dict[str, bool]:
+    pre_edw_diff_percent = abs((pre_weight - edw) / edw) * 100
+    post_edw_diff_percent = abs((post_weight - edw) / edw) * 100
+    pre_post_diff_percent = ((post_weight - pre_weight) / pre_weight) * 100
+
+    return {
+        "fluidOverloadHigh": pre_edw_diff_percent > 3 or pre_post_diff_percent >= 1,
+        "fluidOverloadWatch": post_weight < edw and abs(post_edw_diff_percent) > 2,
+        "dialysisGrowthAdjustment": pre_edw_diff_percent > 3
+    }
+
+
+# Batch notification engine: the analysis above for a whole panel of patients
+# in one pass, with the reference values looked up for all of them at once.
+# For valid input (known sex, positive weights) every flag equals the one the
+# scalar functions return; scripts/check_notification_engine.py and
+# tests/test_notification_engine.py verify this.
+
+def analyze_notifications_batch(
+        ages, genders, heights,
+        pre_systolic, pre_diastolic, post_systolic, post_diastolic,
+        pre_weight, post_weight, edw,
+) -> Dict[str, np.ndarray]:
+    """
+    All notification flags for many patients at once: analyze_blood_pressure and
+    analyze_weight over arrays (one element per patient). Returns one boolean
+    array per flag, in the patients' order.
+    """
+    reference = bp_reference_batch(ages, genders, heights)
+    high_systolic, high_diastolic, low_systolic, low_diastolic = reference.T
+    pre_systolic, pre_diastolic = np.asarray(pre_systolic), np.asarray(pre_diastolic)
+    post_systolic, post_diastolic = np.asarray(post_systolic), np.asarray(post_diastolic)
+
+    pre_weight = np.asarray(pre_weight, dtype=float)
+    post_weight = np.asarray(post_weight, dtype=float)
+    edw = np.asarray(edw, dtype=float)
+    pre_edw_diff_percent = np.abs((pre_weight - edw) / edw) * 100
+    post_edw_diff_percent = np.abs((post_weight - edw) / edw) * 100
+    pre_post_diff_percent = ((post_weight - pre_weight) / pre_weight) * 100
+
+    none = np.zeros(len(reference), dtype=bool)
+    return {
+        "protein": none,
+        "effluentVolume": none.copy(),
+        "lowBloodPressure": (pre_systolic < low_systolic) | (pre_diastolic < low_diastolic)
+                            | (post_systolic < low_systolic) | (post_diastolic < low_diastolic),
+        "fluidOverloadHigh": (pre_edw_diff_percent > 3) | (pre_post_diff_percent >= 1),
+        "highBloodPressure": (pre_systolic > high_systolic) | (pre_diastolic > high_diastolic)
+                             | (post_systolic > high_systolic) | (post_diastolic > high_diastolic),
+        "fluidOverloadWatch": (post_weight < edw) & (np.abs(post_edw_diff_percent) > 2),
+        "dialysisGrowthAdjustment": pre_edw_diff_percent > 3,
+    }
+
+
+def evaluate_notifications_batch(users: List[User], snapshots: Dict[int, PatientVitalsSnapshot]) -> Dict[int, Dict[str, bool]]:
+    """
+    evaluate_notifications for many patients, keyed by patient id. Patients
+    without both a pre and a post session get all flags off, as do patients
+    whose sex or birth date can't be used (logged).
+    """
+    results = {user.id: default_notifications() for user in users}
+    today = date.today()
+    ready = []
+    for user in users:
+        snapshot = snapshots.get(user.id)
+        if snapshot is None or snapshot.pre_session_id is None or snapshot.post_session_id is None:
+            continue
+        if user.birth_date is None or (user.sex or "").lower() not in SEXES:
+            logger.warning(f"Notifications: patient {user.id} has no usable sex or birth date")
+            continue
+        ready.append((user, snapshot))
+    if not ready:
+        return results
+
+    birth_dates = [user.birth_date for user, _ in ready]
+    flags = analyze_notifications_batch(
+        ages=[today.year - b.year - ((today.month, today.day) < (b.month, b.day)) for b in birth_dates],
+        genders=[user.sex for user, _ in ready],
+        heights=[user.height for user, _ in ready],
+        pre_systolic=[s.pre_systolic for _, s in ready],
+        pre_diastolic=[s.pre_diastolic for _, s in ready],
+        post_systolic=[s.post_systolic for _, s in ready],
+        post_diastolic=[s.post_diastolic for _, s in ready],
+        pre_weight=[s.pre_weight for _, s in ready],
+        post_weight=[s.post_weight for _, s in ready],
+        edw=[s.edw for _, s in ready],
+    )
+    for i, (user, _) in enumerate(ready):
+        results[user.id] = {name: bool(values[i]) for name, values in flags.items()}
+    return results
+
+
+def default_notifications() -> Dict[str, bool]:
+    """All notification flags off."""
+    return {
+        "protein": False,
+        "effluentVolume": False,
+        "lowBloodPressure": False,
+        "fluidOverloadHigh": False,
+        "highBloodPressure": False,
+        "fluidOverloadWatch": False,
+        "dialysisGrowthAdjustment": False
+    }
+
+
+def evaluate_notifications(user: User, snapshot: PatientVitalsSnapshot) -> Dict[str, bool]:
+    """Notification flags for `user` from their vitals snapshot."""
+    notifications = default_notifications()
+    # Both a pre and a post session are needed to compare them
+    if snapshot.pre_session_id is None or snapshot.post_session_id is None:
+        return notifications
+
+    # get bday
+    birth_date = user.birth_date
+    today = date.today()
+    age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+    # Blood pressure analysis
+    notifications.update(analyze_blood_pressure(
+        snapshot.pre_systolic,
+        snapshot.pre_diastolic,
+        snapshot.post_systolic,
+        snapshot.post_diastolic,
+        age,
+        user.sex,
+        user.height
+    ))
+
+    # Weight analysis
+    weight_notifications = analyze_weight(
+        snapshot.pre_weight,
+        snapshot.post_weight,
+        snapshot.edw,
+        snapshot.post_effluent_volume
+    )
+    notifications.update(weight_notifications)
+    return notifications
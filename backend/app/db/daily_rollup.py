@@ -0,0 +1,204 @@
+"""
+dialysis_daily_rollup: per patient and day, the sums and counts behind the
+daily averages of GET /analytics/daily.
+
+A chart of a year of one patient's data is at most 365 rows. Without the
+rollup, clients fetched up to twice as many sessions and averaged them
+themselves. Sums and counts are stored (not averages), so days can be
+combined across a provider's patients by summing them.
+
+Statement-level triggers on dialysis_sessions keep the rollup current, as
+they do patient_vitals_snapshot (app/db/vitals_snapshot.py). After each
+INSERT, UPDATE or DELETE, the (patient, day) rows the statement touched are
+recomputed from that day's sessions, once per statement. This holds whatever
+wrote the sessions, including the bulk loader. Each day's sessions are read
+through (patient_id, session_date), so only the partition of that month is
+scanned. Rows are created if missing and locked before they are recomputed,
+so concurrent writers of one patient-day queue up. A day whose last session
+is deleted loses its row.
+
+rebuild_daily_rollup recomputes the rollup from the sessions. The migration
+runs it to backfill, and scripts/rebuild_daily_rollup.py runs it after the
+triggers were disabled or the data was repaired.
+"""
+
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# Columns computed from one patient-day's sessions, shared by the trigger and the rebuild
+AGGREGATES_SQL = """
+    count(*) AS sessions,
+    count(*) FILTER (WHERE d.session_type = 'pre') AS pre_sessions,
+    count(*) FILTER (WHERE d.session_type = 'post') AS post_sessions,
+    coalesce(sum(d.weight) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_weight_sum,
+    coalesce(sum(d.systolic) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_systolic_sum,
+    coalesce(sum(d.diastolic) FILTER (WHERE d.session_type = 'pre'), 0) AS pre_diastolic_sum,
+    coalesce(sum(d.weight) FILTER (WHERE d.session_type = 'post'), 0) AS post_weight_sum,
+    coalesce(sum(d.systolic) FILTER (WHERE d.session_type = 'post'), 0) AS post_systolic_sum,
+    coalesce(sum(d.diastolic) FILTER (WHERE d.session_type = 'post'), 0) AS post_diastolic_sum,
+    coalesce(sum(d.effluent_volume) FILTER (WHERE d.session_type = 'post'), 0) AS post_effluent_sum
+"""
+AGGREGATE_COLUMNS = [
+    "sessions", "pre_sessions", "post_sessions",
+    "pre_weight_sum", "pre_systolic_sum", "pre_diastolic_sum",
+    "post_weight_sum", "post_systolic_sum", "post_diastolic_sum", "post_effluent_sum",
+]
+
+REFRESH_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION refresh_dialysis_daily_rollup(patient_ids integer[], days date[]) RETURNS void
+LANGUAGE plpgsql
+-- Planned once per connection; the month's partition is picked when the plan runs
+SET plan_cache_mode = force_generic_plan
+AS $$
+BEGIN
+    -- Users being deleted cascade to their sessions; their rollup rows go with them
+    INSERT INTO dialysis_daily_rollup (patient_id, day)
+    SELECT k.patient_id, k.day FROM unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = k.patient_id)
+    ORDER BY 1, 2
+    ON CONFLICT (patient_id, day) DO NOTHING;
+    PERFORM 1 FROM dialysis_daily_rollup r, unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE r.patient_id = k.patient_id AND r.day = k.day
+    ORDER BY r.patient_id, r.day FOR UPDATE OF r;
+
+    UPDATE dialysis_daily_rollup r
+    SET {", ".join(f"{c} = s.{c}" for c in AGGREGATE_COLUMNS)}
+    FROM unnest(patient_ids, days) AS k(patient_id, day)
+    CROSS JOIN LATERAL (
+        SELECT {AGGREGATES_SQL}
+        FROM dialysis_sessions d
+        WHERE d.patient_id = k.patient_id
+          AND d.session_date >= k.day AND d.session_date < k.day + 1
+    ) s
+    WHERE r.patient_id = k.patient_id AND r.day = k.day;
+
+    -- Days whose last session was deleted
+    DELETE FROM dialysis_daily_rollup r
+    USING unnest(patient_ids, days) AS k(patient_id, day)
+    WHERE r.patient_id = k.patient_id AND r.day = k.day AND r.sessions = 0;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION dialysis_sessions_refresh_daily_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    patient_ids integer[];
+    days date[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT DISTINCT patient_id, session_day FROM new_sessions) t;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT DISTINCT patient_id, session_day FROM old_sessions) t;
+    ELSE
+        SELECT array_agg(patient_id), array_agg(session_day) INTO patient_ids, days
+        FROM (SELECT patient_id, session_day FROM old_sessions
+              UNION SELECT patient_id, session_day FROM new_sessions) t;
+    END IF;
+    IF patient_ids IS NOT NULL THEN
+        PERFORM refresh_dialysis_daily_rollup(patient_ids, days);
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_insert
+    AFTER INSERT ON dialysis_sessions REFERENCING NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_update
+    AFTER UPDATE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+CREATE OR REPLACE TRIGGER dialysis_sessions_daily_rollup_delete
+    AFTER DELETE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_daily_rollup();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_insert ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_update ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_daily_rollup_delete ON dialysis_sessions;
+DROP FUNCTION IF EXISTS dialysis_sessions_refresh_daily_rollup();
+DROP FUNCTION IF EXISTS refresh_dialysis_daily_rollup(integer[], date[]);
+"""
+
+REBUILD_SQL = f"""
+INSERT INTO dialysis_daily_rollup (patient_id, day, {", ".join(AGGREGATE_COLUMNS)})
+SELECT d.patient_id, d.session_day, {AGGREGATES_SQL}
+FROM dialysis_sessions d
+WHERE (CAST(:start AS date) IS NULL OR d.session_date >= :start)
+  AND (CAST(:end AS date) IS NULL OR d.session_date < CAST(:end AS date) + 1)
+GROUP BY d.patient_id, d.session_day
+"""
+
+
+def install_daily_rollup_triggers(conn: Connection) -> bool:
+    """Create (or replace) the refresh function and triggers once both tables exist."""
+    tables = conn.execute(text(
+        "SELECT to_regclass('dialysis_sessions') IS NOT NULL AND to_regclass('dialysis_daily_rollup') IS NOT NULL"
+    )).scalar()
+    if not tables:
+        return False
+    conn.execute(text(REFRESH_FUNCTION_SQL))
+    conn.execute(text(TRIGGERS_SQL))
+    return True
+
+
+def rebuild_daily_rollup(conn: Connection, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Recompute the rollup rows of days start..end (inclusive; open-ended when
+    None) from the sessions; returns the rows written. The caller commits.
+    """
+    # Writers of these days wait until the rebuild commits instead of racing it
+    conn.execute(text("LOCK TABLE dialysis_daily_rollup IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(
+        "DELETE FROM dialysis_daily_rollup "
+        "WHERE (CAST(:start AS date) IS NULL OR day >= :start) AND (CAST(:end AS date) IS NULL OR day <= :end)"
+    ), {"start": start, "end": end})
+    return conn.execute(text(REBUILD_SQL), {"start": start, "end": end}).rowcount
+
+
+def _average(total, count):
+    return func.sum(total) / func.nullif(func.sum(count), 0)
+
+
+def daily_averages(
+    db: Session,
+    patient_ids: List[int],
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+):
+    """
+    Per day in [start_day, end_day], the patients' average pre/post weight and
+    blood pressure and post-session effluent volume, from dialysis_daily_rollup.
+    Days without sessions are left out.
+    """
+    # Imported here: the model module installs the triggers defined above
+    from app.db.models.daily_rollup import DialysisDailyRollup as rollup
+
+    query = (
+        select(
+            rollup.day.label("date"),
+            _average(rollup.pre_weight_sum, rollup.pre_sessions).label("avg_pre_weight"),
+            _average(rollup.post_weight_sum, rollup.post_sessions).label("avg_post_weight"),
+            _average(rollup.pre_systolic_sum, rollup.pre_sessions).label("avg_pre_systolic"),
+            _average(rollup.pre_diastolic_sum, rollup.pre_sessions).label("avg_pre_diastolic"),
+            _average(rollup.post_systolic_sum, rollup.post_sessions).label("avg_post_systolic"),
+            _average(rollup.post_diastolic_sum, rollup.post_sessions).label("avg_post_diastolic"),
+            _average(rollup.post_effluent_sum, rollup.post_sessions).label("avg_effluent"),
+        )
+        .where(rollup.patient_id.in_(patient_ids))
+        .group_by(rollup.day)
+        .order_by(rollup.day)
+    )
+    if start_day:
+        query = query.where(rollup.day >= start_day)
+    if end_day:
+        query = query.where(rollup.day <= end_day)
+    return db.execute(query).all()
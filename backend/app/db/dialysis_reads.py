@@ -0,0 +1,103 @@
+"""
+Postgres reads of dialysis sessions in the same shape the FHIR search returns,
+so either source can serve GET /dialysis/sessions.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from app.db.models.dialysis import DialysisSession
+from app.helpers.date_time import normalize_to_utc_day_bounds, to_naive_utc
+
+logger = logging.getLogger(__name__)
+
+# Patients dialyse nightly, so their latest session is almost always this recent.
+LATEST_SESSION_WINDOW = timedelta(days=90)
+
+
+def dialysis_session_as_dict(session: DialysisSession) -> dict:
+    """Row -> session dict keyed like the FHIR parser's output (id is the session_id)."""
+    return {
+        "patient_id": session.patient_id,
+        "session_id": session.session_id,
+        "id": session.session_id,
+        "session_date": session.session_date,
+        "session_type": session.session_type,
+        "weight": session.weight,
+        "diastolic": session.diastolic,
+        "systolic": session.systolic,
+        "effluent_volume": session.effluent_volume,
+        "session_duration": session.session_duration,
+        "protein": session.protein,
+    }
+
+
+def dialysis_sessions_statement(
+    patient_id: int,
+    start_date: Optional[datetime] = None,
+    end_date:   Optional[datetime] = None,
+    limit:      Optional[int]  = 1000,
+):
+    """SELECT of a patient's sessions within the UTC day bounds, newest first."""
+    start_dt, end_dt = normalize_to_utc_day_bounds(start_date, end_date)
+    stmt = select(DialysisSession).where(DialysisSession.patient_id == patient_id)
+    if start_dt:
+        stmt = stmt.where(DialysisSession.session_date >= to_naive_utc(start_dt))
+    if end_dt:
+        stmt = stmt.where(DialysisSession.session_date <= to_naive_utc(end_dt))
+    stmt = stmt.order_by(DialysisSession.session_date.desc(), DialysisSession.id.desc())
+    return stmt if limit is None else stmt.limit(limit)
+
+
+def query_dialysis_sessions(
+    db: Session,
+    patient_id: int,
+    start_date: Optional[datetime] = None,
+    end_date:   Optional[datetime] = None,
+    limit:      Optional[int]  = 1000,
+) -> List[dict]:
+    """A patient's sessions within the UTC day bounds, newest first."""
+    sessions = db.execute(dialysis_sessions_statement(patient_id, start_date, end_date, limit)).scalars()
+    return [dialysis_session_as_dict(session) for session in sessions]
+
+
+def latest_session_statement(patient_id: int, session_type: str, since: Optional[datetime] = None):
+    stmt = (
+        select(DialysisSession)
+        .where(DialysisSession.patient_id == patient_id, DialysisSession.session_type == session_type)
+        .order_by(DialysisSession.session_date.desc())
+        .limit(1)
+    )
+    return stmt if since is None else stmt.where(DialysisSession.session_date >= since)
+
+
+def latest_dialysis_session(db: Session, patient_id: int, session_type: str) -> Optional[DialysisSession]:
+    """
+    The patient's newest session of `session_type`. The last
+    LATEST_SESSION_WINDOW is searched first, which only touches the partitions
+    of those months; the full history only when that window has none.
+    """
+    since = datetime.utcnow() - LATEST_SESSION_WINDOW
+    latest = db.execute(latest_session_statement(patient_id, session_type, since)).scalars().first()
+    if latest is None:
+        latest = db.execute(latest_session_statement(patient_id, session_type)).scalars().first()
+    return latest
+
+
+def has_sessions_between(
+    db: Session,
+    patient_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> bool:
+    """Whether the patient logged any session in [start_date, end_date]; one index probe."""
+    query = select(DialysisSession.id).where(DialysisSession.patient_id == patient_id)
+    if start_date:
+        query = query.where(DialysisSession.session_date >= to_naive_utc(start_date))
+    if end_date:
+        query = query.where(DialysisSession.session_date <= to_naive_utc(end_date))
+    return db.execute(select(exists(query))).scalar()
@@ -0,0 +1,194 @@
+"""
+Circuit breaker for calls to HAPI FHIR.
+
+The breaker sits in the transport of the shared FHIR clients, so every FHIR
+request is counted. It trips open when, over the last FHIR_BREAKER_WINDOW_SIZE
+calls, either the failure rate (transport errors, 5xx, 429) or the slow-call
+rate exceeds its threshold. While open, requests fail fast with
+FhirCircuitOpenError. After FHIR_BREAKER_OPEN_SECONDS a few half-open probe
+requests are let through: if they all succeed the breaker closes, and if any
+fails it opens again.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class FhirCircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, window_size, min_calls, failure_rate, slow_call_seconds, slow_call_rate,
+                 open_seconds, half_open_probes):
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window_size)  # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def is_open(self) -> bool:
+        """True while requests are being rejected, without claiming a probe slot."""
+        with self._lock:
+            return self._state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                logger.info("FHIR circuit half-open, probing")
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, duration: float, failed: bool):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if failed or slow:
+                    self._trip("probe failed" if failed else f"probe took {duration:.2f}s")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info("FHIR circuit closed")
+                return
+            if self._state == OPEN:
+                # A request admitted before the breaker tripped; nothing to decide.
+                return
+            self._calls.append((failed, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._calls if f) / len(self._calls)
+            slow_calls = sum(1 for _, s in self._calls if s) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._trip(f"failure rate {failures:.0%}")
+            elif slow_calls >= self.slow_call_rate:
+                self._trip(f"slow-call rate {slow_calls:.0%}")
+
+    def _trip(self, reason):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.times_opened += 1
+        logger.warning(f"FHIR circuit opened ({reason}); failing fast for {self.open_seconds}s")
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._calls.clear()
+            self._probes_in_flight = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": settings.FHIR_BREAKER_ENABLED,
+                "state": self._state,
+                "window_calls": len(self._calls),
+                "window_failures": sum(1 for f, _ in self._calls if f),
+                "window_slow_calls": sum(1 for _, s in self._calls if s),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+fhir_circuit_breaker = CircuitBreaker(
+    window_size=settings.FHIR_BREAKER_WINDOW_SIZE,
+    min_calls=settings.FHIR_BREAKER_MIN_CALLS,
+    failure_rate=settings.FHIR_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.FHIR_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=settings.FHIR_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.FHIR_BREAKER_OPEN_SECONDS,
+    half_open_probes=settings.FHIR_BREAKER_HALF_OPEN_PROBES,
+)
+
+
+def _response_failed(response: httpx.Response) -> bool:
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class FhirBreakerAsyncTransport(httpx.AsyncBaseTransport):
+    """Async transport that routes every request through a CircuitBreaker."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not settings.FHIR_BREAKER_ENABLED:
+            return await self.inner.handle_async_request(request)
+        if not self.breaker.allow_request():
+            raise FhirCircuitOpenError("FHIR circuit breaker is open", request=request)
+        started = time.monotonic()
+        try:
+            response = await self.inner.handle_async_request(request)
+        except (Exception, asyncio.CancelledError):
+            # Cancellation means a caller's deadline expired, which counts against FHIR too.
+            self.breaker.record(time.monotonic() - started, failed=True)
+            raise
+        self.breaker.record(time.monotonic() - started, failed=_response_failed(response))
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class FhirBreakerTransport(httpx.BaseTransport):
+    """Sync counterpart of FhirBreakerAsyncTransport."""
+
+    def __init__(self, inner: httpx.BaseTransport, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not settings.FHIR_BREAKER_ENABLED:
+            return self.inner.handle_request(request)
+        if not self.breaker.allow_request():
+            raise FhirCircuitOpenError("FHIR circuit breaker is open", request=request)
+        started = time.monotonic()
+        try:
+            response = self.inner.handle_request(request)
+        except Exception:
+            self.breaker.record(time.monotonic() - started, failed=True)
+            raise
+        self.breaker.record(time.monotonic() - started, failed=_response_failed(response))
+        return response
+
+    def close(self):
+        self.inner.close()
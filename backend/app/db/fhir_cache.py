@@ -0,0 +1,155 @@
+"""
+Read-through cache for FHIR dialysis-session (Procedure) searches.
+
+Entries are keyed on the patient and the normalized UTC day bounds of the
+search, expire after a TTL and are evicted least-recently-used once the cache
+is full. The cache is per process. The process that commits a write of a
+patient's sessions calls invalidate_patient() right after the commit, and the
+outbox worker does again once the write reached FHIR. Other processes notice
+both through the patient's shared generation (app/db/fhir_cache_generations.py):
+a cached result fetched at an older generation is treated as a miss.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.fhir_integration import fhir_search_dialysis_sessions
+from app.db.fhir_cache_generations import fhir_cache_generation
+from app.helpers.date_time import normalize_to_utc_day_bounds
+
+logger = logging.getLogger(__name__)
+
+
+class FhirSessionCache:
+    """LRU + TTL cache of parsed session lists, with per-patient invalidation."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, shared generation, sessions)
+        self._generations = {}         # patient_id -> bumped on every invalidation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.shared_invalidations = 0
+
+    @staticmethod
+    def make_key(patient_id, start_date, end_date, limit):
+        start_dt, end_dt = normalize_to_utc_day_bounds(start_date, end_date)
+        return (
+            patient_id,
+            start_dt.isoformat() if start_dt else None,
+            end_dt.isoformat() if end_dt else None,
+            limit,
+        )
+
+    def generation(self, patient_id) -> int:
+        with self._lock:
+            return self._generations.get(patient_id, 0)
+
+    def get(self, key, shared_generation: Optional[int] = None):
+        """The cached result, unless it expired or was fetched before the patient's shared generation."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, fetched_at_generation, sessions = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if shared_generation is not None and fetched_at_generation != shared_generation:
+                # Another process wrote the patient's sessions since
+                del self._entries[key]
+                self.shared_invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return sessions
+
+    def set(self, key, sessions, generation: int, shared_generation: Optional[int] = None):
+        """Store a result unless the patient was invalidated while it was fetched."""
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, shared_generation, sessions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_patient(self, patient_id):
+        with self._lock:
+            self._generations[patient_id] = self._generations.get(patient_id, 0) + 1
+            stale = [key for key in self._entries if key[0] == patient_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.FHIR_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "shared_invalidations": self.shared_invalidations,
+            }
+
+
+fhir_session_cache = FhirSessionCache(
+    max_entries=settings.FHIR_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.FHIR_CACHE_TTL_SECONDS,
+)
+
+
+async def cached_fhir_search_dialysis_sessions(
+    patient_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date:   Optional[datetime] = None,
+    limit:      int            = 1000,
+    db:         Optional[AsyncSession] = None,
+) -> List[dict]:
+    """
+    fhir_search_dialysis_sessions() behind the session cache. With `db`, the
+    patient's shared generation is checked, so writes made by other processes
+    are seen; without it only this process's writes are.
+    The returned list is shared with the cache and must not be mutated.
+    """
+    if not settings.FHIR_CACHE_ENABLED or patient_id is None:
+        return await fhir_search_dialysis_sessions(patient_id, start_date, end_date, limit)
+
+    key = FhirSessionCache.make_key(patient_id, start_date, end_date, limit)
+    shared_generation = await fhir_cache_generation(db, patient_id) if db is not None else None
+    sessions = fhir_session_cache.get(key, shared_generation)
+    if sessions is not None:
+        return sessions
+
+    generation = fhir_session_cache.generation(patient_id)
+    sessions = await fhir_search_dialysis_sessions(patient_id, start_date, end_date, limit)
+    fhir_session_cache.set(key, sessions, generation, shared_generation)
+    return sessions
@@ -0,0 +1,64 @@
+"""
+Cross-process invalidation of the FHIR session cache (app/db/fhir_cache.py).
+
+Every process keeps its own cache and drops a patient's entries itself when
+it commits or drains a write of the patient's sessions. The other processes
+learn of the write from fhir_cache_generations, a counter per patient.
+Statement-level triggers on fhir_outbox bump it when entries are queued (in
+the transaction of the session write) and when they are deleted after the
+push to FHIR. A cached result remembers the counter it was fetched at, and a
+lookup that finds the counter has moved on is a miss.
+"""
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.fhir_cache_generation import FhirCacheGeneration
+
+FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION fhir_outbox_bump_cache_generation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO fhir_cache_generations (patient_id, generation)
+        SELECT DISTINCT patient_id, 1 FROM new_entries WHERE patient_id IS NOT NULL ORDER BY 1
+        ON CONFLICT (patient_id) DO UPDATE SET generation = fhir_cache_generations.generation + 1;
+    ELSE
+        INSERT INTO fhir_cache_generations (patient_id, generation)
+        SELECT DISTINCT patient_id, 1 FROM old_entries WHERE patient_id IS NOT NULL ORDER BY 1
+        ON CONFLICT (patient_id) DO UPDATE SET generation = fhir_cache_generations.generation + 1;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER fhir_outbox_cache_generation_insert
+    AFTER INSERT ON fhir_outbox REFERENCING NEW TABLE AS new_entries
+    FOR EACH STATEMENT EXECUTE FUNCTION fhir_outbox_bump_cache_generation();
+CREATE OR REPLACE TRIGGER fhir_outbox_cache_generation_delete
+    AFTER DELETE ON fhir_outbox REFERENCING OLD TABLE AS old_entries
+    FOR EACH STATEMENT EXECUTE FUNCTION fhir_outbox_bump_cache_generation();
+"""
+
+
+def install_fhir_cache_generation_triggers(conn: Connection) -> bool:
+    """Create (or replace) the bump function and triggers once both tables exist."""
+    tables = conn.execute(text(
+        "SELECT to_regclass('fhir_outbox') IS NOT NULL AND to_regclass('fhir_cache_generations') IS NOT NULL"
+    )).scalar()
+    if not tables:
+        return False
+    conn.execute(text(FUNCTION_SQL))
+    conn.execute(text(TRIGGERS_SQL))
+    return True
+
+
+async def fhir_cache_generation(db: AsyncSession, patient_id: int) -> int:
+    """The patient's shared cache generation; 0 before their first FHIR write."""
+    generation = (await db.execute(
+        select(FhirCacheGeneration.generation).where(FhirCacheGeneration.patient_id == patient_id)
+    )).scalar()
+    return generation or 0
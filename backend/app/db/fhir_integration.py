@@ -1,5 +1,9 @@
+import asyncio
+import json
+import logging
+import re
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 
 import httpx
 from fhir.resources.R4B.patient import Patient
@@ -9,9 +13,9 @@ from fhir.resources.R4B.codeableconcept import CodeableConcept
 from fhir.resources.R4B.coding import Coding
 from fhir.resources.R4B.extension import Extension
 from fhir.resources.R4B.quantity import Quantity
-from fhir.resources.R4B.bundle import Bundle
 from fhir.resources.R4B.humanname import HumanName
 from app.core.config import settings
+from app.db.fhir_breaker import fhir_circuit_breaker, FhirBreakerAsyncTransport, FhirBreakerTransport
 from app.helpers.date_time import normalize_to_utc_day_bounds
 
 HAPI_FHIR_BASE_URL = settings.HAPI_FHIR_BASE_URL
@@ -19,12 +23,159 @@ HAPI_FHIR_HEADERS={"Accept": "application/fhir+json", "Content-Type": "applicati
 HAPI_FHIR_PATIENT_ID_BASE="KIDNEKT-PATIENT-ID-"
 HAPI_FHIR_PROCEDURE_ID_BASE="KIDNEKT-PROCEDURE-ID-"
 
+logger = logging.getLogger(__name__)
+
+
+def fhir_dialysis_session_id(patient_id, session_id) -> str:
+    """FHIR id of a session's Procedure; session_id is only unique per patient."""
+    return f"{HAPI_FHIR_PROCEDURE_ID_BASE}{patient_id}-{session_id}"
+
+
+def _fhir_session_id_from(raw_id) -> int:
+    # "<base><patient_id>-<session_id>"; ids from before the patient was
+    # part of them ("<base><session_id>") parse the same way
+    return int(raw_id.rsplit("-", 1)[-1])
+
+# Process-wide pooled clients. They are opened in the FastAPI lifespan via
+# init_fhir_clients(); the getters below lazily create them for scripts that
+# never run the lifespan. Never use them as context managers, that would close
+# the shared pool for every other caller.
+_fhir_async_client: Optional[httpx.AsyncClient] = None
+_fhir_sync_client: Optional[httpx.Client] = None
+_fhir_request_count = {"async": 0, "sync": 0}
+# Transports used instead of real HTTP, e.g. a benchmark's fake server; still wrapped by the breaker.
+_fhir_transport_override = {"async": None, "sync": None}
+
+
+def _fhir_client_options():
+    return {
+        "base_url": HAPI_FHIR_BASE_URL,
+        "headers": HAPI_FHIR_HEADERS,
+        "timeout": httpx.Timeout(
+            connect=settings.FHIR_CONNECT_TIMEOUT,
+            read=settings.FHIR_READ_TIMEOUT,
+            write=settings.FHIR_WRITE_TIMEOUT,
+            pool=settings.FHIR_POOL_TIMEOUT,
+        ),
+    }
+
+
+def _fhir_transport_options():
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.FHIR_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.FHIR_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.FHIR_KEEPALIVE_EXPIRY,
+        ),
+        "http2": settings.FHIR_HTTP2,
+    }
+
+
+def _fhir_async_transport():
+    inner = _fhir_transport_override["async"] or httpx.AsyncHTTPTransport(**_fhir_transport_options())
+    return FhirBreakerAsyncTransport(inner, fhir_circuit_breaker)
+
+
+def _fhir_sync_transport():
+    inner = _fhir_transport_override["sync"] or httpx.HTTPTransport(**_fhir_transport_options())
+    return FhirBreakerTransport(inner, fhir_circuit_breaker)
+
+
+async def use_fhir_transports(async_transport=None, sync_transport=None):
+    """
+    Send all FHIR traffic through the given httpx transports (for example
+    scripts/fhir_fake_server.py's); call with no arguments to go back to real HTTP.
+    """
+    await close_fhir_clients()
+    _fhir_transport_override["async"] = async_transport
+    _fhir_transport_override["sync"] = sync_transport
+
+
+async def _fhir_count_async_request(request):
+    _fhir_request_count["async"] += 1
+
+
+def _fhir_count_sync_request(request):
+    _fhir_request_count["sync"] += 1
+
 
 def _fhir_get_async_client():
-    return httpx.AsyncClient(base_url=HAPI_FHIR_BASE_URL, headers=HAPI_FHIR_HEADERS)
+    global _fhir_async_client
+    if _fhir_async_client is None or _fhir_async_client.is_closed:
+        _fhir_async_client = httpx.AsyncClient(
+            transport=_fhir_async_transport(),
+            event_hooks={"request": [_fhir_count_async_request]},
+            **_fhir_client_options()
+        )
+    return _fhir_async_client
 
 def _fhir_get_sync_client():
-    return httpx.Client(base_url=HAPI_FHIR_BASE_URL, headers=HAPI_FHIR_HEADERS)
+    global _fhir_sync_client
+    if _fhir_sync_client is None or _fhir_sync_client.is_closed:
+        _fhir_sync_client = httpx.Client(
+            transport=_fhir_sync_transport(),
+            event_hooks={"request": [_fhir_count_sync_request]},
+            **_fhir_client_options()
+        )
+    return _fhir_sync_client
+
+
+def init_fhir_clients():
+    """Open the shared FHIR clients; call once from the application lifespan."""
+    _fhir_get_async_client()
+    _fhir_get_sync_client()
+    logger.info(
+        f"FHIR clients ready (max_connections={settings.FHIR_MAX_CONNECTIONS}, "
+        f"keepalive={settings.FHIR_MAX_KEEPALIVE_CONNECTIONS}, http2={settings.FHIR_HTTP2})"
+    )
+
+
+async def close_fhir_clients():
+    """Close the shared FHIR clients and drop their pooled connections."""
+    global _fhir_async_client, _fhir_sync_client
+    if _fhir_async_client is not None:
+        await _fhir_async_client.aclose()
+        _fhir_async_client = None
+    if _fhir_sync_client is not None:
+        _fhir_sync_client.close()
+        _fhir_sync_client = None
+    logger.info("FHIR clients closed")
+
+
+def _fhir_pool_usage(client):
+    # httpx does not expose pool state publicly, so read it off the httpcore
+    # pool defensively; an unknown transport simply reports no connections.
+    transport = getattr(client, "_transport", None)
+    transport = getattr(transport, "inner", transport)
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    pending = list(getattr(pool, "_requests", []) or [])
+    idle = sum(1 for conn in connections if conn.is_idle())
+    return {
+        "open_connections": len(connections),
+        "idle_connections": idle,
+        "active_connections": len(connections) - idle,
+        "queued_requests": sum(1 for req in pending if req.is_queued()),
+    }
+
+
+def fhir_pool_stats():
+    """Pool utilisation of the shared FHIR clients, for the metrics endpoint."""
+    stats = {
+        "max_connections": settings.FHIR_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.FHIR_MAX_KEEPALIVE_CONNECTIONS,
+        "http2": settings.FHIR_HTTP2,
+    }
+    for name, client in (("async", _fhir_async_client), ("sync", _fhir_sync_client)):
+        if client is None or client.is_closed:
+            stats[name] = {"open": False, "requests": _fhir_request_count[name]}
+            continue
+        stats[name] = {
+            "open": True,
+            "requests": _fhir_request_count[name],
+            **_fhir_pool_usage(client),
+        }
+    return stats
 
 def _fhir_create_patient_resource_ext(height):
     return Extension(
@@ -38,31 +189,35 @@ def _fhir_create_patient_resource_ext(height):
     )
 
 
+def _fhir_build_patient_resource(patient_id, name, birth_date, gender, height):
+    given_name, family_name = name.split(" ")
+    return Patient(
+        id=HAPI_FHIR_PATIENT_ID_BASE + str(patient_id),
+        name=[HumanName(
+            given=[given_name],
+            family=family_name
+        )],
+        active=True,
+        gender=gender,
+        birthDate=str(birth_date),
+        extension=[_fhir_create_patient_resource_ext(height)]
+    )
+
+
 def sync_fhir_create_patient_resource(patient_id, name, birth_date, gender, height):
     '''
     gender: "male" | "female" | "other" | "unknown"
     birth_date: datetime.date object or string formtted as yyyy-mm-dd
     name: <first name> <last name>
     '''
-    with _fhir_get_sync_client() as hapi_client:
-        given_name, family_name = name.split(" ")
-        patient_rsc = Patient(
-            id=HAPI_FHIR_PATIENT_ID_BASE + str(patient_id),
-            name=[HumanName(
-                given=[given_name],
-                family=family_name
-            )],
-            active=True,
-            gender=gender,
-            birthDate=str(birth_date),
-            extension=[_fhir_create_patient_resource_ext(height)]
-        )
-        response = hapi_client.put(
-            f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}",
-            content=patient_rsc.model_dump_json()
-        )
-        response.raise_for_status()
-        return response.json()
+    hapi_client = _fhir_get_sync_client()
+    patient_rsc = _fhir_build_patient_resource(patient_id, name, birth_date, gender, height)
+    response = hapi_client.put(
+        f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}",
+        content=patient_rsc.model_dump_json()
+    )
+    response.raise_for_status()
+    return response.json()
 
 
 async def fhir_create_patient_resource(patient_id, name, birth_date, gender, height):
@@ -71,87 +226,129 @@ async def fhir_create_patient_resource(patient_id, name, birth_date, gender, hei
     birth_date: datetime.date object or string formtted as yyyy-mm-dd
     name: <first name> <last name>
     '''
-    async with _fhir_get_async_client() as hapi_client:
-        given_name, family_name = name.split(" ")
-        patient_rsc = Patient(
-            id=HAPI_FHIR_PATIENT_ID_BASE + str(patient_id),
-            name=[HumanName(
-                given=[given_name],
-                family=family_name
-            )],
-            active=True,
-            gender=gender,
-            birthDate=str(birth_date),
-            extension=[_fhir_create_patient_resource_ext(height)]
-        )
-        response = await hapi_client.put(
-            f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}",
-            content=patient_rsc.model_dump_json()
-        )
-        response.raise_for_status()
-        return response.json()
+    hapi_client = _fhir_get_async_client()
+    patient_rsc = _fhir_build_patient_resource(patient_id, name, birth_date, gender, height)
+    response = await hapi_client.put(
+        f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}",
+        content=patient_rsc.model_dump_json()
+    )
+    response.raise_for_status()
+    return response.json()
 
 
 async def fhir_get_patient_resource(patient_id):
     '''
     patient_id: patient's id as given by kidnekt backend, NOT the hapi fhir version. Must be prefixed by HAPI_FHIR_PATIENT_ID_BASE TO AVOID ERRORS
     '''
-    async with _fhir_get_async_client() as hapi_client:
-        response = await hapi_client.get(
-            f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}"
-        )
-        response.raise_for_status()
-        patient_rsc = Patient(**response.json())
-        obj = {
-            "id": int(patient_rsc.id[len(HAPI_FHIR_PATIENT_ID_BASE):]),
-            "name": f"{patient_rsc.name[0].given[0]} {patient_rsc.name[0].family}",
-            "height": float(patient_rsc.extension[0].valueQuantity.value)
-        }
-        return obj
+    hapi_client = _fhir_get_async_client()
+    response = await hapi_client.get(
+        f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}"
+    )
+    response.raise_for_status()
+    patient_rsc = Patient(**response.json())
+    obj = {
+        "id": int(patient_rsc.id[len(HAPI_FHIR_PATIENT_ID_BASE):]),
+        "name": f"{patient_rsc.name[0].given[0]} {patient_rsc.name[0].family}",
+        "height": float(patient_rsc.extension[0].valueQuantity.value)
+    }
+    return obj
 
 
 
-async def fhir_search_dialysis_sessions(
+def _fhir_dialysis_session_search_params(patient_id, start_date, end_date, page_size):
+    # normalize your bounds once
+    start_dt, end_dt = normalize_to_utc_day_bounds(start_date, end_date)
+
+    # build a list of tuples so you can send both ge… and le… keys
+    params = [
+        ("_sort", "-date"),
+        ("_count", str(page_size)),
+    ]
+    if patient_id is not None:
+        params.append(("subject", f"Patient/{HAPI_FHIR_PATIENT_ID_BASE}{patient_id}"))
+    if start_dt:
+        params.append(("date", f"ge{start_dt.isoformat()}"))
+    if end_dt:
+        params.append(("date", f"le{end_dt.isoformat()}"))
+    return params
+
+
+def _fhir_bundle_next_url(bundle):
+    for link in bundle.get("link") or []:
+        if link.get("relation") == "next":
+            return link.get("url")
+    return None
+
+
+async def fhir_iter_dialysis_session_pages(
     patient_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date:   Optional[datetime] = None,
-    limit:      int            = 1000
-) -> List[dict]:
-    async with _fhir_get_async_client() as hapi_client:
-        # normalize your bounds once
-        start_dt, end_dt = normalize_to_utc_day_bounds(start_date, end_date)
-
-        # build a list of tuples so you can send both ge… and le… keys
-        params = [
-            ("_sort", "-date"),
-            ("_count", str(limit)),
-            ("_pretty", "true"),
-        ]
-        if patient_id is not None:
-            params.append(("subject", f"Patient/{HAPI_FHIR_PATIENT_ID_BASE}{patient_id}"))
-        if start_dt:
-            params.append(("date", f"ge{start_dt.isoformat()}"))
-        if end_dt:
-            params.append(("date", f"le{end_dt.isoformat()}"))
-
-        # no trailing '?' on the path
-        response = await hapi_client.get("Procedure", params=params)
+    page_size:  Optional[int]  = None,
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield parsed dialysis sessions one searchset page at a time, following the
+    Bundle's next links. Only the current page is held in memory.
+    """
+    hapi_client = _fhir_get_async_client()
+    page_size = page_size or settings.FHIR_SEARCH_PAGE_SIZE
+    params = _fhir_dialysis_session_search_params(patient_id, start_date, end_date, page_size)
+
+    # no trailing '?' on the path
+    response = await hapi_client.get("Procedure", params=params)
+    while True:
         response.raise_for_status()
+        bundle = response.json()
+        yield [
+            fhir_parse_dialysis_session(entry["resource"])
+            for entry in (bundle.get("entry") or [])
+            if "resource" in entry
+        ]
+        next_url = _fhir_bundle_next_url(bundle)
+        if not next_url:
+            return
+        response = await hapi_client.get(next_url)
 
-        bundle_rsc = Bundle(**response.json())
-        sessions = []
-        for entry in (bundle_rsc.entry or []):
-            sessions.append(_fhir_parse_dialysis_session_resource(entry.resource))
-        return sessions
 
+async def fhir_iter_dialysis_sessions(
+    patient_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date:   Optional[datetime] = None,
+    page_size:  Optional[int]  = None,
+) -> AsyncIterator[dict]:
+    """Yield parsed dialysis sessions, newest first, across all result pages."""
+    async for page in fhir_iter_dialysis_session_pages(patient_id, start_date, end_date, page_size):
+        for session in page:
+            yield session
 
-async def fhir_delete_dialysis_session_resource(session_id):
-    async with _fhir_get_async_client() as hapi_client:
-        response = await hapi_client.delete(
-            f"Procedure/{HAPI_FHIR_PROCEDURE_ID_BASE + str(session_id)}"
-        )
-        response.raise_for_status()
-        return response.json()
+
+async def fhir_search_dialysis_sessions(
+    patient_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date:   Optional[datetime] = None,
+    limit:      Optional[int]  = 1000
+) -> List[dict]:
+    """Collect up to `limit` sessions (all of them when limit is None)."""
+    page_size = min(limit, settings.FHIR_SEARCH_PAGE_SIZE) if limit else None
+    sessions = []
+    pages = fhir_iter_dialysis_session_pages(patient_id, start_date, end_date, page_size)
+    try:
+        async for page in pages:
+            sessions.extend(page)
+            if limit is not None and len(sessions) >= limit:
+                return sessions[:limit]
+    finally:
+        await pages.aclose()
+    return sessions
+
+
+async def fhir_delete_dialysis_session_resource(patient_id, session_id):
+    hapi_client = _fhir_get_async_client()
+    response = await hapi_client.delete(
+        f"Procedure/{fhir_dialysis_session_id(patient_id, session_id)}"
+    )
+    response.raise_for_status()
+    return response.json()
 
 
 def _fhir_create_dialysis_session_resource_ext(session_type, weight, diastolic, systolic, effluent_volume, duration, protein):
@@ -222,49 +419,130 @@ def _fhir_create_dialysis_session_resource_ext(session_type, weight, diastolic,
     )
 
 
-async def fhir_create_dialysis_session_resource(session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein):
-    async with _fhir_get_async_client() as hapi_client:
-        procedure_rsc = Procedure(
-            id=HAPI_FHIR_PROCEDURE_ID_BASE + str(session_id),
-            status="completed",
-            code=CodeableConcept(
-                coding=[
-                    Coding(
-                        system="http://snomed.info/sct",
-                        code="108241001",
-                        display="CCPD"
-                    )
-                ]
-            ),
-            subject=Reference(reference=f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}"),
-            performedDateTime=f"{date}T00:00:00Z",
-            extension=[_fhir_create_dialysis_session_resource_ext(
-                session_type=session_type,
-                weight=weight,
-                diastolic=diastolic,
-                systolic=systolic,
-                effluent_volume=effluent_volume,
-                duration=duration,
-                protein=protein
-            )]
-        )
+def _fhir_build_dialysis_session_resource(session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein):
+    return Procedure(
+        id=fhir_dialysis_session_id(patient_id, session_id),
+        status="completed",
+        code=CodeableConcept(
+            coding=[
+                Coding(
+                    system="http://snomed.info/sct",
+                    code="108241001",
+                    display="CCPD"
+                )
+            ]
+        ),
+        subject=Reference(reference=f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}"),
+        performedDateTime=f"{date}T00:00:00Z",
+        extension=[_fhir_create_dialysis_session_resource_ext(
+            session_type=session_type,
+            weight=weight,
+            diastolic=diastolic,
+            systolic=systolic,
+            effluent_volume=effluent_volume,
+            duration=duration,
+            protein=protein
+        )]
+    )
 
-        response = await hapi_client.put(
-            f"Procedure/{HAPI_FHIR_PROCEDURE_ID_BASE + str(session_id)}",
-            content=procedure_rsc.model_dump_json()
-        )
-        response.raise_for_status()
-        return response.json()
 
+# Precompiled pieces of _fhir_build_dialysis_session_resource(...).model_dump_json(),
+# in the exact key order the model emits them.
+_FHIR_UCUM_SYSTEM = "http://unitsofmeasure.org"
+_FHIR_SESSION_QUANTITIES = (
+    # (extension url, unit, code)
+    ("weight", "kg", "kg"),
+    ("diastolic", "mmHg", "mm[Hg]"),
+    ("systolic", "mmHg", "mm[Hg]"),
+    ("effluent_volume", "mL", "mL"),
+    ("duration", "min", "min"),
+    ("protein", "g/L", "g/L"),
+)
+_FHIR_SESSION_QUANTITY_TEMPLATES = tuple(
+    (
+        f'{{"url":"{url}","valueQuantity":{{',
+        f'"unit":"{unit}","system":"{_FHIR_UCUM_SYSTEM}","code":"{code}"}}}}',
+    )
+    for url, unit, code in _FHIR_SESSION_QUANTITIES
+)
+_FHIR_SESSION_TEMPLATE_TAIL = (
+    '],"url":"dialysis-session"}],"status":"completed",'
+    '"code":{"coding":[{"system":"http://snomed.info/sct","code":"108241001","display":"CCPD"}]},'
+    '"subject":{"reference":"Patient/' + HAPI_FHIR_PATIENT_ID_BASE
+)
+_FHIR_TEMPLATE_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def _fhir_template_number(value):
+    """JSON for a FHIR decimal, or None when only the model renders it identically."""
+    if value is None:
+        return ""
+    if type(value) is int:
+        return f'"value":{value},'
+    if type(value) is float:
+        text = repr(value)
+        # Exponent forms, inf and nan are rendered differently by fhir.resources' Decimal.
+        if "e" not in text and "n" not in text:
+            return f'"value":{text},'
+    return None
+
+
+def fhir_dialysis_session_json(session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein) -> str:
+    """
+    Procedure JSON for one dialysis session, byte-identical to
+    _fhir_build_dialysis_session_resource(...).model_dump_json() but filled
+    in from a template. Values outside the template's simple cases (non-int
+    ids, exotic numbers, empty strings) go through the model instead.
+    """
+    numbers = [_fhir_template_number(v) for v in (weight, diastolic, systolic, effluent_volume, duration, protein)]
+    if (
+        None in numbers
+        or type(session_id) is not int or type(patient_id) is not int
+        or type(date) is not str or not _FHIR_TEMPLATE_DATE.fullmatch(date)
+        or not (session_type is None or (type(session_type) is str and session_type))
+    ):
+        return _fhir_build_dialysis_session_resource(
+            session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein
+        ).model_dump_json()
+
+    parts = [
+        '{"resourceType":"Procedure","id":"', fhir_dialysis_session_id(patient_id, session_id),
+        '","extension":[{"extension":[',
+        '{"url":"session_type"}' if session_type is None
+        else '{"url":"session_type","valueString":' + json.dumps(session_type, ensure_ascii=False) + '}',
+    ]
+    for (head, tail), number in zip(_FHIR_SESSION_QUANTITY_TEMPLATES, numbers):
+        parts.append(",")
+        parts.append(head)
+        parts.append(number)
+        parts.append(tail)
+    parts.append(_FHIR_SESSION_TEMPLATE_TAIL)
+    parts.append(str(patient_id))
+    parts.append('"},"performedDateTime":"')
+    parts.append(date)
+    parts.append('T00:00:00Z"}')
+    return "".join(parts)
 
-async def fhir_get_dialysis_session_resource(session_id):
-    async with _fhir_get_async_client() as hapi_client:
-        response = await hapi_client.get(
-            f"Procedure/{HAPI_FHIR_PROCEDURE_ID_BASE + str(session_id)}"
+
+async def fhir_create_dialysis_session_resource(session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein):
+    hapi_client = _fhir_get_async_client()
+    response = await hapi_client.put(
+        f"Procedure/{fhir_dialysis_session_id(patient_id, session_id)}",
+        content=fhir_dialysis_session_json(
+            session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein
         )
-        response.raise_for_status()
-        procedure_rsc = Procedure(**response.json())
-        return _fhir_parse_dialysis_session_resource(procedure_rsc)
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def fhir_get_dialysis_session_resource(patient_id, session_id):
+    hapi_client = _fhir_get_async_client()
+    response = await hapi_client.get(
+        f"Procedure/{fhir_dialysis_session_id(patient_id, session_id)}"
+    )
+    response.raise_for_status()
+    return fhir_parse_dialysis_session(response.json())
 
 
 def _fhir_parse_dialysis_session_resource(procedure_rsc):
@@ -297,7 +575,7 @@ def _fhir_parse_dialysis_session_resource(procedure_rsc):
     except:
         pid = None
     try:
-        sid = int(raw_id.split(HAPI_FHIR_PROCEDURE_ID_BASE)[-1])
+        sid = _fhir_session_id_from(raw_id)
     except:
         sid = None
 
@@ -314,5 +592,201 @@ def _fhir_parse_dialysis_session_resource(procedure_rsc):
     }
 
 
+def _fhir_parse_dialysis_session_json(procedure):
+    """
+    Same result as _fhir_parse_dialysis_session_resource(), read straight from
+    the raw Procedure JSON without building fhir.resources models.
+    session_date is left as the FHIR dateTime string.
+    """
+    ext_root = None
+    for ext in procedure.get('extension') or []:
+        if ext.get('url') == 'dialysis-session':
+            ext_root = ext
+            break
+    if not ext_root:
+        return {}
+    data = {}
+    for sub in ext_root.get('extension') or []:
+        value = sub.get('valueString')
+        if value is None:
+            value = (sub.get('valueQuantity') or {}).get('value')
+            value = float(value) if value is not None else None
+        data[sub.get('url')] = value
+    raw_sub = (procedure.get('subject') or {}).get('reference') or ''
+    raw_id = procedure.get('id') or ''
+    try:
+        pid = int(raw_sub.split(f"Patient/{HAPI_FHIR_PATIENT_ID_BASE}")[-1])
+    except ValueError:
+        pid = None
+    try:
+        sid = _fhir_session_id_from(raw_id)
+    except ValueError:
+        sid = None
+    return {
+        'patient_id': pid,
+        'session_id': sid,
+        'id': sid,
+        'session_date': procedure.get('performedDateTime'),
+        **data
+    }
+
+
+def fhir_parse_dialysis_session(procedure: dict, strict: Optional[bool] = None) -> dict:
+    """
+    Parse one Procedure JSON object into a session dict. The lean parser is
+    used unless strict (default FHIR_STRICT_PARSING) asks for the resource
+    to be validated against the R4B Procedure model first.
+    """
+    if strict is None:
+        strict = settings.FHIR_STRICT_PARSING
+    if strict:
+        return _fhir_parse_dialysis_session_resource(Procedure(**procedure))
+    return _fhir_parse_dialysis_session_json(procedure)
+
+
+def fhir_dialysis_session_upsert_operation(session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein):
+    """Bulk operation that PUTs one dialysis-session Procedure."""
+    return {
+        "method": "PUT",
+        "url": f"Procedure/{fhir_dialysis_session_id(patient_id, session_id)}",
+        "resource": fhir_dialysis_session_json(
+            session_id, patient_id, date, session_type, weight, diastolic, systolic, effluent_volume, duration, protein
+        ),
+    }
+
+
+def fhir_procedure_delete_operation(procedure_id):
+    """Bulk operation that DELETEs the Procedure with this FHIR id."""
+    return {
+        "method": "DELETE",
+        "url": f"Procedure/{procedure_id}",
+        "resource": None,
+    }
+
+
+def fhir_dialysis_session_delete_operation(patient_id, session_id):
+    """Bulk operation that DELETEs one dialysis-session Procedure."""
+    return fhir_procedure_delete_operation(fhir_dialysis_session_id(patient_id, session_id))
+
+
+def fhir_patient_upsert_operation(patient_id, name, birth_date, gender, height):
+    """Bulk operation that PUTs one Patient."""
+    patient_rsc = _fhir_build_patient_resource(patient_id, name, birth_date, gender, height)
+    return {
+        "method": "PUT",
+        "url": f"Patient/{HAPI_FHIR_PATIENT_ID_BASE + str(patient_id)}",
+        "resource": patient_rsc.model_dump_json(),
+    }
+
+
+def _fhir_bundle_body(operations, bundle_type):
+    # Resources are already serialized JSON, so splice them in rather than
+    # re-validating every entry through a Bundle model.
+    entries = []
+    for op in operations:
+        request = json.dumps({"method": op["method"], "url": op["url"]})
+        if op["resource"] is None:
+            entries.append(f'{{"request":{request}}}')
+        else:
+            entries.append(f'{{"fullUrl":{json.dumps(op["url"])},"resource":{op["resource"]},"request":{request}}}')
+    return f'{{"resourceType":"Bundle","type":"{bundle_type}","entry":[{",".join(entries)}]}}'
+
+
+def _fhir_bundle_outcomes(operations, response=None, error=None):
+    """Map a batch/transaction response (or a chunk-level failure) to one outcome per operation."""
+    if error is None and response is not None and response.is_error:
+        error = f"HTTP {response.status_code}: {response.text[:500]}"
+    if error is not None:
+        return [{"url": op["url"], "method": op["method"], "ok": False, "status": None, "error": error} for op in operations]
+
+    entries = response.json().get("entry", [])
+    outcomes = []
+    for index, op in enumerate(operations):
+        entry_response = entries[index].get("response", {}) if index < len(entries) else {}
+        status_line = entry_response.get("status", "")
+        code = int(status_line.split(" ")[0]) if status_line[:3].isdigit() else None
+        ok = code is not None and code < 400
+        outcomes.append({
+            "url": op["url"],
+            "method": op["method"],
+            "ok": ok,
+            "status": code,
+            "error": None if ok else (json.dumps(entry_response["outcome"]) if entry_response.get("outcome")
+                                      else status_line or "missing entry response"),
+        })
+    return outcomes
+
+
+def _fhir_chunks(operations, chunk_size):
+    return [operations[i:i + chunk_size] for i in range(0, len(operations), chunk_size)]
+
+
+async def fhir_bulk_write(operations, bundle_type="batch", chunk_size=None, concurrency=None) -> List[dict]:
+    '''
+    Apply PUT/DELETE operations through FHIR batch or transaction Bundles.
+    operations: dicts built by the fhir_*_operation helpers
+    bundle_type: "batch" (entries succeed independently) | "transaction" (each chunk is all-or-nothing)
+    Returns one outcome dict per operation, in input order.
+    '''
+    if bundle_type not in ("batch", "transaction"):
+        raise ValueError("bundle_type must be 'batch' or 'transaction'")
+    chunk_size = chunk_size or settings.FHIR_BULK_CHUNK_SIZE
+    semaphore = asyncio.Semaphore(concurrency or settings.FHIR_BULK_CONCURRENCY)
+    hapi_client = _fhir_get_async_client()
+
+    async def post_chunk(chunk):
+        async with semaphore:
+            try:
+                # The Bundle is posted to the server base url, i.e. the empty relative path.
+                response = await hapi_client.post("", content=_fhir_bundle_body(chunk, bundle_type))
+            except httpx.HTTPError as e:
+                logger.error(f"FHIR bulk {bundle_type} of {len(chunk)} entries failed: {e}")
+                return _fhir_bundle_outcomes(chunk, error=f"{type(e).__name__}: {e}")
+            return _fhir_bundle_outcomes(chunk, response)
+
+    results = await asyncio.gather(*(post_chunk(chunk) for chunk in _fhir_chunks(operations, chunk_size)))
+    return [outcome for chunk_outcomes in results for outcome in chunk_outcomes]
+
+
+def sync_fhir_bulk_write(operations, bundle_type="batch", chunk_size=None) -> List[dict]:
+    '''
+    Blocking fhir_bulk_write() for scripts; chunks are posted one after another.
+    '''
+    if bundle_type not in ("batch", "transaction"):
+        raise ValueError("bundle_type must be 'batch' or 'transaction'")
+    hapi_client = _fhir_get_sync_client()
+    outcomes = []
+    for chunk in _fhir_chunks(operations, chunk_size or settings.FHIR_BULK_CHUNK_SIZE):
+        try:
+            response = hapi_client.post("", content=_fhir_bundle_body(chunk, bundle_type))
+        except httpx.HTTPError as e:
+            logger.error(f"FHIR bulk {bundle_type} of {len(chunk)} entries failed: {e}")
+            outcomes.extend(_fhir_bundle_outcomes(chunk, error=f"{type(e).__name__}: {e}"))
+            continue
+        outcomes.extend(_fhir_bundle_outcomes(chunk, response))
+    return outcomes
+
+
+async def fhir_bulk_upsert_dialysis_sessions(sessions, bundle_type="batch", chunk_size=None, concurrency=None) -> List[dict]:
+    '''
+    sessions: dicts with the keyword arguments of fhir_create_dialysis_session_resource
+    '''
+    operations = [fhir_dialysis_session_upsert_operation(**session) for session in sessions]
+    return await fhir_bulk_write(operations, bundle_type, chunk_size, concurrency)
+
+
+async def fhir_bulk_upsert_patients(patients, bundle_type="batch", chunk_size=None, concurrency=None) -> List[dict]:
+    '''
+    patients: dicts with the keyword arguments of fhir_create_patient_resource
+    '''
+    operations = [fhir_patient_upsert_operation(**patient) for patient in patients]
+    return await fhir_bulk_write(operations, bundle_type, chunk_size, concurrency)
+
+
+def sync_fhir_bulk_upsert_patients(patients, bundle_type="batch", chunk_size=None) -> List[dict]:
+    operations = [fhir_patient_upsert_operation(**patient) for patient in patients]
+    return sync_fhir_bulk_write(operations, bundle_type, chunk_size)
+
+
 
 ######################################################################################################
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""
+Transactional outbox for mirroring dialysis sessions to HAPI FHIR.
+
+Endpoints add an outbox row in the same transaction as the DialysisSession
+change, so a commit either records both or neither. FhirOutboxWorker drains
+the table in the background as FHIR batch Bundles: entries for the same FHIR
+resource are applied strictly in insertion order, failures are retried with
+exponential backoff, and entries that keep failing are parked as "failed"
+for inspection.
+"""
+
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.fhir_outbox import FhirOutbox
+from app.db.fhir_integration import (
+    fhir_bulk_write,
+    fhir_dialysis_session_id,
+    fhir_dialysis_session_upsert_operation,
+    fhir_procedure_delete_operation,
+)
+from app.db.fhir_cache import fhir_session_cache
+from app.db.fhir_breaker import fhir_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key that serialises claiming across API workers, so two
+# processes never push entries of the same resource out of order.
+OUTBOX_CLAIM_LOCK_KEY = 0x4B44_4F42
+
+
+def session_duration_minutes(session_duration: Optional[str]) -> Optional[int]:
+    """Convert the UI's duration timestamp into the minutes stored on FHIR."""
+    try:
+        duration = datetime.strptime(session_duration, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except (TypeError, ValueError):
+        return None
+    hrs, mins = duration.hour, duration.minute
+    hrs -= datetime.now().hour
+    return hrs * 60 + mins
+
+
+def enqueue_dialysis_session_upsert(db: Session, session):
+    """Queue a Procedure PUT for `session`; the caller commits."""
+    db.add(FhirOutbox(
+        resource_type="Procedure",
+        resource_id=fhir_dialysis_session_id(session.patient_id, session.session_id),
+        patient_id=session.patient_id,
+        operation="upsert",
+        payload={
+            "session_id": session.session_id,
+            "patient_id": session.patient_id,
+            "date": session.session_date.date().isoformat(),
+            "session_type": session.session_type,
+            "weight": session.weight,
+            "diastolic": session.diastolic,
+            "systolic": session.systolic,
+            "effluent_volume": session.effluent_volume,
+            "duration": session_duration_minutes(session.session_duration),
+            "protein": session.protein,
+        },
+    ))
+
+
+def enqueue_dialysis_session_delete(db: Session, session):
+    """Queue a Procedure DELETE for `session`; the caller commits."""
+    db.add(FhirOutbox(
+        resource_type="Procedure",
+        resource_id=fhir_dialysis_session_id(session.patient_id, session.session_id),
+        patient_id=session.patient_id,
+        operation="delete",
+        payload={"session_id": session.session_id, "patient_id": session.patient_id},
+    ))
+
+
+def _entry_as_dict(entry: FhirOutbox):
+    return {
+        "id": entry.id,
+        "resource_type": entry.resource_type,
+        "resource_id": entry.resource_id,
+        "patient_id": entry.patient_id,
+        "operation": entry.operation,
+        "payload": entry.payload,
+        "attempts": entry.attempts,
+    }
+
+
+def _claim_batch(batch_size: int):
+    """Mark up to `batch_size` due entries as processing and return them in id order."""
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": OUTBOX_CLAIM_LOCK_KEY})
+        now = datetime.utcnow()
+        lease_cutoff = now - timedelta(seconds=settings.FHIR_OUTBOX_LEASE_SECONDS)
+        candidates = (
+            db.query(FhirOutbox)
+            .filter(FhirOutbox.status.in_(("pending", "processing")))
+            .order_by(FhirOutbox.id)
+            .limit(batch_size * 4)
+            .all()
+        )
+        blocked, claimed = set(), []
+        for entry in candidates:
+            if entry.resource_id in blocked:
+                continue
+            in_flight = entry.status == "processing" and entry.claimed_at and entry.claimed_at > lease_cutoff
+            if in_flight or entry.next_attempt_at > now:
+                # An earlier entry for this resource is still owed; keep later ones behind it.
+                blocked.add(entry.resource_id)
+                continue
+            if len(claimed) >= batch_size:
+                break
+            entry.status = "processing"
+            entry.claimed_at = now
+            claimed.append(_entry_as_dict(entry))
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _record_results(results):
+    """Delete pushed entries and reschedule (or park) failed ones."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for ids, attempts, error in results:
+            query = db.query(FhirOutbox).filter(FhirOutbox.id.in_(ids))
+            if error is None:
+                query.delete(synchronize_session=False)
+                continue
+            attempts += 1
+            if attempts >= settings.FHIR_OUTBOX_MAX_ATTEMPTS:
+                query.update({
+                    "status": "failed", "attempts": attempts,
+                    "last_error": error[:1000], "claimed_at": None,
+                }, synchronize_session=False)
+                continue
+            delay = min(settings.FHIR_OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.FHIR_OUTBOX_BACKOFF_MAX)
+            query.update({
+                "status": "pending", "attempts": attempts,
+                "next_attempt_at": now + timedelta(seconds=delay * random.uniform(0.5, 1.0)),
+                "last_error": error[:1000], "claimed_at": None,
+            }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _entry_operation(entry):
+    payload = entry["payload"]
+    if entry["operation"] == "upsert":
+        return fhir_dialysis_session_upsert_operation(**payload)
+    # By resource_id, which also covers Procedures queued under an older id format
+    return fhir_procedure_delete_operation(entry["resource_id"])
+
+
+def _outcome_error(entry, outcome):
+    if outcome["ok"]:
+        return None
+    if entry["operation"] == "delete" and outcome["status"] in (404, 410):
+        # Already gone on the FHIR side; the delete has the effect we want.
+        return None
+    return str(outcome["error"])
+
+
+class FhirOutboxWorker:
+    """Background task that drains fhir_outbox into HAPI FHIR."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.pushed = 0
+        self.superseded = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="fhir-outbox-worker")
+        logger.info("FHIR outbox worker started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.FHIR_READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        logger.info("FHIR outbox worker stopped")
+
+    def notify(self):
+        """Wake the worker after a commit; safe to call from threadpool handlers."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"FHIR outbox drain failed: {e}")
+                claimed = 0
+            if claimed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.FHIR_OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Claim and push one batch; returns the number of entries claimed."""
+        if fhir_circuit_breaker.is_open():
+            # Leave entries pending instead of burning their attempts while FHIR is down.
+            return 0
+        entries = await asyncio.to_thread(_claim_batch, settings.FHIR_OUTBOX_BATCH_SIZE)
+        if not entries:
+            return 0
+        groups = OrderedDict()
+        for entry in entries:
+            groups.setdefault(entry["resource_id"], []).append(entry)
+
+        # PUT and DELETE both set the full resource state, so only the newest
+        # queued operation per resource has to reach FHIR. All of them go out
+        # as batch Bundles, where each entry succeeds or fails on its own.
+        latest = [group[-1] for group in groups.values()]
+        try:
+            outcomes = await fhir_bulk_write(
+                [_entry_operation(entry) for entry in latest],
+                bundle_type="batch",
+                concurrency=settings.FHIR_OUTBOX_CONCURRENCY,
+            )
+        except Exception as e:
+            outcomes = [{"ok": False, "status": None, "error": f"{type(e).__name__}: {e}"} for _ in latest]
+
+        results = []
+        for group, outcome in zip(groups.values(), outcomes):
+            results.append(self._group_result(group, _outcome_error(group[-1], outcome)))
+        await asyncio.to_thread(_record_results, results)
+        for group in groups.values():
+            fhir_session_cache.invalidate_patient(group[-1]["patient_id"])
+        return len(entries)
+
+    def _group_result(self, group, error):
+        ids = [entry["id"] for entry in group]
+        attempts = max(entry["attempts"] for entry in group)
+        if error is None:
+            self.pushed += 1
+            self.superseded += len(ids) - 1
+            return ids, attempts, None
+        self.last_error = error
+        resource_id = group[-1]["resource_id"]
+        if attempts + 1 >= settings.FHIR_OUTBOX_MAX_ATTEMPTS:
+            self.dead_lettered += len(ids)
+            logger.error(f"FHIR outbox: giving up on {resource_id} after {attempts + 1} attempts: {error}")
+        else:
+            self.retried += len(ids)
+            logger.warning(f"FHIR outbox: push of {resource_id} failed, will retry: {error}")
+        return ids, attempts, error
+
+    def stats(self):
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pushed": self.pushed,
+            "superseded": self.superseded,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "last_error": self.last_error,
+        }
+
+
+fhir_outbox_worker = FhirOutboxWorker()
@@ -0,0 +1,345 @@
+"""
+Reconciliation of dialysis_sessions (the system of record) with the
+Procedure resources mirrored to HAPI FHIR.
+
+Sessions are compared in per-patient, per-month ranges. A range checksum
+is "<count>:<sum of row hashes>", where each row hash is taken from a
+canonical line of the mirrored fields. Because it is a sum, Postgres can
+compute it in one GROUP BY and Python can recompute it from FHIR results
+without caring about order.
+
+The checksum of every range last seen matching FHIR is kept in
+fhir_reconcile_checksums. A routine run only fetches the FHIR side of
+ranges whose Postgres checksum has changed since then, plus ranges not
+verified for FHIR_RECONCILE_REVERIFY_DAYS. A full run re-reads every
+patient's Procedures, which also catches edits made directly on the FHIR
+side.
+
+Postgres is authoritative, so repairs always move FHIR towards it. Missing
+or different Procedures are re-PUT and FHIR-only ones are deleted, both
+through the outbox.
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional, Iterable
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.dialysis import DialysisSession
+from app.db.models.fhir_outbox import FhirOutbox
+from app.db.models.fhir_reconcile import FhirReconcileChecksum
+from app.db.models.user import User
+from app.db.fhir_integration import fhir_search_dialysis_sessions
+from app.db.fhir_outbox import (
+    enqueue_dialysis_session_upsert, enqueue_dialysis_session_delete, fhir_outbox_worker,
+)
+
+logger = logging.getLogger(__name__)
+
+# Serialises reconciliation runs across API workers and the CLI.
+RECONCILE_LOCK_KEY = 0x4B44_5243
+EMPTY_CHECKSUM = "0:0"
+
+# Canonical line per session; floats are compared in thousandths, which both
+# Postgres round(double) and Python round() compute identically (half-even).
+_SESSION_LINE_SQL = (
+    "concat_ws('|', session_id, session_type, to_char(session_date, 'YYYY-MM-DD'), "
+    "round(weight * 1000)::bigint, diastolic, systolic, "
+    "round(effluent_volume * 1000)::bigint, round(protein * 1000)::bigint)"
+)
+_RANGE_CHECKSUMS_SQL = f"""
+    SELECT patient_id,
+           date_trunc('month', session_date)::date AS month,
+           count(*) AS sessions,
+           sum(('x' || substr(md5({_SESSION_LINE_SQL}), 1, 15))::bit(60)::bigint) AS digest
+    FROM dialysis_sessions
+    {{where}}
+    GROUP BY 1, 2
+"""
+
+
+def _milli(value) -> str:
+    return "" if value is None else str(round(float(value) * 1000))
+
+
+def _whole(value) -> str:
+    return "" if value is None else str(round(float(value)))
+
+
+def _session_day(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return str(value)[:10]
+
+
+def session_checksum_line(session: dict) -> str:
+    """Python twin of _SESSION_LINE_SQL for a parsed FHIR session (or a row dict)."""
+    return "|".join((
+        str(session.get("session_id")),
+        session.get("session_type") or "",
+        _session_day(session.get("session_date")),
+        _milli(session.get("weight")),
+        _whole(session.get("diastolic")),
+        _whole(session.get("systolic")),
+        _milli(session.get("effluent_volume")),
+        _milli(session.get("protein")),
+    ))
+
+
+def _row_hash(line: str) -> int:
+    return int(hashlib.md5(line.encode()).hexdigest()[:15], 16)
+
+
+def sessions_checksum(sessions: Iterable[dict]) -> str:
+    lines = [session_checksum_line(s) for s in sessions]
+    return f"{len(lines)}:{sum(_row_hash(line) for line in lines)}"
+
+
+def _month_of(value) -> Optional[date]:
+    day = _session_day(value)
+    return date.fromisoformat(day[:7] + "-01") if day else None
+
+
+def _month_bounds(month: date):
+    last_day = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return datetime.combine(month, datetime.min.time()), datetime.combine(last_day, datetime.min.time())
+
+
+# -- Postgres side (sync, run in a thread) -------------------------------------
+
+def _load_state(patient_ids: Optional[list], full: bool):
+    """Postgres range checksums, stored verified checksums, and patients with outbox backlog."""
+    db = SessionLocal()
+    try:
+        where, params = "", {}
+        if patient_ids:
+            where, params = "WHERE patient_id = ANY(:ids)", {"ids": list(patient_ids)}
+        pg = {
+            (row.patient_id, row.month): f"{row.sessions}:{row.digest}"
+            for row in db.execute(text(_RANGE_CHECKSUMS_SQL.format(where=where)), params)
+        }
+        stored_query = db.query(FhirReconcileChecksum)
+        if patient_ids:
+            stored_query = stored_query.filter(FhirReconcileChecksum.patient_id.in_(patient_ids))
+        stored = {(row.patient_id, row.month): (row.checksum, row.verified_at) for row in stored_query}
+        # Parked (failed) entries are not catching FHIR up; those patients need the repair most
+        backlog = db.query(FhirOutbox.patient_id).filter(FhirOutbox.status.in_(("pending", "processing")))
+        pending = {pid for (pid,) in backlog.distinct() if pid is not None}
+        everyone = set()
+        if full:
+            patients = db.query(User.id).filter(User.role == "patient")
+            if patient_ids:
+                patients = patients.filter(User.id.in_(patient_ids))
+            everyone = {pid for (pid,) in patients}
+        return pg, stored, pending, everyone
+    finally:
+        db.close()
+
+
+def _mark_verified(patient_id, month, checksum):
+    db = SessionLocal()
+    try:
+        row = db.get(FhirReconcileChecksum, (patient_id, month))
+        if checksum == EMPTY_CHECKSUM:
+            if row is not None:
+                db.delete(row)
+        elif row is None:
+            db.add(FhirReconcileChecksum(patient_id=patient_id, month=month, checksum=checksum))
+        else:
+            row.checksum, row.verified_at = checksum, datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _repair_range(patient_id, month, fhir_sessions, dry_run):
+    """Queue outbox writes that bring FHIR's copy of the range in line with Postgres."""
+    start, end = _month_bounds(month)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(DialysisSession)
+            .filter(
+                DialysisSession.patient_id == patient_id,
+                DialysisSession.session_date >= start,
+                DialysisSession.session_date < end + timedelta(days=1),
+            )
+            .all()
+        )
+        fhir_lines = {s.get("session_id"): session_checksum_line(s) for s in fhir_sessions}
+        pg_ids = set()
+        upserts = deletes = 0
+        for row in rows:
+            pg_ids.add(row.session_id)
+            line = session_checksum_line({
+                c: getattr(row, c) for c in (
+                    "session_id", "session_type", "session_date", "weight",
+                    "diastolic", "systolic", "effluent_volume", "protein",
+                )
+            })
+            if fhir_lines.get(row.session_id) != line:
+                upserts += 1
+                if not dry_run:
+                    enqueue_dialysis_session_upsert(db, row)
+        for session_id in fhir_lines.keys() - pg_ids:
+            if session_id is None:
+                continue
+            deletes += 1
+            if not dry_run:
+                enqueue_dialysis_session_delete(db, SimpleNamespace(session_id=session_id, patient_id=patient_id))
+        # Forget the range so the next run verifies the repair.
+        if not dry_run:
+            db.query(FhirReconcileChecksum).filter(
+                FhirReconcileChecksum.patient_id == patient_id,
+                FhirReconcileChecksum.month == month,
+            ).delete(synchronize_session=False)
+            db.commit()
+        return upserts, deletes
+    finally:
+        db.close()
+
+
+def _try_lock(db) -> bool:
+    return db.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILE_LOCK_KEY}).scalar()
+
+
+# -- reconciliation ------------------------------------------------------------
+
+class _Run:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.stats = defaultdict(int)
+
+    async def range(self, patient_id, month, pg_checksum, fhir_sessions):
+        self.stats["ranges_checked"] += 1
+        fhir_checksum = sessions_checksum(fhir_sessions)
+        if fhir_checksum == pg_checksum:
+            self.stats["ranges_matched"] += 1
+            if not self.dry_run:
+                await asyncio.to_thread(_mark_verified, patient_id, month, pg_checksum)
+            return
+        upserts, deletes = await asyncio.to_thread(_repair_range, patient_id, month, fhir_sessions, self.dry_run)
+        self.stats["ranges_repaired"] += 1
+        self.stats["upserts_queued"] += upserts
+        self.stats["deletes_queued"] += deletes
+        logger.warning(
+            f"Reconcile: patient {patient_id} {month:%Y-%m} differs "
+            f"(postgres {pg_checksum}, fhir {fhir_checksum}); {upserts} upsert(s), {deletes} delete(s)"
+            + (" [dry run]" if self.dry_run else "")
+        )
+
+    async def patient(self, patient_id, months, pg, full):
+        try:
+            if full:
+                by_month = defaultdict(list)
+                for s in await fhir_search_dialysis_sessions(patient_id=patient_id, limit=None):
+                    by_month[_month_of(s.get("session_date"))].append(s)
+                months = set(months) | {m for m in by_month if m is not None}
+                for month in sorted(months):
+                    await self.range(patient_id, month, pg.get((patient_id, month), EMPTY_CHECKSUM), by_month.get(month, []))
+                return
+            for month in sorted(months):
+                start, end = _month_bounds(month)
+                fhir_sessions = await fhir_search_dialysis_sessions(patient_id, start, end, limit=None)
+                await self.range(patient_id, month, pg.get((patient_id, month), EMPTY_CHECKSUM), fhir_sessions)
+        except Exception as e:
+            self.stats["fhir_errors"] += 1
+            logger.error(f"Reconcile: patient {patient_id} failed: {type(e).__name__}: {e}")
+
+
+async def reconcile_fhir(full: bool = False, patient_ids: Optional[list] = None, dry_run: bool = False) -> dict:
+    """
+    Compare Postgres and FHIR range checksums and queue repairs for ranges
+    that differ. Returns run statistics; skipped if another run holds the lock.
+    """
+    lock_db = SessionLocal()
+    try:
+        if not await asyncio.to_thread(_try_lock, lock_db):
+            logger.info("Reconcile: another run is in progress, skipping")
+            return {"skipped": "locked"}
+        started = datetime.utcnow()
+        pg, stored, pending, everyone = await asyncio.to_thread(_load_state, patient_ids, full)
+        reverify_before = started - timedelta(days=settings.FHIR_RECONCILE_REVERIFY_DAYS)
+
+        run = _Run(dry_run)
+        todo = defaultdict(set)
+        for key in pg.keys() | stored.keys():
+            run.stats["ranges_total"] += 1
+            stored_checksum, verified_at = stored.get(key, (None, None))
+            if not full and stored_checksum == pg.get(key, EMPTY_CHECKSUM) and verified_at >= reverify_before:
+                run.stats["ranges_unchanged"] += 1
+                continue
+            todo[key[0]].add(key[1])
+        for patient_id in everyone:
+            todo.setdefault(patient_id, set())
+        for patient_id in list(todo):
+            if patient_id in pending:
+                # The outbox is still catching FHIR up; diffing now would only repeat its work.
+                run.stats["patients_skipped_pending"] += 1
+                del todo[patient_id]
+
+        semaphore = asyncio.Semaphore(settings.FHIR_RECONCILE_CONCURRENCY)
+
+        async def one(patient_id, months):
+            async with semaphore:
+                await run.patient(patient_id, months, pg, full)
+
+        await asyncio.gather(*(one(pid, months) for pid, months in todo.items()))
+        if run.stats["upserts_queued"] or run.stats["deletes_queued"]:
+            fhir_outbox_worker.notify()
+        stats = {"full": full, "dry_run": dry_run, "patients": len(todo), **run.stats,
+                 "seconds": round((datetime.utcnow() - started).total_seconds(), 2)}
+        logger.info(f"Reconcile finished: {stats}")
+        return stats
+    finally:
+        lock_db.execute(text("SELECT pg_advisory_unlock_all()"))
+        lock_db.close()
+
+
+class FhirReconcileJob:
+    """Runs reconcile_fhir() every FHIR_RECONCILE_INTERVAL_HOURS inside the API process."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[dict] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="fhir-reconcile-job")
+        logger.info(f"FHIR reconcile job started (every {settings.FHIR_RECONCILE_INTERVAL_HOURS}h)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.FHIR_RECONCILE_INTERVAL_HOURS * 3600)
+            try:
+                self.last_run = {"at": datetime.utcnow().isoformat(), **await reconcile_fhir()}
+            except Exception as e:
+                logger.error(f"FHIR reconcile run failed: {e}")
+
+    def stats(self):
+        return {
+            "enabled": settings.FHIR_RECONCILE_INTERVAL_HOURS > 0,
+            "running": self._task is not None and not self._task.done(),
+            "last_run": self.last_run,
+        }
+
+
+fhir_reconcile_job = FhirReconcileJob()
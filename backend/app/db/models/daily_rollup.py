@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, event
+from app.db.base_class import Base
+from app.db.daily_rollup import install_daily_rollup_triggers
+
+class DialysisDailyRollup(Base):
+    """Sums and counts of one patient's sessions on one day, kept current by triggers (see app/db/daily_rollup.py)."""
+    __tablename__ = "dialysis_daily_rollup"
+
+    patient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    sessions = Column(Integer, nullable=False, server_default="0")
+    pre_sessions = Column(Integer, nullable=False, server_default="0")
+    post_sessions = Column(Integer, nullable=False, server_default="0")
+
+    # Over the day's pre sessions
+    pre_weight_sum = Column(Float, nullable=False, server_default="0")
+    pre_systolic_sum = Column(Float, nullable=False, server_default="0")
+    pre_diastolic_sum = Column(Float, nullable=False, server_default="0")
+    # Over the day's post sessions
+    post_weight_sum = Column(Float, nullable=False, server_default="0")
+    post_systolic_sum = Column(Float, nullable=False, server_default="0")
+    post_diastolic_sum = Column(Float, nullable=False, server_default="0")
+    post_effluent_sum = Column(Float, nullable=False, server_default="0")
+
+@event.listens_for(DialysisDailyRollup.__table__, "after_create")
+def _install_triggers(target, connection, **kw):
+    install_daily_rollup_triggers(connection)
@@ -1,11 +1,22 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Date, Computed, Index, event
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
+from app.db.partitions import ensure_dialysis_partitions
+from app.db.vitals_snapshot import install_vitals_snapshot_triggers
+from app.db.daily_rollup import install_daily_rollup_triggers
 
 class DialysisSession(Base):
     __tablename__ = "dialysis_sessions"
+    # Monthly partitions; the unique session_id and per-day keys live on each
+    # partition (see app/db/partitions.py)
+    __table_args__ = (
+        # Serves the per-patient, newest-first date range reads of GET /dialysis/sessions
+        Index("ix_dialysis_sessions_patient_id_session_date", "patient_id", "session_date"),
+        {"postgresql_partition_by": "RANGE (session_date)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # session_date is part of the key so ORM updates and deletes only touch its partition
+    id = Column(Integer, primary_key=True, autoincrement=True)
     patient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     session_type = Column(String, nullable=False)
     session_id: int = Column(Integer, nullable=False)
@@ -13,11 +24,26 @@ class DialysisSession(Base):
     diastolic = Column(Integer, nullable=False)
     systolic = Column(Integer, nullable=False)
     effluent_volume = Column(Float, nullable=False)
-    session_date = Column(DateTime, nullable=False)
+    session_date = Column(DateTime, primary_key=True, nullable=False)
+    session_day = Column(Date, Computed("(session_date)::date", persisted=True))  # UTC day, for the per-day uniqueness
     session_duration = Column(String, nullable=True)
     protein = Column(Float, nullable=False)
     # Use lazy string reference instead of direct import
     patient = relationship("User", back_populates="dialysis_sessions")
 
+# Latest pre/post lookups and the same-day duplicate check
+Index(
+    "ix_dialysis_sessions_patient_id_session_type_session_date",
+    DialysisSession.patient_id, DialysisSession.session_type, DialysisSession.session_date.desc(),
+)
+
+@event.listens_for(DialysisSession.__table__, "after_create")
+def _create_partitions(target, connection, **kw):
+    # create_all only builds the partitioned parent; rows need partitions to land in
+    ensure_dialysis_partitions(connection)
+    # No-ops until patient_vitals_snapshot / dialysis_daily_rollup exist; whichever table is created last installs the triggers
+    install_vitals_snapshot_triggers(connection)
+    install_daily_rollup_triggers(connection)
+
 # IMPORT AT THE END TO AVOID CIRCULAR DEPENDENCY
 from app.db.models.user import User
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, event
+from app.db.base_class import Base
+
+class FhirCacheGeneration(Base):
+    """Bumped on every queued or pushed FHIR write of a patient (see app/db/fhir_cache_generations.py)."""
+    __tablename__ = "fhir_cache_generations"
+
+    patient_id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False)
+
+@event.listens_for(FhirCacheGeneration.__table__, "after_create")
+def _install_triggers(target, connection, **kw):
+    # Imported here: app.db.fhir_cache_generations imports this model
+    from app.db.fhir_cache_generations import install_fhir_cache_generation_triggers
+    install_fhir_cache_generation_triggers(connection)
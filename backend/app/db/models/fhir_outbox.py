@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, event, text
+from app.db.base_class import Base
+from datetime import datetime
+
+class FhirOutbox(Base):
+    """Pending FHIR writes, committed in the same transaction as the row they mirror."""
+    __tablename__ = "fhir_outbox"
+    __table_args__ = (
+        # The worker's claim scan; parked (failed) entries stay out of it
+        Index("ix_fhir_outbox_active_id", "id", postgresql_where=text("status IN ('pending', 'processing')")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    resource_type = Column(String, nullable=False)              # e.g. "Procedure"
+    resource_id = Column(String, nullable=False, index=True)    # FHIR id; entries are applied in id order per resource
+    patient_id = Column(Integer, nullable=True)
+    operation = Column(String, nullable=False)                  # "upsert" | "delete"
+    payload = Column(JSON, nullable=True)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending | processing | failed; pushed entries are deleted
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+@event.listens_for(FhirOutbox.__table__, "after_create")
+def _install_triggers(target, connection, **kw):
+    # No-op until fhir_cache_generations exists; whichever table is created last installs the triggers
+    from app.db.fhir_cache_generations import install_fhir_cache_generation_triggers
+    install_fhir_cache_generation_triggers(connection)
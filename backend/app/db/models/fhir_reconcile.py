@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date
+from app.db.base_class import Base
+from datetime import datetime
+
+class FhirReconcileChecksum(Base):
+    """Last checksum of a patient's month of sessions that was verified to match FHIR."""
+    __tablename__ = "fhir_reconcile_checksums"
+
+    patient_id = Column(Integer, primary_key=True)
+    month = Column(Date, primary_key=True)                  # first day of the month
+    checksum = Column(String, nullable=False)               # "<session count>:<sum of row hashes>"
+    verified_at = Column(DateTime, nullable=False, default=datetime.utcnow)
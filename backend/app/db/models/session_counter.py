@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.db.base_class import Base
+
+class PatientSessionCounter(Base):
+    """Last session_id handed out for a patient (see app/db/session_ids.py)."""
+    __tablename__ = "patient_session_counters"
+
+    patient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_session_id = Column(Integer, nullable=False)
@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, event
+from app.db.base_class import Base
+from app.db.vitals_snapshot import install_vitals_snapshot_triggers
+
+class PatientVitalsSnapshot(Base):
+    """A patient's latest pre/post vitals and 30-day averages, kept current by triggers (see app/db/vitals_snapshot.py)."""
+    __tablename__ = "patient_vitals_snapshot"
+
+    patient_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    latest_session_date = Column(DateTime, nullable=True)
+
+    # Newest pre and post sessions
+    pre_session_id = Column(Integer, nullable=True)
+    pre_session_date = Column(DateTime, nullable=True)
+    pre_weight = Column(Float, nullable=True)
+    pre_systolic = Column(Integer, nullable=True)
+    pre_diastolic = Column(Integer, nullable=True)
+    post_session_id = Column(Integer, nullable=True)
+    post_session_date = Column(DateTime, nullable=True)
+    post_weight = Column(Float, nullable=True)
+    post_systolic = Column(Integer, nullable=True)
+    post_diastolic = Column(Integer, nullable=True)
+    post_effluent_volume = Column(Float, nullable=True)
+    edw = Column(Float, nullable=True)  # Estimated dry weight: the latest post-dialysis weight
+
+    # Sessions in the 30 days up to latest_session_date
+    sessions_30d = Column(Integer, nullable=True)
+    avg_pre_weight_30d = Column(Float, nullable=True)
+    avg_post_weight_30d = Column(Float, nullable=True)
+    avg_systolic_30d = Column(Float, nullable=True)
+    avg_diastolic_30d = Column(Float, nullable=True)
+    avg_effluent_volume_30d = Column(Float, nullable=True)
+    avg_protein_30d = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime, nullable=True)
+
+    # users.notifications was last computed from the snapshot as of notifications_snapshot_at
+    notifications_snapshot_at = Column(DateTime, nullable=True)
+    notifications_computed_at = Column(DateTime, nullable=True)
+
+@event.listens_for(PatientVitalsSnapshot.__table__, "after_create")
+def _install_triggers(target, connection, **kw):
+    install_vitals_snapshot_triggers(connection)
@@ -0,0 +1,186 @@
+"""
+Notification flags computed on the write path.
+
+GET /analytics/notifications used to re-run the analysis and commit
+users.notifications on every call, so dashboards polling it generated a
+write (and WAL) per poll. The flags only change when a patient's sessions
+do, so endpoints that save or delete sessions mark the patient here after
+they commit. NotificationRefresher waits NOTIFICATION_REFRESH_DEBOUNCE_SECONDS
+so a burst of writes (a pre and a post session, a provider's edits) is
+evaluated once, then recomputes the marked patients from their vitals
+snapshot and stores the flags with the snapshot version they came from.
+
+The GET then only reads. It recomputes the flags itself only when they are
+older than the snapshot: sessions written by another process or a script, a
+refresh that has not run yet, or a new day. PUT /analytics/notifications
+(the UI's dismissals) marks the stored flags stale too, so a dismissed flag
+comes back on the next GET as it always has.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.notifications import evaluate_notifications
+from app.db.session import SessionLocal
+from app.db.models.user import User
+from app.db.models.vitals_snapshot import PatientVitalsSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def notifications_are_current(snapshot: PatientVitalsSnapshot) -> bool:
+    """
+    Whether users.notifications was computed from this version of the snapshot,
+    today (the patient's age, and so the BP reference, can change overnight).
+    """
+    return (
+        snapshot.notifications_snapshot_at is not None
+        and snapshot.notifications_snapshot_at == snapshot.updated_at
+        and snapshot.notifications_computed_at is not None
+        and snapshot.notifications_computed_at.date() == datetime.utcnow().date()
+    )
+
+
+def store_notifications(db: Session, patient_id: int, notifications: Dict[str, bool], snapshot_updated_at) -> bool:
+    """
+    Save flags computed from the snapshot version `snapshot_updated_at`; the caller commits.
+    Nothing is written if the snapshot has changed since (a newer session was
+    saved), so stale flags never overwrite fresher ones.
+    """
+    stamped = db.execute(
+        update(PatientVitalsSnapshot)
+        .where(PatientVitalsSnapshot.patient_id == patient_id,
+               PatientVitalsSnapshot.updated_at == snapshot_updated_at)
+        .values(notifications_snapshot_at=snapshot_updated_at, notifications_computed_at=datetime.utcnow())
+        .returning(PatientVitalsSnapshot.patient_id)
+    ).first()
+    if stamped is None:
+        return False
+    db.execute(update(User).where(User.id == patient_id).values(notifications=notifications))
+    return True
+
+
+class NotificationRefresher:
+    """Debounced background recompute of users.notifications after session writes."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self.marked = 0
+        self.refreshed = 0
+        self.skipped = 0
+        self.runs = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="notification-refresher")
+        logger.info("Notification refresher started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.NOTIFICATION_REFRESH_DEBOUNCE_SECONDS + 10)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        logger.info("Notification refresher stopped")
+
+    def mark(self, patient_id: int):
+        """Queue a patient whose sessions changed; call after the commit, safe from threadpool handlers."""
+        with self._lock:
+            self._pending.add(patient_id)
+            self.marked += 1
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._stopping:
+                # Let the rest of a burst of writes arrive
+                await asyncio.sleep(settings.NOTIFICATION_REFRESH_DEBOUNCE_SECONDS)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Notification refresh failed: {e}")
+
+    def run_once(self) -> int:
+        """Recompute the flags of every marked patient; returns how many were stored."""
+        with self._lock:
+            patient_ids, self._pending = sorted(self._pending), set()
+        if not patient_ids:
+            return 0
+        self.runs += 1
+        stored = 0
+        db = SessionLocal()
+        try:
+            users = {u.id: u for u in db.query(User).filter(User.id.in_(patient_ids))}
+            snapshots = db.query(PatientVitalsSnapshot).filter(PatientVitalsSnapshot.patient_id.in_(patient_ids))
+            for snapshot in snapshots:
+                user = users.get(snapshot.patient_id)
+                if user is None or notifications_are_current(snapshot):
+                    self.skipped += 1
+                    continue
+                # One patient's unusable data (no birth date, say) must not hold back the others
+                try:
+                    with db.begin_nested():
+                        if store_notifications(db, user.id, evaluate_notifications(user, snapshot), snapshot.updated_at):
+                            stored += 1
+                except Exception as e:
+                    self.skipped += 1
+                    logger.warning(f"Notification refresh skipped patient {user.id}: {type(e).__name__}: {e}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Try again on the next write; the GET recomputes stale flags meanwhile
+            with self._lock:
+                self._pending.update(patient_ids)
+            raise
+        finally:
+            db.close()
+        self.refreshed += stored
+        return stored
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "debounce_seconds": settings.NOTIFICATION_REFRESH_DEBOUNCE_SECONDS,
+            "pending": pending,
+            "marked": self.marked,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "runs": self.runs,
+            "last_error": self.last_error,
+        }
+
+
+notification_refresher = NotificationRefresher()
@@ -0,0 +1,210 @@
+"""
+Monthly range partitions of dialysis_sessions.
+
+dialysis_sessions is partitioned by RANGE (session_date), one partition per
+calendar month (dialysis_sessions_pYYYYMM), plus dialysis_sessions_default for
+rows outside every month created so far. A query bounded on session_date only
+scans the partitions of the months it covers. Each month is also vacuumed on
+its own, and old months can be detached or archived.
+
+Postgres only enforces a unique index across partitions if the index contains
+the partition key. The session keys are therefore unique indexes created on
+each partition:
+
+- (patient_id, session_type, session_day): a day never spans two months, so
+  uniqueness within the partition is uniqueness overall. INSERT ... ON
+  CONFLICT DO NOTHING without a conflict target uses it as its arbiter.
+- (patient_id, session_id): unique within the month. Across months the
+  per-patient counter (app/db/session_ids.py) keeps session_ids unique.
+
+DialysisPartitionMaintainer creates upcoming months ahead of time. A new
+month is created as a standalone table. Any of its rows that landed in the
+default partition are moved into it, and then it is attached. Attaching only
+needs a SHARE UPDATE EXCLUSIVE lock on dialysis_sessions, so reads and writes
+of other months continue meanwhile.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT = "dialysis_sessions"
+DEFAULT_PARTITION = f"{PARENT}_default"
+# Per-partition unique indexes are named <partition>_<suffix>
+SESSION_ID_KEY = "session_id_key"
+SESSION_DAY_KEY = "session_day_key"
+# Serialises partition DDL across API workers, scripts and migrations.
+PARTITION_LOCK_KEY = 0x4B44_5054
+
+# Stored columns; session_day is generated from session_date
+_COLUMNS = (
+    "id, patient_id, session_type, session_id, weight, diastolic, systolic, "
+    "effluent_volume, session_date, session_duration, protein"
+)
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def is_partition_name(name: str) -> bool:
+    return re.fullmatch(rf"{PARENT}_(p\d{{6}}|default)", name) is not None
+
+
+def _exists(conn: Connection, relation: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": relation}).scalar()
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"), {"name": PARENT}
+    ).scalar() or False
+
+
+def create_session_keys(conn: Connection, partition: str):
+    """The per-partition unique indexes described in the module docstring."""
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {partition}_{SESSION_ID_KEY} "
+        f"ON {partition} (patient_id, session_id)"
+    ))
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {partition}_{SESSION_DAY_KEY} "
+        f"ON {partition} (patient_id, session_type, session_day)"
+    ))
+
+
+def create_default_partition(conn: Connection) -> bool:
+    if _exists(conn, DEFAULT_PARTITION):
+        return False
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    create_session_keys(conn, DEFAULT_PARTITION)
+    return True
+
+
+def create_month_partition(conn: Connection, month: date) -> bool:
+    """Create and attach the partition of `month`; False if it already exists."""
+    month = month_start(month)
+    partition, next_month = partition_name(month), add_months(month, 1)
+    if _exists(conn, partition):
+        return False
+    conn.execute(text(f"CREATE TABLE {partition} (LIKE {PARENT} INCLUDING GENERATED)"))
+    if _exists(conn, DEFAULT_PARTITION):
+        # Attaching fails while the default partition holds rows of this month, so move them first.
+        conn.execute(text(f"LOCK TABLE {PARENT} IN SHARE UPDATE EXCLUSIVE MODE"))
+        conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+        moved = conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE session_date >= :start AND session_date < :end RETURNING {_COLUMNS}) "
+                f"INSERT INTO {partition} ({_COLUMNS}) SELECT {_COLUMNS} FROM moved"
+            ),
+            {"start": month, "end": next_month},
+        ).rowcount
+        if moved:
+            logger.info(f"Moved {moved} dialysis session(s) from {DEFAULT_PARTITION} to {partition}")
+    create_session_keys(conn, partition)
+    conn.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {partition} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+    ))
+    return True
+
+
+def ensure_dialysis_partitions(
+    conn: Connection,
+    first_month: Optional[date] = None,
+    months_ahead: Optional[int] = None,
+) -> List[str]:
+    """
+    Create the default partition and every monthly partition from first_month
+    (default: the current month) to months_ahead (default:
+    DB_PARTITION_MONTHS_AHEAD) months from now that is missing. Returns the
+    names of the created partitions; the caller commits.
+    """
+    if not is_partitioned(conn):
+        logger.warning(f"{PARENT} is not partitioned yet; run `alembic upgrade head`")
+        return []
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    if months_ahead is None:
+        months_ahead = settings.DB_PARTITION_MONTHS_AHEAD
+    this_month = month_start(datetime.utcnow())
+    month, last_month = month_start(first_month or this_month), add_months(this_month, months_ahead)
+    created = [DEFAULT_PARTITION] if create_default_partition(conn) else []
+    while month <= last_month:
+        if create_month_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+class DialysisPartitionMaintainer:
+    """Creates upcoming dialysis_sessions partitions every DB_PARTITION_CHECK_SECONDS inside the API process."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.last_checked_at: Optional[str] = None
+        self.last_created: List[str] = []
+        self.last_error: Optional[str] = None
+
+    def run_once(self) -> List[str]:
+        with engine.begin() as conn:
+            created = ensure_dialysis_partitions(conn)
+        self.last_checked_at = datetime.utcnow().isoformat()
+        if created:
+            self.last_created = created
+            logger.info(f"Created dialysis_sessions partitions: {', '.join(created)}")
+        return created
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="dialysis-partition-maintainer")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Creating dialysis_sessions partitions failed: {e}")
+            await asyncio.sleep(settings.DB_PARTITION_CHECK_SECONDS)
+
+    def stats(self):
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "months_ahead": settings.DB_PARTITION_MONTHS_AHEAD,
+            "last_checked_at": self.last_checked_at,
+            "last_created": self.last_created,
+            "last_error": self.last_error,
+        }
+
+
+dialysis_partition_maintainer = DialysisPartitionMaintainer()
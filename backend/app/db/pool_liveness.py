@@ -0,0 +1,97 @@
+"""
+Pool-level connection liveness for the SQLAlchemy engines.
+
+A pooled connection is pinged on checkout only if it sat idle in the pool for
+longer than DB_PING_IDLE_SECONDS; busy connections go straight back to work.
+A ping that fails with a disconnect raises DisconnectionError, which makes the
+pool discard that connection and check out (or open) another one before the
+session's first statement runs. Disconnects hit by a statement itself are
+counted too; SQLAlchemy then invalidates the whole pool so the other
+connections from before the failure are replaced on their next checkout.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CHECKED_IN_AT = "checked_in_at"
+
+
+class PoolLiveness:
+    """Idle-aware checkout pings and stale-connection counters for one or more engines."""
+
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._engines = {}
+        self.checkouts = 0
+        self.pings = 0
+        self.stale_on_checkout = 0
+        self.disconnects_in_statement = 0
+
+    def attach(self, engine: Engine, name: str):
+        """Install the pool listeners on a (sync) engine; pass async_engine.sync_engine for async."""
+        self._engines[name] = engine
+        dialect = engine.dialect
+
+        @event.listens_for(engine.pool, "checkin")
+        def _checkin(dbapi_connection, connection_record):
+            if dbapi_connection is not None:
+                connection_record.info[_CHECKED_IN_AT] = time.monotonic()
+
+        @event.listens_for(engine.pool, "checkout")
+        def _checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_in_at = connection_record.info.pop(_CHECKED_IN_AT, None)
+            idle = checked_in_at is not None and time.monotonic() - checked_in_at >= self.idle_seconds
+            with self._lock:
+                self.checkouts += 1
+                if idle:
+                    self.pings += 1
+            if not idle:
+                return
+            try:
+                dialect.do_ping(dbapi_connection)
+            except Exception as e:
+                if not dialect.is_disconnect(e, dbapi_connection, None):
+                    raise
+                with self._lock:
+                    self.stale_on_checkout += 1
+                logger.warning(f"Stale {name} connection discarded on checkout: {e}")
+                # The pool invalidates this connection and retries the checkout
+                raise DisconnectionError(str(e)) from e
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(context):
+            if context.is_disconnect:
+                with self._lock:
+                    self.disconnects_in_statement += 1
+                logger.warning(f"{name} connection lost mid-statement; invalidating pooled connections")
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "ping_idle_seconds": self.idle_seconds,
+                "checkouts": self.checkouts,
+                "pings": self.pings,
+                "stale_on_checkout": self.stale_on_checkout,
+                "disconnects_in_statement": self.disconnects_in_statement,
+            }
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            stats[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        return stats
+
+
+db_pool_liveness = PoolLiveness(idle_seconds=settings.DB_PING_IDLE_SECONDS)
@@ -0,0 +1,170 @@
+"""
+Per-request SQL statement instrumentation.
+
+Cursor execute events on every engine are timed and charged to the request
+being served. RequestTrackingMiddleware opens a RequestQueries for each request
+(keyed by its request_id) in a context variable. Sync endpoints running in the
+threadpool and async endpoints both see it, because Starlette copies the
+context into both. At the end of the request the middleware logs the statement
+count, the total database time and the slowest statements. JsonFormatter
+writes them to the structured log under "db".
+
+Statements are also grouped by shape: the SQL text with bind parameters,
+expanded IN lists and literals replaced by "?". With SQL_DETECT_N_PLUS_ONE on
+(meant for development), a shape executed SQL_N_PLUS_ONE_THRESHOLD or more
+times in one request is logged as a suspected N+1 query. One example is a loop
+that loads each patient's sessions separately.
+
+Statements issued outside a request (background jobs, startup) are only
+counted in the totals returned by stats().
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_STARTED_AT = "sql_started_at"
+_SHAPE_LENGTH = 300
+
+# A run of bind parameters (psycopg2 %(name)s, asyncpg $1, qmark ?), e.g. an expanded IN list
+_PARAM = r"(?:%\(\w+\)s|\$\d+|\?)"
+_PARAM_LIST = re.compile(rf"{_PARAM}(?:\s*,\s*{_PARAM})+")
+_SINGLE_PARAM = re.compile(_PARAM)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with parameters and literals replaced by ?, for grouping repeats."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAM_LIST.sub("?, ...", shape)
+    shape = _SINGLE_PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestQueries:
+    """Statements executed while serving one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        # (seconds, shape), longest first
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, shape: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[shape] += 1
+            if len(self.slowest) < settings.SQL_SLOWEST_LOGGED or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, shape))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[settings.SQL_SLOWEST_LOGGED:]
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes executed at least `threshold` times, most frequent first."""
+        with self._lock:
+            return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "statements": self.count,
+                "time_ms": round(self.seconds * 1000, 2),
+                "slowest": [
+                    {"time_ms": round(seconds * 1000, 2), "sql": shape[:_SHAPE_LENGTH]}
+                    for seconds, shape in self.slowest
+                ],
+            }
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+class SqlInstrumentation:
+    """Cursor execute listeners that charge statements to the current request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: List[str] = []
+        self.statements = 0
+        self.outside_requests = 0
+        self.requests = 0
+        self.n_plus_one_suspects = 0
+
+    def attach(self, engine: Engine, name: str):
+        """Install the listeners on a (sync) engine; pass async_engine.sync_engine for async."""
+        if not settings.SQL_INSTRUMENTATION:
+            return
+        self._engines.append(name)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info[_STARTED_AT] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop(_STARTED_AT, None)
+            queries = _current.get()
+            with self._lock:
+                self.statements += 1
+                if queries is None:
+                    self.outside_requests += 1
+            if queries is not None and started is not None:
+                queries.record(statement_shape(statement), time.perf_counter() - started)
+
+    @contextmanager
+    def track(self, request_id: str):
+        """Charge statements executed inside the block (and tasks/threads it starts) to request_id."""
+        queries = RequestQueries(request_id)
+        token = _current.set(queries)
+        try:
+            yield queries
+        finally:
+            _current.reset(token)
+            with self._lock:
+                self.requests += 1
+
+    def report(self, queries: RequestQueries, description: str, extra: Dict):
+        """Log suspected N+1 shapes of a finished request (dev only)."""
+        if not settings.SQL_DETECT_N_PLUS_ONE:
+            return
+        for shape, count in queries.repeated(settings.SQL_N_PLUS_ONE_THRESHOLD):
+            with self._lock:
+                self.n_plus_one_suspects += 1
+            logger.warning(
+                f"Suspected N+1 query in {description}: {count} executions of {shape[:_SHAPE_LENGTH]}",
+                extra=extra,
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": settings.SQL_INSTRUMENTATION,
+                "engines": list(self._engines),
+                "statements": self.statements,
+                "outside_requests": self.outside_requests,
+                "requests": self.requests,
+                "n_plus_one_detection": settings.SQL_DETECT_N_PLUS_ONE,
+                "n_plus_one_suspects": self.n_plus_one_suspects,
+            }
+
+
+sql_instrumentation = SqlInstrumentation()
@@ -0,0 +1,247 @@
+"""
+Routing of database reads to read replicas.
+
+Writes always go through the primary engine in app/db/session.py. Read-only
+endpoints get their session from get_read_db / get_async_read_db instead,
+which pick the least-lagged usable replica from DB_REPLICA_URLS. If no
+replica qualifies, they fall back to the primary.
+
+Read-your-writes: after a write commits, the endpoint calls
+issue_read_token(). It returns the primary's current WAL position (LSN) in the
+X-Read-Token header and in a short-lived cookie. A read carrying that token
+(header or cookie) is only served by a replica that has replayed at least
+that far; otherwise it goes to the primary. A patient therefore always sees
+the session they just posted. The cookie only covers same-origin clients;
+the UI is served from another origin, so CORS exposes the header and the
+UI's read-token interceptor echoes it on its requests.
+
+DatabaseRouter polls every replica's replay position and lag every
+DB_REPLICA_POLL_SECONDS. A replica is skipped if it lags more than
+DB_REPLICA_MAX_LAG_SECONDS, if its last poll failed, or if it hasn't been
+polled recently.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.session import engine, SessionLocal, AsyncSessionLocal, get_engine, get_async_engine
+from app.db.pool_liveness import db_pool_liveness
+from app.db.query_stats import sql_instrumentation
+
+logger = logging.getLogger(__name__)
+
+READ_TOKEN_HEADER = "X-Read-Token"
+READ_TOKEN_COOKIE = "read_token"
+
+_REPLICA_STATUS_SQL = text(
+    "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text, "
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+)
+
+
+def parse_lsn(value: Optional[str]) -> Optional[int]:
+    """'16/B374D848' -> integer WAL position; None for anything else."""
+    try:
+        high, low = value.split("/")
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+class Replica:
+    """Engines, session factories and last measured lag of one read replica."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = get_engine(url)
+        self.async_engine = get_async_engine(url)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.AsyncSessionLocal = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        db_pool_liveness.attach(self.engine, name)
+        db_pool_liveness.attach(self.async_engine.sync_engine, f"{name}_async")
+        sql_instrumentation.attach(self.engine, name)
+        sql_instrumentation.attach(self.async_engine.sync_engine, f"{name}_async")
+        self.replay_lsn: Optional[int] = None
+        self.lag_seconds: Optional[float] = None
+        self.lag_bytes: Optional[int] = None
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+        self.reads = 0
+
+    def measure(self, primary_lsn: Optional[int]):
+        try:
+            with self.engine.connect() as conn:
+                in_recovery, replay_lsn, replay_age = conn.execute(_REPLICA_STATUS_SQL).one()
+        except Exception as e:
+            self.error = str(e)
+            logger.warning(f"Read replica {self.name} unreachable: {e}")
+            return
+        if not in_recovery:
+            # Promoted or misconfigured: its data no longer follows the primary
+            self.error = "not in recovery"
+            return
+        self.replay_lsn = parse_lsn(replay_lsn)
+        if primary_lsn is not None and self.replay_lsn is not None and self.replay_lsn >= primary_lsn:
+            # Caught up; the replay timestamp only looks old because the primary is idle
+            self.lag_seconds, self.lag_bytes = 0.0, 0
+        else:
+            self.lag_seconds = float(replay_age) if replay_age is not None else None
+            self.lag_bytes = primary_lsn - self.replay_lsn if None not in (primary_lsn, self.replay_lsn) else None
+        self.error = None
+        self.checked_at = time.monotonic()
+
+    def usable(self, min_lsn: Optional[int]) -> bool:
+        if self.error or self.lag_seconds is None:
+            return False
+        if time.monotonic() - self.checked_at > max(3 * settings.DB_REPLICA_POLL_SECONDS, 5.0):
+            return False
+        if self.lag_seconds > settings.DB_REPLICA_MAX_LAG_SECONDS:
+            return False
+        return min_lsn is None or (self.replay_lsn is not None and self.replay_lsn >= min_lsn)
+
+    def stats(self):
+        return {
+            "usable": self.usable(None),
+            "replay_lsn": self.replay_lsn,
+            "lag_seconds": self.lag_seconds,
+            "lag_bytes": self.lag_bytes,
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            "error": self.error,
+            "reads": self.reads,
+        }
+
+
+class DatabaseRouter:
+    """Chooses the engine for each read and keeps replica lag up to date."""
+
+    def __init__(self, replica_urls: str):
+        urls = [url.strip() for url in replica_urls.split(",") if url.strip()]
+        self.replicas: List[Replica] = [Replica(f"replica_{i}", url) for i, url in enumerate(urls, 1)]
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.read_your_writes_fallbacks = 0
+
+    def choose(self, min_lsn: Optional[int] = None) -> Optional[Replica]:
+        """The least-lagged usable replica, or None to read from the primary."""
+        candidates = [r for r in self.replicas if r.usable(min_lsn)]
+        with self._lock:
+            if not candidates:
+                self.primary_reads += 1
+                if min_lsn is not None and any(r.usable(None) for r in self.replicas):
+                    self.read_your_writes_fallbacks += 1
+                return None
+            replica = min(candidates, key=lambda r: (r.lag_seconds, random.random()))
+            replica.reads += 1
+            return replica
+
+    def read_session(self, min_lsn: Optional[int] = None) -> Session:
+        replica = self.choose(min_lsn) if self.replicas else None
+        return replica.SessionLocal() if replica else SessionLocal()
+
+    def async_read_session(self, min_lsn: Optional[int] = None) -> AsyncSession:
+        replica = self.choose(min_lsn) if self.replicas else None
+        return replica.AsyncSessionLocal() if replica else AsyncSessionLocal()
+
+    def poll_once(self):
+        """Measure every replica against the primary's current WAL position."""
+        try:
+            with engine.connect() as conn:
+                primary_lsn = parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+        except Exception as e:
+            logger.warning(f"Could not read the primary's WAL position: {e}")
+            primary_lsn = None
+        for replica in self.replicas:
+            replica.measure(primary_lsn)
+
+    def start(self):
+        if not self.replicas:
+            return
+        self._task = asyncio.create_task(self._run(), name="db-replica-monitor")
+        logger.info(f"Read replica routing enabled for {len(self.replicas)} replica(s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.poll_once)
+            except Exception as e:
+                logger.error(f"Replica lag poll failed: {e}")
+            await asyncio.sleep(settings.DB_REPLICA_POLL_SECONDS)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "replicas_configured": len(self.replicas),
+                "max_lag_seconds": settings.DB_REPLICA_MAX_LAG_SECONDS,
+                "primary_reads": self.primary_reads,
+                "read_your_writes_fallbacks": self.read_your_writes_fallbacks,
+            }
+        stats.update({r.name: r.stats() for r in self.replicas})
+        return stats
+
+
+db_router = DatabaseRouter(settings.DB_REPLICA_URLS)
+
+
+def read_token_from(request: Request) -> Optional[int]:
+    return parse_lsn(request.headers.get(READ_TOKEN_HEADER) or request.cookies.get(READ_TOKEN_COOKIE))
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica when one is caught up enough, else the primary."""
+    db = db_router.read_session(read_token_from(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    """AsyncSession counterpart of get_read_db."""
+    async with db_router.async_read_session(read_token_from(request)) as db:
+        yield db
+
+
+def _set_read_token(response: Response, lsn: Optional[str]):
+    if lsn:
+        response.headers[READ_TOKEN_HEADER] = lsn
+        response.set_cookie(
+            READ_TOKEN_COOKIE, lsn, max_age=settings.DB_READ_TOKEN_TTL_SECONDS, httponly=True, samesite="lax"
+        )
+
+
+def issue_read_token(response: Response, db: Session):
+    """After a committed write: hand the client the LSN its next reads must see."""
+    if db_router.replicas:
+        _set_read_token(response, db.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+
+
+async def issue_read_token_async(response: Response, db: AsyncSession):
+    """AsyncSession counterpart of issue_read_token."""
+    if db_router.replicas:
+        _set_read_token(response, (await db.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar())
@@ -1,6 +1,8 @@
 import os
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 import time
 import logging
@@ -9,6 +11,8 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.core.config import settings
 from app.db.base_class import Base
+from app.db.pool_liveness import db_pool_liveness
+from app.db.query_stats import sql_instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +34,7 @@ engine_config = {
     wait=wait_exponential(multiplier=1, min=1, max=10),
     reraise=True
 )
-def get_engine():
+def get_engine(database_url: str = None):
     """Create SQLAlchemy engine with retry logic for connection resilience"""
     try:
         if settings.USE_MANAGED_IDENTITY and settings.AZURE_DEPLOYMENT:
@@ -55,7 +59,7 @@ def get_engine():
             logger.info(f"Configuring SSL for Azure PostgreSQL connection with mode: {engine_config['connect_args']['sslmode']}")
         
         logger.info(f"Creating database engine with pool size: {settings.DB_POOL_SIZE}")
-        return create_engine(settings.DATABASE_URL, **engine_config)
+        return create_engine(database_url or settings.DATABASE_URL, **engine_config)
     except Exception as e:
         logger.error(f"Error creating database engine: {str(e)}")
         raise
@@ -69,6 +73,10 @@ except Exception as e:
     # In production, you might want to have a fallback or alert system here
     raise
 
+# Liveness is checked by the pool on checkout after idle periods, not per request
+db_pool_liveness.attach(engine, "sync")
+sql_instrumentation.attach(engine, "sync")
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -76,15 +84,71 @@ def get_db():
     """Get database session with retry logic for transient errors"""
     db = SessionLocal()
     try:
-        # Verify connection is working
-        db.execute("SELECT 1")
+        # No connection is taken here; the pool checks it on first use (see pool_liveness)
         yield db
     except OperationalError as e:
         logger.warning(f"Database operational error encountered: {e}")
-        # Retry logic could be implemented here if needed
         raise
     except SQLAlchemyError as e:
         logger.error(f"Database error: {e}")
         raise
     finally:
         db.close()
+
+
+# Async engine (asyncpg) for async def endpoints, sharing the pool settings above
+@retry(
+    stop=stop_after_attempt(settings.DB_MAX_RETRIES),
+    wait=wait_exponential(multiplier=1, min=1, max=10),
+    reraise=True
+)
+def get_async_engine(database_url: str = None):
+    """Create the asyncpg-backed AsyncEngine for the same database"""
+    url = make_url(database_url or settings.DATABASE_URL)
+    # psycopg2-style options in the URL are not understood by asyncpg
+    ssl_mode = url.query.get("sslmode")
+    url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode", "connect_timeout"])
+    connect_args = {
+        'timeout': 10,                                                  # Connection timeout in seconds
+        'server_settings': {'application_name': 'pd_management_app'},   # Identify application in Azure monitoring
+    }
+    try:
+        if settings.USE_MANAGED_IDENTITY and settings.AZURE_DEPLOYMENT:
+            from azure.identity import DefaultAzureCredential
+            token_credential = DefaultAzureCredential()
+            access_token = token_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
+            connect_args['password'] = access_token.token
+        if settings.AZURE_DEPLOYMENT:
+            ssl_mode = os.getenv('POSTGRES_SSL_MODE', 'require')
+        if ssl_mode:
+            connect_args['ssl'] = ssl_mode
+
+        logger.info(f"Creating async database engine with pool size: {settings.DB_POOL_SIZE}")
+        return create_async_engine(
+            url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            connect_args=connect_args,
+        )
+    except Exception as e:
+        logger.error(f"Error creating async database engine: {str(e)}")
+        raise
+
+async_engine = get_async_engine()
+db_pool_liveness.attach(async_engine.sync_engine, "async")
+sql_instrumentation.attach(async_engine.sync_engine, "async")
+
+# expire_on_commit=False: attributes of committed objects stay readable
+# without an implicit (and in async, impossible) lazy refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    """Get an AsyncSession for async def endpoints"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            raise
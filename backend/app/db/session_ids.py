@@ -0,0 +1,102 @@
+"""
+Per-patient session_id allocation.
+
+session_id is unique per patient. It used to be allocated by reading the
+patient's highest session_id and adding one, so two concurrent writers could
+pick the same value. patient_session_counters now keeps the last id handed out
+for each patient. Ids are taken with one atomic UPDATE ... RETURNING on that row,
+so concurrent writers queue on the row lock instead of colliding. A block of
+ids can be reserved at once for bulk imports.
+
+A patient's counter row is created on first use, starting from their highest
+existing session_id. Writes that bring their own session_id call
+advance_session_counter so the counter never falls behind.
+
+dialysis_sessions is partitioned by month, and its (patient_id, session_id)
+unique index only covers one partition. Across months, uniqueness relies on
+every writer going through the counter. Writers that bring their own
+session_id advance the counter *before* checking whether the id exists; the
+counter's row lock then orders them with everyone else writing that
+patient's ids.
+"""
+
+from sqlalchemy import exists, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.models.dialysis import DialysisSession
+from app.db.models.session_counter import PatientSessionCounter
+
+_counters = PatientSessionCounter.__table__
+
+
+def _highest_session_id(patient_id):
+    return (
+        select(func.coalesce(func.max(DialysisSession.session_id), 0))
+        .where(DialysisSession.patient_id == patient_id)
+        .scalar_subquery()
+    )
+
+
+def allocate_session_ids_cte(patients, count: int = 1, name: str = "allocated"):
+    """
+    CTE of (patient_id, last_session_id) that reserves `count` ids for every
+    patient in `patients` (a CTE or subquery with an `id` column). The
+    reserved block is last_session_id - count + 1 .. last_session_id. The
+    CTE can be embedded in a larger statement, as the upsert in
+    POST /dialysis/sessions does.
+    """
+    bumped = (
+        update(_counters)
+        .where(_counters.c.patient_id.in_(select(patients.c.id)))
+        .values(last_session_id=_counters.c.last_session_id + count)
+        .returning(_counters.c.patient_id, _counters.c.last_session_id)
+        .cte(f"{name}_bumped")
+    )
+    # Patients without a counter yet start after their highest session_id.
+    seed = pg_insert(_counters).from_select(
+        ["patient_id", "last_session_id"],
+        select(patients.c.id, _highest_session_id(patients.c.id) + count)
+        .where(~exists().where(bumped.c.patient_id == patients.c.id)),
+    )
+    seeded = (
+        seed.on_conflict_do_update(
+            index_elements=["patient_id"],
+            set_={"last_session_id": _counters.c.last_session_id + count},
+        )
+        .returning(_counters.c.patient_id, _counters.c.last_session_id)
+        .cte(f"{name}_seeded")
+    )
+    return union_all(
+        select(bumped.c.patient_id, bumped.c.last_session_id),
+        select(seeded.c.patient_id, seeded.c.last_session_id),
+    ).cte(name)
+
+
+def advance_session_counter_statement(patient_id, at_least):
+    """
+    Upsert that moves a patient's counter up to at least `at_least` and to
+    their highest stored session_id. Use it after writing a caller-chosen
+    session_id.
+    """
+    stmt = pg_insert(_counters).from_select(
+        ["patient_id", "last_session_id"],
+        select(patient_id, func.greatest(at_least, _highest_session_id(patient_id))),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["patient_id"],
+        set_={"last_session_id": func.greatest(_counters.c.last_session_id, stmt.excluded.last_session_id)},
+    )
+
+
+def reserve_session_ids(db: Session, patient_id: int, count: int = 1) -> range:
+    """Reserve `count` consecutive session_ids for a patient; the caller commits."""
+    patients = select(literal(patient_id).label("id")).cte("patients")
+    allocated = allocate_session_ids_cte(patients, count)
+    last = db.execute(select(allocated.c.last_session_id)).scalar_one()
+    return range(last - count + 1, last + 1)
+
+
+def advance_session_counter(db: Session, patient_id: int, session_id: int = 0):
+    """Make sure the patient's counter is at or past `session_id`; the caller commits."""
+    db.execute(advance_session_counter_statement(literal(patient_id), literal(session_id)))
@@ -0,0 +1,136 @@
+"""
+Sampled Postgres-vs-FHIR comparison of GET /dialysis/sessions, used by
+DIALYSIS_READ_SOURCE=compare: a share of the reads served from Postgres is
+fetched again from FHIR in the background and the differences are counted.
+"""
+
+import logging
+import math
+import random
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.fhir_outbox import FhirOutbox
+from app.db.fhir_integration import fhir_search_dialysis_sessions
+
+logger = logging.getLogger(__name__)
+
+# Fields FHIR mirrors exactly. session_date is compared by day (FHIR keeps the
+# date only) and session_duration is not stored on the Procedure at all.
+_COMPARED_FIELDS = ("session_type", "weight", "diastolic", "systolic", "effluent_volume", "protein")
+
+
+def has_pending_fhir_writes(db: Session, patient_id: int) -> bool:
+    """True while the outbox still owes FHIR a write for this patient."""
+    # Parked (failed) entries wait for an operator and would otherwise block comparisons for good
+    return db.query(
+        db.query(FhirOutbox.id)
+        .filter(FhirOutbox.patient_id == patient_id, FhirOutbox.status.in_(("pending", "processing")))
+        .exists()
+    ).scalar()
+
+
+def _session_day(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return str(value)[:10]
+
+
+def _same_value(pg_value, fhir_value) -> bool:
+    if isinstance(pg_value, (int, float)) and isinstance(fhir_value, (int, float)):
+        return math.isclose(pg_value, fhir_value, rel_tol=1e-9, abs_tol=1e-9)
+    return pg_value == fhir_value
+
+
+def _drop_oldest_day(sessions):
+    days = [_session_day(s.get("session_date")) for s in sessions]
+    oldest = min((d for d in days if d), default=None)
+    return [s for s, d in zip(sessions, days) if d != oldest]
+
+
+def diff_dialysis_sessions(pg_sessions: List[dict], fhir_sessions: List[dict], limit: Optional[int] = None) -> List[dict]:
+    """Differences between the Postgres and FHIR views of the same session list."""
+    if limit is not None and (len(pg_sessions) >= limit or len(fhir_sessions) >= limit):
+        # Both lists were cut at `limit`; sessions on the boundary day may fall
+        # on different sides of the cut, so leave that day out.
+        pg_sessions, fhir_sessions = _drop_oldest_day(pg_sessions), _drop_oldest_day(fhir_sessions)
+    pg = {s["session_id"]: s for s in pg_sessions}
+    fhir = {s.get("session_id"): s for s in fhir_sessions}
+    mismatches = [{"session_id": sid, "issue": "missing_in_fhir"} for sid in sorted(pg.keys() - fhir.keys())]
+    mismatches += [{"session_id": sid, "issue": "missing_in_postgres"} for sid in sorted(fhir.keys() - pg.keys(), key=str)]
+    for sid in sorted(pg.keys() & fhir.keys()):
+        fields = [f for f in _COMPARED_FIELDS if not _same_value(pg[sid][f], fhir[sid].get(f))]
+        if _session_day(pg[sid]["session_date"]) != _session_day(fhir[sid].get("session_date")):
+            fields.append("session_date")
+        if fields:
+            mismatches.append({"session_id": sid, "issue": "fields_differ", "fields": fields})
+    return mismatches
+
+
+class SessionReadComparator:
+    """Samples Postgres-served reads and diffs them against FHIR in the background."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.matched = 0
+        self.mismatched = 0
+        self.skipped_pending = 0
+        self.errors = 0
+        self.last_mismatch: Optional[dict] = None
+
+    def should_sample(self) -> bool:
+        return random.uniform(0, 100) < settings.DIALYSIS_READ_COMPARE_PERCENT
+
+    def skip_pending(self):
+        with self._lock:
+            self.skipped_pending += 1
+
+    async def compare(self, patient_id, start_date, end_date, limit, pg_sessions):
+        """Fetch the same page from FHIR (bypassing the cache) and record any differences."""
+        with self._lock:
+            self.sampled += 1
+        try:
+            fhir_sessions = await fhir_search_dialysis_sessions(patient_id, start_date, end_date, limit)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Session read compare: FHIR search failed for patient {patient_id}: {e}")
+            return
+        mismatches = diff_dialysis_sessions(pg_sessions, fhir_sessions, limit)
+        with self._lock:
+            if not mismatches:
+                self.matched += 1
+                return
+            self.mismatched += 1
+            self.last_mismatch = {
+                "patient_id": patient_id,
+                "at": datetime.utcnow().isoformat(),
+                "count": len(mismatches),
+                "sample": mismatches[:10],
+            }
+        logger.warning(
+            f"Session read compare: {len(mismatches)} difference(s) for patient {patient_id}: {mismatches[:10]}"
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "read_source": settings.DIALYSIS_READ_SOURCE,
+                "sample_percent": settings.DIALYSIS_READ_COMPARE_PERCENT,
+                "sampled": self.sampled,
+                "matched": self.matched,
+                "mismatched": self.mismatched,
+                "skipped_pending": self.skipped_pending,
+                "errors": self.errors,
+                "last_mismatch": self.last_mismatch,
+            }
+
+
+session_read_comparator = SessionReadComparator()
@@ -0,0 +1,161 @@
+"""
+patient_vitals_snapshot: one row per patient with the inputs of the
+notification analysis.
+
+Each row holds the newest pre and post session, the EDW (the newest post
+weight) and averages over the 30 days up to the patient's latest session.
+GET /analytics/notifications reads this single row. Before, it loaded the
+patient's sessions and ran three ordered lookups.
+
+Statement-level triggers on dialysis_sessions keep the rows current. They
+fire after every INSERT, UPDATE and DELETE, whichever code path or script
+issued it, including the COPY loader's INSERT ... SELECT. Each trigger
+recomputes the rows of the patients the statement touched, once per
+statement. The newest sessions are looked for in the last 90 days first
+(the partitions of those months), and the whole history is searched only if
+that finds nothing, as latest_dialysis_session does. The function keeps a
+generic plan, because planning these lookups over every partition costs
+several times more than running them. Months outside the window are pruned
+when the plan runs.
+
+Concurrent writers of one patient are serialised on the patient's snapshot
+row. The row is created (if missing) and locked before it is recomputed.
+The recompute runs as a separate statement, so it sees every session that
+the previous lock holder committed.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION refresh_patient_vitals_snapshot(patient_ids integer[]) RETURNS void
+LANGUAGE plpgsql
+-- Planned once per connection: a custom plan would be re-planned over every partition on each call
+SET plan_cache_mode = force_generic_plan
+AS $$
+BEGIN
+    -- Users being deleted cascade to their sessions; their snapshot rows go with them
+    INSERT INTO patient_vitals_snapshot (patient_id)
+    SELECT id FROM users WHERE id = ANY (patient_ids) ORDER BY id
+    ON CONFLICT (patient_id) DO NOTHING;
+    PERFORM 1 FROM patient_vitals_snapshot WHERE patient_id = ANY (patient_ids) ORDER BY patient_id FOR UPDATE;
+
+    UPDATE patient_vitals_snapshot s
+    SET latest_session_date = greatest(pre.session_date, post.session_date),
+        pre_session_id = pre.session_id, pre_session_date = pre.session_date, pre_weight = pre.weight,
+        pre_systolic = pre.systolic, pre_diastolic = pre.diastolic,
+        post_session_id = post.session_id, post_session_date = post.session_date, post_weight = post.weight,
+        post_systolic = post.systolic, post_diastolic = post.diastolic,
+        post_effluent_volume = post.effluent_volume, edw = post.weight,
+        sessions_30d = stats.sessions, avg_pre_weight_30d = stats.pre_weight,
+        avg_post_weight_30d = stats.post_weight, avg_systolic_30d = stats.systolic,
+        avg_diastolic_30d = stats.diastolic, avg_effluent_volume_30d = stats.effluent_volume,
+        avg_protein_30d = stats.protein, updated_at = now() AT TIME ZONE 'utc'
+    FROM unnest(patient_ids) AS p(id)
+    LEFT JOIN LATERAL (
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'pre' AND d.session_date >= now() - interval '90 days'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'pre'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        LIMIT 1
+    ) pre ON true
+    LEFT JOIN LATERAL (
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'post' AND d.session_date >= now() - interval '90 days'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        UNION ALL
+        (SELECT * FROM dialysis_sessions d
+         WHERE d.patient_id = p.id AND d.session_type = 'post'
+         ORDER BY d.session_date DESC, d.id DESC LIMIT 1)
+        LIMIT 1
+    ) post ON true
+    LEFT JOIN LATERAL (
+        SELECT count(*) AS sessions,
+               avg(d.weight) FILTER (WHERE d.session_type = 'pre') AS pre_weight,
+               avg(d.weight) FILTER (WHERE d.session_type = 'post') AS post_weight,
+               avg(d.systolic) AS systolic, avg(d.diastolic) AS diastolic,
+               avg(d.effluent_volume) FILTER (WHERE d.session_type = 'post') AS effluent_volume,
+               avg(d.protein) AS protein
+        FROM dialysis_sessions d
+        WHERE d.patient_id = p.id
+          AND d.session_date > greatest(pre.session_date, post.session_date) - interval '30 days'
+          AND d.session_date <= greatest(pre.session_date, post.session_date)
+    ) stats ON true
+    WHERE s.patient_id = p.id;
+
+    -- Patients whose last session was deleted
+    DELETE FROM patient_vitals_snapshot
+    WHERE patient_id = ANY (patient_ids) AND latest_session_date IS NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION dialysis_sessions_refresh_vitals_snapshot() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM new_sessions));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM old_sessions));
+    ELSE
+        PERFORM refresh_patient_vitals_snapshot(ARRAY(
+            SELECT patient_id FROM old_sessions UNION SELECT patient_id FROM new_sessions
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+TRIGGERS_SQL = """
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_insert
+    AFTER INSERT ON dialysis_sessions REFERENCING NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_update
+    AFTER UPDATE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions NEW TABLE AS new_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+CREATE OR REPLACE TRIGGER dialysis_sessions_vitals_snapshot_delete
+    AFTER DELETE ON dialysis_sessions REFERENCING OLD TABLE AS old_sessions
+    FOR EACH STATEMENT EXECUTE FUNCTION dialysis_sessions_refresh_vitals_snapshot();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_insert ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_update ON dialysis_sessions;
+DROP TRIGGER IF EXISTS dialysis_sessions_vitals_snapshot_delete ON dialysis_sessions;
+DROP FUNCTION IF EXISTS dialysis_sessions_refresh_vitals_snapshot();
+DROP FUNCTION IF EXISTS refresh_patient_vitals_snapshot(integer[]);
+"""
+
+
+def install_vitals_snapshot_triggers(conn: Connection) -> bool:
+    """Create (or replace) the refresh function and triggers once both tables exist."""
+    tables = conn.execute(text(
+        "SELECT to_regclass('dialysis_sessions') IS NOT NULL AND to_regclass('patient_vitals_snapshot') IS NOT NULL"
+    )).scalar()
+    if not tables:
+        return False
+    conn.execute(text(REFRESH_FUNCTION_SQL))
+    conn.execute(text(TRIGGERS_SQL))
+    return True
+
+
+def refresh_vitals_snapshots(conn: Connection, patient_ids=None):
+    """Recompute the rows of `patient_ids`, or of every patient with sessions; the caller commits."""
+    if patient_ids is None:
+        conn.execute(text(
+            "SELECT refresh_patient_vitals_snapshot(ARRAY(SELECT DISTINCT patient_id FROM dialysis_sessions))"
+        ))
+    else:
+        conn.execute(text("SELECT refresh_patient_vitals_snapshot(:ids)"), {"ids": list(patient_ids)})
+
+
+def patient_vitals_snapshot(db: Session, patient_id: int):
+    """The patient's newest vitals and 30-day averages; None without sessions."""
+    # Imported here: the model module installs the triggers defined above
+    from app.db.models.vitals_snapshot import PatientVitalsSnapshot
+
+    return db.get(PatientVitalsSnapshot, patient_id)
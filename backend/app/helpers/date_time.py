@@ -1,4 +1,4 @@
-from datetime import datetime, time, timezone
+from datetime import datetime, time, timedelta, timezone
 from typing import Optional, Tuple
 
 def normalize_to_utc_day_bounds(
@@ -21,3 +21,24 @@ def normalize_to_utc_day_bounds(
         end_dt = datetime.combine(end.date(), time.max, tzinfo=timezone.utc)
 
     return start_dt, end_dt
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    value as a naive UTC datetime, the form timestamp (without time zone)
+    columns such as dialysis_sessions.session_date hold. Naive values are
+    taken to be UTC already.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def calendar_day_range(value: datetime) -> Tuple[datetime, datetime]:
+    """
+    Half-open [start, next day's start) bounds of value's calendar day, as naive
+    datetimes. Filtering a column against these instead of date(column) lets
+    Postgres use an index on the column.
+    """
+    start = datetime.combine(value.date(), time.min)
+    return start, start + timedelta(days=1)
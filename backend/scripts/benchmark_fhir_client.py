@@ -0,0 +1,128 @@
+"""
+Benchmark the FHIR client, session cache and circuit breaker against the
+in-process FakeFhirServer, so runs are repeatable without a HAPI container.
+
+    python scripts/benchmark_fhir_client.py [--patients 20] [--sessions 300] [--latency 0.02]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.db.fhir_breaker import fhir_circuit_breaker
+from app.db.fhir_cache import fhir_session_cache, cached_fhir_search_dialysis_sessions
+from app.db.fhir_integration import (
+    use_fhir_transports,
+    close_fhir_clients,
+    fhir_bulk_upsert_dialysis_sessions,
+    fhir_search_dialysis_sessions,
+)
+from fhir_fake_server import FakeFhirServer
+
+
+def sample_sessions(patients, per_patient, rng):
+    for patient_id in range(1, patients + 1):
+        for i in range(per_patient):
+            yield dict(
+                session_id=patient_id * 100000 + i,
+                patient_id=patient_id,
+                date=(date(2023, 1, 1) + timedelta(days=i // 2)).isoformat(),
+                session_type="pre" if i % 2 else "post",
+                weight=round(rng.uniform(50, 90), 1),
+                diastolic=rng.randint(60, 90),
+                systolic=rng.randint(100, 140),
+                effluent_volume=round(rng.uniform(0.5, 2.5), 2),
+                duration=rng.randint(30, 300),
+                protein=round(rng.uniform(0.5, 2.0), 2),
+            )
+
+
+async def timed_reads(search, patient_ids, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(patient_id):
+        async with semaphore:
+            started = time.perf_counter()
+            await search(patient_id=patient_id, limit=None)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in patient_ids))
+    return latencies, time.perf_counter() - started
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(
+        f"{name:>22}: {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+async def breaker_phase(server, patient_ids, reads):
+    fhir_circuit_breaker.reset()
+    server.configure(error_rate=0.6)
+    outcomes = {"ok": 0, "failed": 0, "short_circuited": 0}
+    started = time.perf_counter()
+    for i in range(reads):
+        try:
+            await asyncio.wait_for(
+                fhir_search_dialysis_sessions(patient_id=patient_ids[i % len(patient_ids)], limit=50),
+                timeout=settings.FHIR_READ_DEADLINE_SECONDS,
+            )
+            outcomes["ok"] += 1
+        except Exception as e:
+            outcomes["short_circuited" if type(e).__name__ == "FhirCircuitOpenError" else "failed"] += 1
+    elapsed = time.perf_counter() - started
+    print(f"  60% injected errors, {reads} reads in {elapsed:.2f}s: {outcomes}")
+    print(f"  breaker: {fhir_circuit_breaker.stats()}")
+    server.configure(error_rate=0.0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=300, help="sessions per patient")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected seconds per FHIR request")
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = FakeFhirServer(latency_seconds=args.latency, seed=args.seed)
+    await use_fhir_transports(server.asgi_transport(), server.sync_transport())
+    try:
+        started = time.perf_counter()
+        outcomes = await fhir_bulk_upsert_dialysis_sessions(list(sample_sessions(args.patients, args.sessions, rng)))
+        failed = sum(1 for o in outcomes if not o["ok"])
+        print(f"Loaded {len(outcomes)} sessions ({failed} failed) in {time.perf_counter() - started:.2f}s "
+              f"over {server.stats()['requests']} Bundle requests")
+
+        patient_ids = [rng.randint(1, args.patients) for _ in range(args.reads)]
+        report("uncached search", *await timed_reads(fhir_search_dialysis_sessions, patient_ids, args.concurrency))
+        fhir_session_cache.clear()
+        report("cached search", *await timed_reads(cached_fhir_search_dialysis_sessions, patient_ids, args.concurrency))
+        print(f"  cache: {fhir_session_cache.stats()}")
+
+        print("Circuit breaker:")
+        await breaker_phase(server, patient_ids, args.reads)
+        print(f"Fake server: {server.stats()}")
+    finally:
+        await use_fhir_transports()
+        await close_fhir_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark parsing a 1000-entry Procedure searchset Bundle.
+
+Compares the original path (Bundle(**json) + model-based parsing), the
+strict per-entry path and the lean raw-JSON parser, and checks that all of
+them produce the same DialysisSessionResponse objects.
+
+    python scripts/benchmark_fhir_parsing.py [--entries 1000] [--repeat 5]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from fhir.resources.R4B.bundle import Bundle
+from app.db.fhir_integration import (
+    _fhir_build_dialysis_session_resource,
+    _fhir_parse_dialysis_session_resource,
+    fhir_parse_dialysis_session,
+)
+from app.db.schemas.dialysis import DialysisSessionResponse
+
+
+def build_bundle_json(entries):
+    rng = random.Random(42)
+    resources = []
+    for i in range(entries):
+        procedure_rsc = _fhir_build_dialysis_session_resource(
+            session_id=i + 1,
+            patient_id=rng.randint(1, 50),
+            date=(date(2024, 1, 1) + timedelta(days=i // 2)).isoformat(),
+            session_type="pre" if i % 2 else "post",
+            weight=round(rng.uniform(50, 90), 1),
+            diastolic=rng.randint(60, 90),
+            systolic=rng.randint(100, 140),
+            effluent_volume=round(rng.uniform(0.5, 2.5), 2),
+            duration=rng.choice([None, rng.randint(30, 300)]),
+            protein=round(rng.uniform(0.5, 2.0), 2),
+        )
+        resources.append(f'{{"fullUrl":"Procedure/{procedure_rsc.id}","resource":{procedure_rsc.model_dump_json()}}}')
+    return f'{{"resourceType":"Bundle","type":"searchset","total":{entries},"entry":[{",".join(resources)}]}}'
+
+
+def parse_full_bundle(body):
+    bundle_rsc = Bundle(**json.loads(body))
+    return [_fhir_parse_dialysis_session_resource(entry.resource) for entry in (bundle_rsc.entry or [])]
+
+
+def parse_strict(body):
+    return [fhir_parse_dialysis_session(entry["resource"], strict=True) for entry in json.loads(body)["entry"]]
+
+
+def parse_lean(body):
+    return [fhir_parse_dialysis_session(entry["resource"], strict=False) for entry in json.loads(body)["entry"]]
+
+
+def timed(fn, body, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(body)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = build_bundle_json(args.entries)
+    print(f"Bundle: {args.entries} entries, {len(body) / 1024:.0f} KiB")
+
+    results = {}
+    for name, fn in (("full Bundle model", parse_full_bundle), ("strict per entry", parse_strict), ("lean", parse_lean)):
+        best, sessions = timed(fn, body, args.repeat)
+        results[name] = (best, [DialysisSessionResponse(**s) for s in sessions])
+
+    baseline_time, baseline = results["full Bundle model"]
+    for name, (best, sessions) in results.items():
+        print(f"{name:>18}: {best * 1000:8.1f} ms  ({baseline_time / best:5.1f}x)")
+        if sessions != baseline:
+            raise SystemExit(f"{name} parser output differs from the full Bundle model")
+    print("All parsers produced identical sessions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the template-based dialysis-session Procedure serializer.
+
+Random sessions are serialized both through the R4B model
+(_fhir_build_dialysis_session_resource(...).model_dump_json()) and through
+fhir_dialysis_session_json(). That the two strings are identical is checked
+by tests/test_fhir_serializer.py.
+
+    python scripts/benchmark_fhir_serializer.py [--sessions 2000] [--repeat 5]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.db.fhir_integration import (
+    _fhir_build_dialysis_session_resource,
+    fhir_dialysis_session_json,
+)
+
+
+def random_sessions(count):
+    rng = random.Random(7)
+    for i in range(count):
+        yield dict(
+            session_id=i + 1,
+            patient_id=rng.randint(1, 500),
+            date=(date(2024, 1, 1) + timedelta(days=i // 2)).isoformat(),
+            session_type=rng.choice(["pre", "post"]),
+            weight=round(rng.uniform(40, 120), rng.randint(0, 3)),
+            diastolic=rng.randint(50, 100),
+            systolic=rng.randint(90, 180),
+            effluent_volume=rng.choice([round(rng.uniform(0.1, 3.0), 2), rng.randint(0, 3)]),
+            duration=rng.choice([None, rng.randint(-600, 600)]),
+            protein=rng.uniform(0, 3),
+        )
+
+
+def model_json(session):
+    return _fhir_build_dialysis_session_resource(**session).model_dump_json()
+
+
+def template_json(session):
+    return fhir_dialysis_session_json(**session)
+
+
+def timed(fn, sessions, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for session in sessions:
+            fn(session)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sessions = list(random_sessions(args.sessions))
+    model_time = timed(model_json, sessions, args.repeat)
+    template_time = timed(template_json, sessions, args.repeat)
+    per = 1e6 / len(sessions)
+    print(f"   model: {model_time * per:7.1f} us/session")
+    print(f"template: {template_time * per:7.1f} us/session  ({model_time / template_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark dialysis_sessions queries on one heap table vs monthly partitions.
+
+Loads the same synthetic sessions (10M rows by default: --patients patients
+with a pre and a post session every day, inserted in date order as the
+nightly writes are) into two tables in a scratch schema:
+
+- heap: dialysis_sessions before partitioning, with its indexes and unique keys;
+- partitioned: dialysis_sessions as app/db/partitions.py builds it, with one
+  partition per month, a default partition, the partitioned indexes and the
+  per-partition keys.
+
+Each hot query then runs --queries times against both tables for random
+patients and dates, and the median / p95 latency is reported. "Before" runs
+the query as the endpoints used to issue it; "after" runs the current form,
+e.g. the latest-session lookup bounded by LATEST_SESSION_WINDOW. The last
+row times VACUUM after 1% of the current month's sessions are updated: the
+whole heap against only the current month's partition. INDEX_CLEANUP ON
+makes both remove the dead index entries now; otherwise a vacuum with few
+dead rows defers that and the deferred work is never measured.
+
+The scratch schema is dropped at the end unless --keep is given; --reuse
+skips loading if a kept schema exists.
+
+    python scripts/benchmark_partitioning.py [--rows 10000000] [--patients 2000] [--queries 100] [--keep] [--reuse]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.db.dialysis_reads import LATEST_SESSION_WINDOW
+from app.db.partitions import SESSION_ID_KEY, SESSION_DAY_KEY, add_months, month_start
+
+SCHEMA = "partition_bench"
+COLUMNS = """
+    id               integer          NOT NULL,
+    patient_id       integer          NOT NULL,
+    session_type     varchar          NOT NULL,
+    session_id       integer          NOT NULL,
+    weight           double precision NOT NULL,
+    diastolic        integer          NOT NULL,
+    systolic         integer          NOT NULL,
+    effluent_volume  double precision NOT NULL,
+    session_date     timestamp        NOT NULL,
+    session_day      date GENERATED ALWAYS AS ((session_date)::date) STORED,
+    session_duration varchar,
+    protein          double precision NOT NULL
+"""
+STORED = (
+    "id, patient_id, session_type, session_id, weight, diastolic, systolic, "
+    "effluent_volume, session_date, session_duration, protein"
+)
+# Day-major, so rows land in the order nightly writes would insert them
+GENERATE_SQL = f"""
+INSERT INTO {SCHEMA}.heap ({STORED})
+SELECT (d * :patients + p - 1) * 2 + t + 1, p, CASE t WHEN 0 THEN 'pre' ELSE 'post' END, d * 2 + t + 1,
+       60 + random() * 30, 60 + (random() * 30)::int, 100 + (random() * 40)::int, 0.5 + random() * 2,
+       :first_day + d * interval '1 day' + interval '8 hours' + t * interval '5 hours', '4 hours', random() * 40
+FROM generate_series(0, :days - 1) AS d, generate_series(1, :patients) AS p, generate_series(0, 1) AS t
+"""
+
+
+def timed(conn, sql, params):
+    started = time.perf_counter()
+    conn.execute(text(sql), params).all()
+    return time.perf_counter() - started
+
+
+def load(conn, rows, patients):
+    days = max(rows // (2 * patients), 1)
+    first_day = date.today() - timedelta(days=days - 1)
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.heap ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, session_date)) PARTITION BY RANGE (session_date)"))
+    partitions = [f"{SCHEMA}.partitioned_default"]
+    conn.execute(text(f"CREATE TABLE {partitions[0]} PARTITION OF {SCHEMA}.partitioned DEFAULT"))
+    month = month_start(first_day)
+    while month <= add_months(month_start(date.today()), 3):
+        partitions.append(f"{SCHEMA}.partitioned_p{month:%Y%m}")
+        conn.execute(text(
+            f"CREATE TABLE {partitions[-1]} PARTITION OF {SCHEMA}.partitioned "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        ))
+        month = add_months(month, 1)
+
+    started = time.perf_counter()
+    conn.execute(text(GENERATE_SQL), {"patients": patients, "days": days, "first_day": first_day})
+    conn.execute(text(f"INSERT INTO {SCHEMA}.partitioned ({STORED}) SELECT {STORED} FROM {SCHEMA}.heap"))
+    for table in ("heap", "partitioned"):
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (patient_id, session_date)"))
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (patient_id, session_type, session_date DESC)"))
+    conn.execute(text(f"CREATE UNIQUE INDEX ON {SCHEMA}.heap (patient_id, session_id)"))
+    conn.execute(text(f"CREATE UNIQUE INDEX ON {SCHEMA}.heap (patient_id, session_type, session_day)"))
+    for partition in partitions:
+        name = partition.split(".")[1]
+        conn.execute(text(f"CREATE UNIQUE INDEX {name}_{SESSION_ID_KEY} ON {partition} (patient_id, session_id)"))
+        conn.execute(text(f"CREATE UNIQUE INDEX {name}_{SESSION_DAY_KEY} ON {partition} (patient_id, session_type, session_day)"))
+    conn.commit()
+    print(f"Loaded {days * patients * 2:,} sessions per table ({days} days, {len(partitions)} partitions) "
+          f"in {time.perf_counter() - started:.0f} s")
+
+
+def cases(first_day, last_day, patients, rng):
+    """(name, before SQL, after SQL, params factory)"""
+
+    def patient_day():
+        day = first_day + timedelta(days=rng.randrange((last_day - first_day).days + 1))
+        start = datetime.combine(day, datetime.min.time())
+        return {"patient": rng.randint(1, patients), "start": start}
+
+    def latest():
+        return {"patient": rng.randint(1, patients), "since": datetime.utcnow() - LATEST_SESSION_WINDOW}
+
+    range_30 = ("SELECT * FROM {t} WHERE patient_id = :patient AND session_date >= :start "
+                "AND session_date <= :start + interval '30 days' ORDER BY session_date DESC, id DESC LIMIT 1000")
+    one_day = ("SELECT * FROM {t} WHERE patient_id = :patient AND session_type = 'pre' "
+               "AND session_date >= :start AND session_date < :start + interval '1 day' LIMIT 1")
+    latest_before = ("SELECT * FROM {t} WHERE patient_id = :patient AND session_type = 'post' "
+                     "ORDER BY session_date DESC LIMIT 1")
+    latest_after = ("SELECT * FROM {t} WHERE patient_id = :patient AND session_type = 'post' "
+                    "AND session_date >= :since ORDER BY session_date DESC LIMIT 1")
+    year_by_month = ("SELECT date_trunc('month', session_date), count(*), avg(weight) FROM {t} "
+                     "WHERE patient_id = :patient AND session_date >= :start "
+                     "AND session_date < :start + interval '1 year' GROUP BY 1")
+    all_patients_day = ("SELECT count(*), avg(weight) FROM {t} "
+                        "WHERE session_date >= :start AND session_date < :start + interval '1 day'")
+    by_session_id = "SELECT * FROM {t} WHERE patient_id = :patient AND session_id = :session_id"
+    return [
+        ("30-day range (GET /dialysis/sessions)", range_30, range_30, patient_day),
+        ("one day, one type (duplicate check)", one_day, one_day, patient_day),
+        ("latest post session", latest_before, latest_after, latest),
+        ("one year by month (reconcile, analytics)", year_by_month, year_by_month, patient_day),
+        ("one day, all patients", all_patients_day, all_patients_day, patient_day),
+        ("session_id lookup (PUT / DELETE)", by_session_id, by_session_id,
+         lambda: {"patient": rng.randint(1, patients), "session_id": rng.randint(1, 1000)}),
+    ]
+
+
+def benchmark(conn, queries, patients):
+    first_day, last_day = conn.execute(text(
+        f"SELECT min(session_date)::date, max(session_date)::date FROM {SCHEMA}.heap"
+    )).one()
+    print(f"{'query':<42} {'heap p50':>9} {'p95':>8} {'part. p50':>10} {'p95':>8} {'speedup':>8}")
+    for name, before, after, params in cases(first_day, last_day, patients, random.Random(42)):
+        results = {}
+        for table, sql in (("heap", before), ("partitioned", after)):
+            sql = sql.format(t=f"{SCHEMA}.{table}")
+            timed(conn, sql, params())  # warm the plan and cache
+            samples = sorted(timed(conn, sql, params()) for _ in range(queries))
+            results[table] = (statistics.median(samples), samples[int(len(samples) * 0.95) - 1])
+        (heap_p50, heap_p95), (part_p50, part_p95) = results["heap"], results["partitioned"]
+        print(f"{name:<42} {heap_p50 * 1000:8.2f}ms {heap_p95 * 1000:6.2f}ms "
+              f"{part_p50 * 1000:9.2f}ms {part_p95 * 1000:6.2f}ms {heap_p50 / part_p50:7.1f}x")
+
+
+def benchmark_vacuum(conn):
+    """VACUUM after touching 1% of this month's sessions: the whole heap vs this month's partition."""
+    current = f"{SCHEMA}.partitioned_p{month_start(date.today()):%Y%m}"
+    month = {"start": month_start(date.today())}
+    touch = ("UPDATE {t} SET weight = weight + 0.1 WHERE session_date >= :start "
+             "AND session_date < :start + interval '1 month' AND id % 100 = 0")
+    results = {}
+    for table, vacuumed in (("heap", f"{SCHEMA}.heap"), ("partitioned", current)):
+        conn.execute(text(touch.format(t=f"{SCHEMA}.{table}")), month)
+        started = time.perf_counter()
+        conn.execute(text(f"VACUUM (INDEX_CLEANUP ON) {vacuumed}"))
+        results[table] = time.perf_counter() - started
+    print(f"{'VACUUM after updating 1% of this month':<42} {results['heap'] * 1000:8.0f}ms {'':>8} "
+          f"{results['partitioned'] * 1000:9.0f}ms {'':>8} {results['heap'] / results['partitioned']:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000, help="sessions loaded into each table")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100, help="timed runs per query and table")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    parser.add_argument("--reuse", action="store_true", help=f"benchmark an existing {SCHEMA} schema")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regnamespace(:s) IS NOT NULL"), {"s": SCHEMA}).scalar()
+        if exists and not args.reuse:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            conn.commit()
+        if not (exists and args.reuse):
+            load(conn, args.rows, args.patients)
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.heap"))
+            conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.partitioned"))
+            benchmark(conn, args.queries, args.patients)
+            benchmark_vacuum(conn)
+        finally:
+            if not args.keep:
+                conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Bulk-load users and dialysis sessions with COPY.
+
+The ORM seeders (populate_db.py, seeder.py, seed_sample_patients.py) insert
+one row at a time and run a duplicate check per row. They are fine for the
+handful of demo accounts, but a staging-sized dataset takes hours. This
+loader streams rows into temporary staging tables with COPY, then moves them
+into users / dialysis_sessions with one INSERT ... SELECT per table:
+
+- rows that conflict with existing ones (same email or id, same patient,
+  type and day) are skipped and counted, not failed;
+- passwords are hashed with Argon2 in a process pool before the COPY;
+  values that are already Argon2 hashes are kept. Generated users all share
+  --password, so it is hashed once;
+- sessions without a session_id get ids from the per-patient counters
+  (app/db/session_ids.py), allocated once per patient for the whole load;
+- partitions are created for the months loaded (app/db/partitions.py);
+- ids are assigned after the current maximum, and the id sequences are set
+  once at the end instead of being called per row.
+
+Everything runs in one transaction. The three tables are locked against
+writes (reads continue) until it commits. Rows per second are reported for
+each phase.
+
+Input is either generated or read from files:
+
+- generate: --clinics clinics, each with one provider and
+  --patients-per-clinic patients, and an evening pre and next-morning post
+  session on most of the last --days nights for every patient;
+- users FILE / sessions FILE: CSV with a header row, or NDJSON (one object
+  per line), picked by the file extension or --format. Users have name,
+  email, password, role, sex, height, birth_date, optionally id,
+  notifications (a JSON object) and patients (a JSON list of user ids).
+  Sessions have the DialysisSession columns; session_id is optional.
+
+    python scripts/bulk_load.py generate [--clinics 20] [--patients-per-clinic 100] [--days 365] [--password P] [--seed N]
+    python scripts/bulk_load.py users FILE [--format csv|ndjson] [--workers N]
+    python scripts/bulk_load.py sessions FILE [--format csv|ndjson]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import csv
+import io
+import json
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import text
+
+from app.core.security import hash_password
+from app.db.session import Base, engine
+from app.db.partitions import ensure_dialysis_partitions
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = ["id", "name", "email", "password", "role", "sex", "height", "birth_date", "notifications", "patients"]
+SESSION_COLUMNS = [
+    "patient_id", "session_type", "session_id", "weight", "diastolic", "systolic",
+    "effluent_volume", "session_date", "session_duration", "protein",
+]
+NOTIFICATIONS_OFF = {
+    "lowBloodPressure": False,
+    "highBloodPressure": False,
+    "dialysisGrowthAdjustment": False,
+    "fluidOverloadHigh": False,
+    "fluidOverloadWatch": False,
+    "effluentVolume": False,
+    "protein": False,
+}
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE load_users (
+    line bigint, id integer, name text, email text, password text, role text, sex text,
+    height double precision, birth_date date, notifications json, patients integer[]
+) ON COMMIT DROP;
+CREATE TEMP TABLE load_sessions (
+    line bigint, patient_id integer, session_type text, session_id integer, weight double precision,
+    diastolic integer, systolic integer, effluent_volume double precision, session_date timestamp,
+    session_duration text, protein double precision
+) ON COMMIT DROP;
+"""
+# Users whose email is already taken (by a stored or an earlier loaded user) or whose id exists are skipped.
+# Email is checked explicitly: databases restored from the SQL dump lack the unique index on it.
+INSERT_USERS_SQL = f"""
+INSERT INTO users ({", ".join(USER_COLUMNS)})
+SELECT {", ".join(USER_COLUMNS)}
+FROM (SELECT DISTINCT ON (email) * FROM load_users ORDER BY email, line) l
+WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = l.email)
+ORDER BY line
+ON CONFLICT DO NOTHING
+"""
+# Counter rows for every loaded patient: past their highest existing or loaded session_id,
+# plus as many ids as they have sessions without one. Staged sessions then take those ids.
+ALLOCATE_SESSION_IDS_SQL = """
+WITH wanted AS (
+    SELECT s.patient_id, count(*) FILTER (WHERE s.session_id IS NULL) AS missing,
+           coalesce(max(s.session_id), 0) AS highest_loaded
+    FROM load_sessions s
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = s.patient_id)
+    GROUP BY s.patient_id
+), allocated AS (
+    INSERT INTO patient_session_counters (patient_id, last_session_id)
+    SELECT w.patient_id,
+           greatest(c.last_session_id, w.highest_loaded,
+                    (SELECT max(d.session_id) FROM dialysis_sessions d WHERE d.patient_id = w.patient_id),
+                    0) + w.missing
+    FROM wanted w LEFT JOIN patient_session_counters c ON c.patient_id = w.patient_id
+    ON CONFLICT (patient_id) DO UPDATE SET last_session_id = excluded.last_session_id
+    RETURNING patient_id, last_session_id
+), numbered AS (
+    SELECT s.line, a.last_session_id - w.missing
+           + row_number() OVER (PARTITION BY s.patient_id ORDER BY s.session_date, s.line) AS session_id
+    FROM load_sessions s
+    JOIN wanted w ON w.patient_id = s.patient_id
+    JOIN allocated a ON a.patient_id = s.patient_id
+    WHERE s.session_id IS NULL
+)
+UPDATE load_sessions s SET session_id = numbered.session_id FROM numbered WHERE s.line = numbered.line
+"""
+# Sessions of unknown patients and duplicates of a stored (patient, type, day) are skipped
+INSERT_SESSIONS_SQL = f"""
+INSERT INTO dialysis_sessions (id, {", ".join(SESSION_COLUMNS)})
+SELECT :first_id + row_number() OVER (ORDER BY s.session_date, s.line), {", ".join(f"s.{c}" for c in SESSION_COLUMNS)}
+FROM load_sessions s
+WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = s.patient_id)
+ON CONFLICT DO NOTHING
+"""
+
+
+class CopyStream:
+    """Read-only file object that renders rows as CSV on demand, so COPY streams without a temp file."""
+
+    def __init__(self, rows, batch: int = 5000):
+        self._rows = iter(rows)
+        self._batch = batch
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out)
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = list(islice(self._rows, self._batch))
+            if not chunk:
+                break
+            self._writer.writerows(chunk)
+            self.count += len(chunk)
+            self._buffer += self._out.getvalue()
+            self._out.seek(0)
+            self._out.truncate()
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class Timer:
+    """Rows per second of each load phase."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._phase_started = self.started
+
+    def phase(self, name: str, rows: int, skipped: int = 0):
+        now = time.perf_counter()
+        seconds = now - self._phase_started
+        self._phase_started = now
+        rate = rows / seconds if seconds > 0 else 0
+        extra = f", {skipped:,} skipped" if skipped else ""
+        logger.info(f"{name}: {rows:,} rows in {seconds:.1f} s ({rate:,.0f} rows/s{extra})")
+
+    def total(self, rows: int):
+        seconds = time.perf_counter() - self.started
+        logger.info(f"Loaded {rows:,} rows in {seconds:.1f} s ({rows / seconds:,.0f} rows/s overall)")
+
+
+def read_records(path: str, fmt: str = None):
+    """Dicts from a CSV (with header) or NDJSON file; CSV cells for notifications/patients hold JSON."""
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(path, newline="") as f:
+        if fmt == "ndjson":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for record in csv.DictReader(f):
+                for key in ("notifications", "patients"):
+                    if record.get(key):
+                        record[key] = json.loads(record[key])
+                yield {key: value if value != "" else None for key, value in record.items()}
+
+
+def _hash(password: str) -> str:
+    return password if password.startswith("$argon2") else hash_password(password)
+
+
+def hash_passwords(users, workers: int = None):
+    """Replace plaintext passwords with Argon2 hashes, using all cores."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashed = pool.map(_hash, [user["password"] for user in users], chunksize=8)
+        for user, password in zip(users, hashed):
+            user["password"] = password
+
+
+def _pg_array(values) -> str:
+    return "{" + ",".join(str(int(v)) for v in values) + "}"
+
+
+def user_rows(users):
+    for line, user in enumerate(users):
+        yield (
+            line, user["id"], user["name"], user["email"], user["password"], user.get("role") or "patient",
+            user["sex"], user["height"], user.get("birth_date"),
+            json.dumps(user.get("notifications") or NOTIFICATIONS_OFF), _pg_array(user.get("patients") or []),
+        )
+
+
+def session_rows(sessions):
+    for line, session in enumerate(sessions):
+        yield (line, *(session.get(column) for column in SESSION_COLUMNS))
+
+
+def generate_users(first_id: int, clinics: int, patients_per_clinic: int, password: str, rng: random.Random):
+    """One provider per clinic, followed by that clinic's patients; ids start at first_id."""
+    users, next_id = [], first_id
+    tag = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    for clinic in range(1, clinics + 1):
+        provider_id, next_id = next_id, next_id + 1
+        patient_ids = list(range(next_id, next_id + patients_per_clinic))
+        next_id += patients_per_clinic
+        users.append({
+            "id": provider_id, "name": f"Clinic {clinic} PROVIDER", "role": "provider",
+            "email": f"provider{clinic}.{tag}@devnull.com", "password": password,
+            "sex": rng.choice(["female", "male"]), "height": round(rng.uniform(155, 190), 1),
+            "birth_date": date(rng.randint(1960, 1990), rng.randint(1, 12), rng.randint(1, 28)),
+            "patients": patient_ids,
+        })
+        for number, patient_id in enumerate(patient_ids, start=1):
+            users.append({
+                "id": patient_id, "name": f"Clinic {clinic} Patient {number}", "role": "patient",
+                "email": f"patient{clinic}-{number}.{tag}@devnull.com", "password": password,
+                "sex": rng.choice(["female", "male"]), "height": round(rng.uniform(90, 185), 1),
+                "birth_date": date.today() - timedelta(days=rng.randint(2 * 365, 17 * 365)),
+            })
+    return users
+
+
+def generate_sessions(patient_ids, days: int, rng: random.Random):
+    """
+    A nightly exchange on ~95% of the last `days` nights, night by night as
+    logging would insert them: the pre session in the evening and the post
+    session the next morning, the last one this morning.
+    """
+    first_day = date.today() - timedelta(days=days)
+    baselines = {pid: (rng.uniform(12, 80), rng.randint(95, 125), rng.randint(55, 80)) for pid in patient_ids}
+    for offset in range(days):
+        day = datetime.combine(first_day + timedelta(days=offset), datetime.min.time())
+        for pid in patient_ids:
+            if rng.random() < 0.05:
+                continue
+            weight, systolic, diastolic = baselines[pid]
+            pre_weight = round(weight * rng.uniform(0.99, 1.02), 1)
+            for session_type, hour, effluent in (("pre", 18, 0.0), ("post", 24 + 7, rng.uniform(0.5, 2.5))):
+                yield {
+                    "patient_id": pid, "session_type": session_type,
+                    "weight": pre_weight if session_type == "pre" else round(pre_weight * rng.uniform(0.97, 1.0), 1),
+                    "systolic": systolic + rng.randint(-10, 10), "diastolic": diastolic + rng.randint(-8, 8),
+                    "effluent_volume": round(effluent, 2), "session_date": day + timedelta(hours=hour),
+                    "session_duration": f"{round(rng.uniform(8, 11), 1)} hours" if session_type == "post" else None,
+                    "protein": round(rng.uniform(0.1, 1.0), 2),
+                }
+
+
+def lock_tables(conn):
+    conn.execute(text(
+        "LOCK TABLE users, dialysis_sessions, patient_session_counters IN SHARE ROW EXCLUSIVE MODE"
+    ))
+
+
+def copy(conn, table: str, columns, rows) -> int:
+    stream = CopyStream(rows)
+    cursor = conn.connection.driver_connection.cursor()
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+    return stream.count
+
+
+def load_users(conn, users, timer: Timer) -> int:
+    """Staged users into users; ids are assigned after the current maximum where missing."""
+    next_id = conn.execute(text("SELECT coalesce(max(id), 0) + 1 FROM users")).scalar()
+    for user in users:
+        if user.get("id") is None:
+            user["id"], next_id = next_id, next_id + 1
+    copied = copy(conn, "load_users", ["line", *USER_COLUMNS], user_rows(users))
+    inserted = conn.execute(text(INSERT_USERS_SQL)).rowcount
+    timer.phase("users", inserted, copied - inserted)
+    return inserted
+
+
+def load_sessions(conn, sessions, timer: Timer) -> int:
+    copied = copy(conn, "load_sessions", ["line", *SESSION_COLUMNS], session_rows(sessions))
+    timer.phase("sessions COPY into staging", copied)
+
+    conn.execute(text("CREATE INDEX ON load_sessions (line)"))
+    conn.execute(text("ANALYZE load_sessions"))
+    conn.execute(text(ALLOCATE_SESSION_IDS_SQL))
+    first_day = conn.execute(text("SELECT min(session_date) FROM load_sessions")).scalar()
+    if first_day is not None:
+        ensure_dialysis_partitions(conn, first_month=first_day)
+    timer.phase("session_ids and partitions", copied)
+
+    first_id = conn.execute(text("SELECT coalesce(max(id), 0) FROM dialysis_sessions")).scalar()
+    inserted = conn.execute(text(INSERT_SESSIONS_SQL), {"first_id": first_id}).rowcount
+    timer.phase("sessions", inserted, copied - inserted)
+    return inserted
+
+
+def fix_sequences(conn, timer: Timer, rows: int):
+    for table in ("users", "dialysis_sessions"):
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce((SELECT max(id) FROM {table}), 0) + 1, false)"
+        ))
+        conn.execute(text(f"ANALYZE {table}"))
+    timer.phase("sequences and ANALYZE", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="generate a multi-clinic dataset")
+    generate.add_argument("--clinics", type=int, default=20)
+    generate.add_argument("--patients-per-clinic", type=int, default=100)
+    generate.add_argument("--days", type=int, default=365, help="nights of sessions per patient")
+    generate.add_argument("--password", default="password123", help="password of every generated user")
+    generate.add_argument("--seed", type=int, default=None, help="random seed, for a reproducible dataset")
+    for name in ("users", "sessions"):
+        command = commands.add_parser(name, help=f"load {name} from a CSV or NDJSON file")
+        command.add_argument("file")
+        command.add_argument("--format", choices=["csv", "ndjson"], default=None, help="default: from the extension")
+    commands.choices["users"].add_argument(
+        "--workers", type=int, default=None, help="password hashing processes (default: all cores)"
+    )
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    timer = Timer()
+    loaded = 0
+    with engine.begin() as conn:
+        lock_tables(conn)
+        conn.execute(text(CREATE_STAGING_SQL))
+        if args.command == "generate":
+            rng = random.Random(args.seed)
+            first_id = conn.execute(text("SELECT coalesce(max(id), 0) + 1 FROM users")).scalar()
+            # Every generated user shares the --password; one hash serves them all
+            users = generate_users(first_id, args.clinics, args.patients_per_clinic, hash_password(args.password), rng)
+            timer.phase("password hashing", len(users))
+            loaded += load_users(conn, users, timer)
+            patient_ids = [user["id"] for user in users if user["role"] == "patient"]
+            loaded += load_sessions(conn, generate_sessions(patient_ids, args.days, rng), timer)
+        elif args.command == "users":
+            users = list(read_records(args.file, args.format))
+            hash_passwords(users, args.workers)
+            timer.phase("password hashing", len(users))
+            loaded += load_users(conn, users, timer)
+        else:
+            loaded += load_sessions(conn, read_records(args.file, args.format), timer)
+        fix_sequences(conn, timer, loaded)
+    timer.total(loaded)
+
+
+if __name__ == "__main__":
+    main()
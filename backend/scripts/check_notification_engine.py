@@ -0,0 +1,112 @@
+"""
+Check the batch notification engine against the scalar analysis, and time both.
+
+Generates --cases random patients and compares every flag of
+analyze_notifications_batch with analyze_blood_pressure / analyze_weight for
+the same patient. Ages cover under-ones, every age range and adults; heights
+and blood pressures are drawn around the reference values, with a share of
+them exactly on a percentile or threshold, where < and <= differ. Weights are
+positive (the scalar functions divide by them) and are sometimes equal to the
+EDW or to each other. Exits with status 1 on the first mismatch.
+
+Then times a provider panel of each --panel size: the scalar functions in a
+loop against one batch call, reported per patient.
+
+    python scripts/check_notification_engine.py [--cases 100000] [--panel 100 1000 10000] [--seed 7]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import random
+import time
+
+from app.core.notifications import (
+    analyze_blood_pressure,
+    analyze_notifications_batch,
+    analyze_weight,
+)
+from app.core.bp_reference import AGE_BANDS, BP_REFERENCE, HEIGHT_REFERENCE
+
+COLUMNS = ["ages", "genders", "heights", "pre_systolic", "pre_diastolic", "post_systolic", "post_diastolic",
+           "pre_weight", "post_weight", "edw"]
+
+
+def random_patient(rng):
+    gender = rng.choice(["male", "female", "Male", "FEMALE"])
+    age = rng.choice([rng.randint(-1, 20), rng.randint(18, 90)])
+    age_range = rng.choice(list(AGE_BANDS))
+    heights = HEIGHT_REFERENCE[gender.lower()][age_range]
+    height = rng.choice([rng.choice(heights), rng.uniform(60, 200), round(rng.uniform(heights[0], heights[2]), 1)])
+    references = [v for band in BP_REFERENCE[gender.lower()][age_range].values() for pair in band.values() for v in pair]
+
+    def pressure():
+        return rng.choice(references) + rng.choice([0, 0, -1, 1, rng.randint(-30, 30)])
+
+    edw = round(rng.uniform(10, 120), 1)
+    pre_weight = rng.choice([edw, round(edw * rng.uniform(0.95, 1.06), 1), round(rng.uniform(10, 120), 2)])
+    post_weight = rng.choice([edw, pre_weight, round(edw * rng.uniform(0.95, 1.03), 1), round(pre_weight * 1.01, 2)])
+    return {
+        "ages": age, "genders": gender, "heights": height,
+        "pre_systolic": pressure(), "pre_diastolic": pressure(),
+        "post_systolic": pressure(), "post_diastolic": pressure(),
+        "pre_weight": pre_weight, "post_weight": post_weight, "edw": edw,
+    }
+
+
+def scalar_flags(p):
+    flags = analyze_blood_pressure(p["pre_systolic"], p["pre_diastolic"], p["post_systolic"], p["post_diastolic"],
+                                   p["ages"], p["genders"], p["heights"])
+    flags.update(analyze_weight(p["pre_weight"], p["post_weight"], p["edw"], None))
+    return flags
+
+
+def batch(patients):
+    return analyze_notifications_batch(**{c: [p[c] for p in patients] for c in COLUMNS})
+
+
+def check(cases, rng):
+    patients = [random_patient(rng) for _ in range(cases)]
+    flags = batch(patients)
+    for i, patient in enumerate(patients):
+        for name, expected in scalar_flags(patient).items():
+            if bool(flags[name][i]) != expected:
+                print(f"MISMATCH {name}: scalar {expected}, batch {bool(flags[name][i])} for {patient}")
+                return False
+    print(f"{cases:,} patients: every flag matches the scalar functions")
+    return True
+
+
+def benchmark(sizes, rng):
+    print(f"{'panel':>7} {'scalar / patient':>17} {'batch / patient':>16} {'speedup':>8}")
+    for size in sizes:
+        patients = [random_patient(rng) for _ in range(size)]
+        started = time.perf_counter()
+        for patient in patients:
+            scalar_flags(patient)
+        scalar = (time.perf_counter() - started) / size
+        batch(patients)  # warm up
+        started = time.perf_counter()
+        batch(patients)
+        vectorized = (time.perf_counter() - started) / size
+        print(f"{size:>7,} {scalar * 1e6:15.2f}us {vectorized * 1e6:14.2f}us {scalar / vectorized:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=100_000, help="random patients compared")
+    parser.add_argument("--panel", type=int, nargs="+", default=[100, 1000, 10000], help="panel sizes timed")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not check(args.cases, rng):
+        sys.exit(1)
+    benchmark(args.panel, rng)
+
+
+if __name__ == "__main__":
+    main()
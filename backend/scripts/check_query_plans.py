@@ -0,0 +1,210 @@
+"""
+Check that the hot dialysis_sessions / fhir_outbox queries are planned as index
+scans on the indexes added by the Alembic migrations, and that queries bounded
+on session_date only scan the partitions of the months they cover.
+
+The checks run in a transaction that is rolled back. Inside it, synthetic
+patients, sessions and outbox entries are inserted and the tables ANALYZEd, so
+the planner sees realistic selectivity even on an empty or dump-sized database.
+Sequential scans are disabled too (SET LOCAL enable_seqscan = off): a query
+that can't use its index falls back to a scan and fails the check. The script
+exits non-zero if any query misses its index or scans too many partitions, so
+it can gate CI or a deploy after `alembic upgrade head`.
+
+Index scans on a partition are reported under the name of the index they come
+from: the partitioned index on dialysis_sessions, or the per-partition key
+suffix (session_id_key, session_day_key) of app/db/partitions.py.
+
+    python scripts/check_query_plans.py [--patients 200] [--sessions 100] [--allow-seqscan] [--verbose]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, text
+
+from app.core.config import settings
+from app.db.session import engine
+from app.db.dialysis_reads import latest_session_statement, LATEST_SESSION_WINDOW
+from app.db.models.dialysis import DialysisSession
+from app.db.models.fhir_outbox import FhirOutbox
+from app.db.partitions import SESSION_ID_KEY
+from app.helpers.date_time import calendar_day_range
+
+
+def hot_queries(patient_id):
+    """
+    (name, statement, acceptable indexes, columns their Index Cond must cover,
+    most partitions the scan may touch or None)
+    """
+    now = datetime.utcnow()
+    day_start, next_day = calendar_day_range(now)
+    return [
+        (
+            "latest post session (latest_dialysis_session)",
+            latest_session_statement(patient_id, "post", now - LATEST_SESSION_WINDOW),
+            ("ix_dialysis_sessions_patient_id_session_type_session_date",),
+            ("patient_id", "session_type"),
+            # The window's months (at most four), the months created ahead and the default partition
+            4 + settings.DB_PARTITION_MONTHS_AHEAD + 1,
+        ),
+        (
+            "same-day session lookup (populate_db)",
+            select(DialysisSession)
+            .where(
+                DialysisSession.patient_id == patient_id,
+                DialysisSession.session_type == "pre",
+                DialysisSession.session_date >= day_start,
+                DialysisSession.session_date < next_day,
+            )
+            .limit(1),
+            # Either index bounds the scan to the day now that the predicate is a range
+            ("ix_dialysis_sessions_patient_id_session_type_session_date", "ix_dialysis_sessions_patient_id_session_date"),
+            ("patient_id", "session_date"),
+            1,
+        ),
+        (
+            "session_id lookup (update / delete)",
+            select(DialysisSession)
+            .where(DialysisSession.session_id == 101, DialysisSession.patient_id == patient_id),
+            (SESSION_ID_KEY,),
+            ("patient_id", "session_id"),
+            None,
+        ),
+        (
+            "highest session_id (counter seed)",
+            select(func.max(DialysisSession.session_id)).where(DialysisSession.patient_id == patient_id),
+            (SESSION_ID_KEY,),
+            ("patient_id",),
+            None,
+        ),
+        (
+            "session date range (GET /dialysis/sessions)",
+            select(DialysisSession)
+            .where(
+                DialysisSession.patient_id == patient_id,
+                DialysisSession.session_date >= now - timedelta(days=30),
+                DialysisSession.session_date <= now,
+            )
+            .order_by(DialysisSession.session_date.desc(), DialysisSession.id.desc())
+            .limit(1000),
+            ("ix_dialysis_sessions_patient_id_session_date",),
+            ("patient_id", "session_date"),
+            # 30 days touch at most two months
+            2,
+        ),
+        (
+            "outbox claim scan",
+            select(FhirOutbox)
+            .where(FhirOutbox.status.in_(("pending", "processing")))
+            .order_by(FhirOutbox.id)
+            .limit(200),
+            ("ix_fhir_outbox_active_id",),
+            (),
+            None,
+        ),
+    ]
+
+
+SYNTHETIC_PATIENT_BASE = 900000000
+
+SEED_SQL = """
+INSERT INTO users (id, name, email, password, role, sex, height, birth_date)
+SELECT :base + p, 'plan check ' || p, 'plan-check-' || p || '@example.invalid', '-', 'patient', 'female', 165, date '1980-01-01'
+FROM generate_series(1, :patients) AS p;
+
+INSERT INTO dialysis_sessions (patient_id, session_type, session_id, weight, diastolic, systolic,
+                               effluent_volume, session_date, session_duration, protein)
+SELECT :base + p, CASE WHEN s % 2 = 0 THEN 'pre' ELSE 'post' END, s, 70, 80, 120,
+       1.5, now() - (s / 2) * interval '1 day', '4 hours', 1.0
+FROM generate_series(1, :patients) AS p, generate_series(1, :sessions) AS s;
+
+INSERT INTO fhir_outbox (resource_type, resource_id, patient_id, operation, status, attempts, next_attempt_at, created_at)
+SELECT 'Procedure', 'plan-check-' || i, :base + 1, 'upsert',
+       CASE WHEN i % 100 = 0 THEN 'pending' ELSE 'failed' END, 0, now(), now()
+FROM generate_series(1, :patients * :sessions) AS i;
+
+ANALYZE users;
+ANALYZE dialysis_sessions;
+ANALYZE fhir_outbox;
+"""
+
+
+def seed(conn, patients, sessions):
+    """Synthetic rows for the planner's statistics; rolled back with the check's transaction."""
+    for statement in filter(str.strip, SEED_SQL.split(";")):
+        conn.execute(text(statement), {"base": SYNTHETIC_PATIENT_BASE, "patients": patients, "sessions": sessions})
+
+
+# Partition index -> the partitioned index it belongs to, or its name without the partition prefix
+INDEX_FAMILIES_SQL = """
+SELECT i.relname, coalesce(parent.relname, substr(i.relname, length(t.relname) + 2))
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+LEFT JOIN pg_inherits h ON h.inhrelid = i.oid
+LEFT JOIN pg_class parent ON parent.oid = h.inhparent
+WHERE t.relispartition
+"""
+
+
+def scans(plan):
+    """Yield (relation, index name, index condition) for every scan in a JSON plan tree."""
+    if "Relation Name" in plan or "Index Name" in plan:
+        # Bitmap index scans name the index only; their heap scan names the relation
+        yield plan.get("Relation Name"), plan.get("Index Name"), plan.get("Index Cond", "")
+    for child in plan.get("Plans", []):
+        yield from scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200, help="synthetic patients to plan against")
+    parser.add_argument("--sessions", type=int, default=100, help="synthetic sessions per patient")
+    parser.add_argument("--allow-seqscan", action="store_true", help="plan with the real costs instead")
+    parser.add_argument("--verbose", action="store_true", help="print each plan")
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            seed(conn, args.patients, args.sessions)
+            if not args.allow_seqscan:
+                conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            families = dict(conn.execute(text(INDEX_FAMILIES_SQL)).all())
+            for name, statement, expected, columns, max_partitions in hot_queries(SYNTHETIC_PATIENT_BASE + 1):
+                compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+                plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+                plan = (plan if isinstance(plan, list) else json.loads(plan))[0]["Plan"]
+                scanned = list(scans(plan))
+                used = {}
+                for _, index, condition in scanned:
+                    if index:
+                        used.setdefault(families.get(index, index), condition)
+                partitions = len({relation for relation, _, _ in scanned if relation})
+                hit = next((index for index in expected if index in used), None)
+                missing = [c for c in columns if hit and c not in used[hit]]
+                unpruned = max_partitions is not None and partitions > max_partitions
+                ok = hit is not None and not missing and not unpruned
+                failures += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {name}: {', '.join(used) or 'no index'}, {partitions} relation(s)"
+                      + (f" (Index Cond lacks {', '.join(missing)})" if missing else "")
+                      + (f" (expected at most {max_partitions} partition(s))" if unpruned else ""))
+                if args.verbose or not ok:
+                    print(json.dumps(plan, indent=2))
+        finally:
+            transaction.rollback()
+    if failures:
+        print(f"{failures} quer{'y' if failures == 1 else 'ies'} not using the expected index or partitions")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
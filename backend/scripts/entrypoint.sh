@@ -54,9 +54,20 @@ fi
 
 # Apply database schema and data
 if [ -f "/app/pd_management.sql" ] && [ "$AZURE_DEPLOYMENT" != "true" ]; then
-    echo "$LOG_PREFIX Restoring Database from SQL Dump File..."
-    PGPASSWORD=$POSTGRES_PASSWORD psql -h "$POSTGRES_HOST" -U "$POSTGRES_USER" -d "$POSTGRES_DB" -f "/app/pd_management.sql" || echo "$LOG_PREFIX SQL restore failed."
-    echo "$LOG_PREFIX Database restoration complete!"
+    # The dump drops and recreates the pre-migration tables (without touching
+    # alembic_version), so it is only restored before the first migration
+    MIGRATED=$(PGPASSWORD=$POSTGRES_PASSWORD psql -h "$POSTGRES_HOST" -U "$POSTGRES_USER" -d "$POSTGRES_DB" -tAc "SELECT to_regclass('public.alembic_version') IS NOT NULL")
+    if [ "$MIGRATED" = "t" ]; then
+        echo "$LOG_PREFIX Database already migrated, skipping SQL dump restore"
+    else
+        echo "$LOG_PREFIX Restoring Database from SQL Dump File..."
+        PGPASSWORD=$POSTGRES_PASSWORD psql -h "$POSTGRES_HOST" -U "$POSTGRES_USER" -d "$POSTGRES_DB" -f "/app/pd_management.sql" || echo "$LOG_PREFIX SQL restore failed."
+        echo "$LOG_PREFIX Database restoration complete!"
+    fi
+
+    # The dump only has tables; migrations add the indexes and later schema changes
+    echo "$LOG_PREFIX Running database migrations..."
+    alembic upgrade head || { echo "$LOG_PREFIX Migrations failed, check logs!"; exit 1; }
 else
     echo "$LOG_PREFIX Running database migrations..."
     alembic upgrade head || { echo "$LOG_PREFIX Migrations failed, check logs!"; exit 1; }
@@ -0,0 +1,342 @@
+"""
+In-process stand-in for the HAPI FHIR server, for the benchmarks in this
+directory. It is not part of the app package: benchmarks inject it with
+app.db.fhir_integration.use_fhir_transports().
+
+FakeFhirServer keeps Patient and Procedure resources in memory and answers
+the subset of the FHIR REST API this backend uses:
+
+    PUT/GET/DELETE  {type}/{id}
+    GET             Procedure?subject=&date=&_sort=&_count=   (searchset paging)
+    GET             ?_getpages=&_getpagesoffset=&_count=      (next links)
+    POST            (base) batch / transaction Bundles of PUT and DELETE
+
+It is an ASGI app, so an httpx.AsyncClient can talk to it through
+httpx.ASGITransport, and sync_transport() serves the same handler to
+httpx.Client. Latency and error rates can be injected with a seeded RNG, which
+keeps benchmark runs reproducible.
+"""
+
+import asyncio
+import copy
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import httpx
+
+from app.core.config import settings
+
+FHIR_JSON = "application/fhir+json"
+SUPPORTED_TYPES = ("Patient", "Procedure")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+
+
+def _outcome(severity, code, diagnostics):
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": severity, "code": code, "diagnostics": diagnostics}],
+    }
+
+
+def _parse_fhir_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _matches_date(resource, predicate: str) -> bool:
+    prefix, value = (predicate[:2], predicate[2:]) if predicate[:2].isalpha() else ("eq", predicate)
+    performed = resource.get("performedDateTime")
+    if not performed:
+        return False
+    left, right = _parse_fhir_datetime(performed), _parse_fhir_datetime(value)
+    return {
+        "eq": left == right, "ne": left != right,
+        "gt": left > right, "lt": left < right,
+        "ge": left >= right, "le": left <= right,
+    }.get(prefix, False)
+
+
+class FakeFhirServer:
+    def __init__(self, base_url: Optional[str] = None, latency_seconds: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.base_url = (base_url or settings.HAPI_FHIR_BASE_URL).rstrip("/")
+        self._base_path = urlsplit(self.base_url).path.rstrip("/")
+        self.latency_seconds = latency_seconds
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._resources = {}   # "Type/id" -> resource; replaced on PUT, never mutated in place
+        self._deleted = set()  # "Type/id" of deleted resources, answered with 410
+        self._searches = {}    # search id -> list of matching resources, for paging
+        self.requests = 0
+        self.injected_errors = 0
+
+    # -- configuration ----------------------------------------------------
+
+    def configure(self, latency_seconds=None, latency_jitter=None, error_rate=None, seed=None):
+        """Change the injected latency/error behaviour between benchmark phases."""
+        with self._lock:
+            if latency_seconds is not None:
+                self.latency_seconds = latency_seconds
+            if latency_jitter is not None:
+                self.latency_jitter = latency_jitter
+            if error_rate is not None:
+                self.error_rate = error_rate
+            if seed is not None:
+                self._rng.seed(seed)
+
+    def reset(self):
+        with self._lock:
+            self._resources.clear()
+            self._deleted.clear()
+            self._searches.clear()
+            self.requests = 0
+            self.injected_errors = 0
+
+    def resources(self, resource_type: Optional[str] = None):
+        with self._lock:
+            return [
+                copy.deepcopy(r) for key, r in self._resources.items()
+                if resource_type is None or key.startswith(resource_type + "/")
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resources": len(self._resources),
+                "requests": self.requests,
+                "injected_errors": self.injected_errors,
+                "open_searches": len(self._searches),
+            }
+
+    # -- transports -------------------------------------------------------
+
+    def asgi_transport(self) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self)
+
+    def sync_transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            delay, fail = self._draw_fault()
+            if delay:
+                time.sleep(delay)
+            status, body = self._fault_response() if fail else self.handle(
+                request.method, request.url.path, list(request.url.params.multi_items()), request.content
+            )
+            return httpx.Response(status, json=body, headers={"Content-Type": FHIR_JSON})
+        return httpx.MockTransport(handler)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        delay, fail = self._draw_fault()
+        if delay:
+            await asyncio.sleep(delay)
+        status, payload = self._fault_response() if fail else self.handle(
+            scope["method"], scope["path"], parse_qsl(scope["query_string"].decode(), keep_blank_values=True), body
+        )
+        content = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", FHIR_JSON.encode()), (b"content-length", str(len(content)).encode())],
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    def _draw_fault(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency_seconds
+            if self.latency_jitter:
+                delay += self._rng.uniform(0, self.latency_jitter)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+            return delay, fail
+
+    @staticmethod
+    def _fault_response():
+        return 503, _outcome("error", "transient", "Injected failure")
+
+    # -- FHIR REST --------------------------------------------------------
+
+    def handle(self, method: str, path: str, params, body: bytes):
+        """Dispatch one request; returns (status code, JSON body)."""
+        if path.startswith(self._base_path):
+            path = path[len(self._base_path):]
+        parts = [p for p in path.split("/") if p]
+        try:
+            if not parts:
+                if method == "POST":
+                    return self._bundle(json.loads(body or b"{}"))
+                if method == "GET" and any(k == "_getpages" for k, _ in params):
+                    return self._page(params)
+            elif parts[0] in SUPPORTED_TYPES:
+                if len(parts) == 1 and method == "GET":
+                    return self._search(parts[0], params)
+                if len(parts) == 2:
+                    key = f"{parts[0]}/{parts[1]}"
+                    if method == "PUT":
+                        return self._put(key, json.loads(body or b"{}"))
+                    if method == "GET":
+                        return self._read(key)
+                    if method == "DELETE":
+                        return self._delete(key)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, _outcome("error", "invalid", str(e))
+        return 404, _outcome("error", "not-supported", f"{method} /{'/'.join(parts)} is not supported")
+
+    def _put(self, key, resource):
+        resource_type, resource_id = key.split("/", 1)
+        if resource.get("resourceType") != resource_type or resource.get("id") != resource_id:
+            return 400, _outcome("error", "invalid", "resourceType/id in body must match the URL")
+        with self._lock:
+            previous = self._resources.get(key)
+            version = int(previous["meta"]["versionId"]) + 1 if previous else 1
+            stored = copy.deepcopy(resource)
+            stored["meta"] = {
+                "versionId": str(version),
+                "lastUpdated": datetime.now(timezone.utc).isoformat(),
+            }
+            self._resources[key] = stored
+            self._deleted.discard(key)
+            return (200 if previous else 201), stored
+
+    def _read(self, key):
+        with self._lock:
+            if key in self._resources:
+                return 200, self._resources[key]
+            if key in self._deleted:
+                return 410, _outcome("error", "deleted", f"Resource {key} has been deleted")
+        return 404, _outcome("error", "not-found", f"Resource {key} is not known")
+
+    def _delete(self, key):
+        with self._lock:
+            if self._resources.pop(key, None) is not None:
+                self._deleted.add(key)
+        # HAPI answers deletes of unknown resources with 200 as well
+        return 200, _outcome("information", "informational", f"Successfully deleted {key}")
+
+    def _search(self, resource_type, params):
+        count = DEFAULT_PAGE_SIZE
+        sort = None
+        filters = []
+        for name, value in params:
+            if name == "_count":
+                count = max(1, min(int(value), MAX_PAGE_SIZE))
+            elif name == "_sort":
+                sort = value
+            elif name in ("subject", "patient"):
+                reference = value if "/" in value else f"Patient/{value}"
+                filters.append(lambda r, ref=reference: (r.get("subject") or {}).get("reference") == ref)
+            elif name == "date":
+                filters.append(lambda r, predicate=value: _matches_date(r, predicate))
+            elif name == "_id":
+                filters.append(lambda r, ids=set(value.split(",")): r.get("id") in ids)
+            elif not name.startswith("_"):
+                raise ValueError(f"Unsupported search parameter: {name}")
+        with self._lock:
+            matches = [
+                r for key, r in self._resources.items()
+                if key.startswith(resource_type + "/") and all(f(r) for f in filters)
+            ]
+        if sort in ("date", "-date"):
+            matches.sort(key=lambda r: (r.get("performedDateTime") or "", r["id"]), reverse=sort == "-date")
+        else:
+            matches.sort(key=lambda r: r["id"])
+        search_id = uuid.uuid4().hex
+        with self._lock:
+            self._searches[search_id] = matches
+        return 200, self._searchset(search_id, matches, 0, count)
+
+    def _page(self, params):
+        params = dict(params)
+        search_id = params["_getpages"]
+        with self._lock:
+            matches = self._searches.get(search_id)
+        if matches is None:
+            return 410, _outcome("error", "not-found", f"Search {search_id} has expired")
+        offset = int(params.get("_getpagesoffset", 0))
+        count = max(1, min(int(params.get("_count", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        return 200, self._searchset(search_id, matches, offset, count)
+
+    def _searchset(self, search_id, matches, offset, count):
+        page = matches[offset:offset + count]
+        links = [{"relation": "self", "url": self._page_url(search_id, offset, count)}]
+        if offset + count < len(matches):
+            links.append({"relation": "next", "url": self._page_url(search_id, offset + count, count)})
+        else:
+            with self._lock:
+                self._searches.pop(search_id, None)
+        return {
+            "resourceType": "Bundle",
+            "id": search_id,
+            "type": "searchset",
+            "total": len(matches),
+            "link": links,
+            "entry": [
+                {"fullUrl": f"{self.base_url}/{r['resourceType']}/{r['id']}", "resource": r, "search": {"mode": "match"}}
+                for r in page
+            ],
+        }
+
+    def _page_url(self, search_id, offset, count):
+        query = urlencode({"_getpages": search_id, "_getpagesoffset": offset, "_count": count, "_bundletype": "searchset"})
+        return f"{self.base_url}?{query}"
+
+    def _bundle(self, bundle):
+        bundle_type = bundle.get("type")
+        if bundle.get("resourceType") != "Bundle" or bundle_type not in ("batch", "transaction"):
+            return 400, _outcome("error", "invalid", "Expected a batch or transaction Bundle")
+        entries = bundle.get("entry") or []
+        requests = []
+        for entry in entries:
+            request = entry.get("request") or {}
+            method, url = request.get("method"), (request.get("url") or "").strip("/")
+            valid = method in ("PUT", "DELETE") and url.split("/")[0] in SUPPORTED_TYPES and url.count("/") == 1
+            requests.append((method, url, entry.get("resource"), valid))
+        if bundle_type == "transaction":
+            invalid = [url for _, url, _, valid in requests if not valid]
+            if invalid:
+                return 400, _outcome("error", "invalid", f"Transaction rejected, unsupported entries: {invalid}")
+            bad = [url for method, url, resource, _ in requests if method == "PUT" and (
+                (resource or {}).get("resourceType") != url.split("/")[0] or (resource or {}).get("id") != url.split("/")[1]
+            )]
+            if bad:
+                return 400, _outcome("error", "invalid", f"Transaction rejected, resource/url mismatch: {bad}")
+
+        responses = []
+        for method, url, resource, valid in requests:
+            if not valid:
+                status, body = 400, _outcome("error", "not-supported", f"{method} {url} is not supported in a Bundle")
+            elif method == "PUT":
+                status, body = self._put(url, resource or {})
+            else:
+                status, body = self._delete(url)
+                status = 204
+            response = {"status": f"{status} {httpx.codes.get_reason_phrase(status)}"}
+            if method == "PUT" and status < 300:
+                version = body["meta"]["versionId"]
+                response.update({"location": f"{url}/_history/{version}", "etag": f'W/"{version}"'})
+            elif status >= 400:
+                response["outcome"] = body
+            responses.append({"response": response})
+        return 200, {
+            "resourceType": "Bundle",
+            "id": uuid.uuid4().hex,
+            "type": f"{bundle_type}-response",
+            "entry": responses,
+        }
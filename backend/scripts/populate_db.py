@@ -7,7 +7,7 @@ from datetime import datetime, timedelta, timezone
 
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, text
+from sqlalchemy import text
 from argon2 import PasswordHasher
 
 # Ensure backend path is added so we can import modules.
@@ -16,6 +16,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app.db.session import SessionLocal, Base, engine
 from app.db.models.user import User
 from app.db.models.dialysis import DialysisSession
+from app.helpers.date_time import calendar_day_range
+from app.db.session_ids import reserve_session_ids
 
 # Configure logging.
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -113,21 +115,18 @@ except Exception as e:
 
 # Only seed dialysis sessions if none exist yet
 if db.query(DialysisSession).count() == 0:
-    # Determine starting session_id to avoid duplicates
-    starting_session_id = db.query(func.max(DialysisSession.session_id)).scalar() or 0
-    session_id_counter = starting_session_id
-
     # Seed dialysis sessions for each patient in our users list
     seeded_patient_ids = [db.query(User).filter(User.email == u["email"]).first().id for u in users]
+    logged_days = set()
     for patient_id in seeded_patient_ids:
         inserted_sessions_count = 0
         attempts = 0
+        # One block of session_ids per patient; ids of skipped attempts stay unused
+        session_ids = iter(reserve_session_ids(db, patient_id, 10))
         while inserted_sessions_count < 5 and attempts < 10:
             attempts += 1
             session_type = random.choice(["pre", "post"])
-            # Use incremental session_id to guarantee uniqueness
-            session_id_counter += 1
-            session_id = session_id_counter
+            session_id = next(session_ids)
 
             weight = round(random.uniform(50, 80), 1)
             diastolic = random.randint(70, 90)
@@ -137,14 +136,19 @@ if db.query(DialysisSession).count() == 0:
             session_duration = f"{random.randint(1, 4)} hours"
             protein = round(random.uniform(0.1, 1.0), 2)
 
+            day_start, next_day = calendar_day_range(session_date)
             existing = db.query(DialysisSession).filter(
                 DialysisSession.patient_id == patient_id,
                 DialysisSession.session_type == session_type,
-                func.date(DialysisSession.session_date) == session_date.date()
+                DialysisSession.session_date >= day_start,
+                DialysisSession.session_date < next_day
             ).first()
 
-            if existing:
+            # Rows added in this loop aren't flushed yet, so the query can't see them
+            day_key = (patient_id, session_type, day_start)
+            if existing or day_key in logged_days:
                 continue
+            logged_days.add(day_key)
 
             new_session = DialysisSession(
                 patient_id=patient_id,
@@ -0,0 +1,40 @@
+"""
+Rebuild dialysis_daily_rollup from dialysis_sessions.
+
+The triggers in app/db/daily_rollup.py keep the rollup current on every
+session write. Run this after they were disabled (e.g. for a restore) or
+sessions were repaired, for all days or only those between --start and
+--end (inclusive). Session writes to the rebuilt days wait until it commits.
+
+    python scripts/rebuild_daily_rollup.py [--start 2025-01-01] [--end 2025-12-31]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import time
+from datetime import date
+
+from app.db.session import engine
+from app.db.daily_rollup import install_daily_rollup_triggers, rebuild_daily_rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", type=date.fromisoformat, help="first day rebuilt (default: all)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day rebuilt (default: all)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if not install_daily_rollup_triggers(conn):
+            sys.exit("dialysis_daily_rollup does not exist; run the migrations first")
+        rows = rebuild_daily_rollup(conn, args.start, args.end)
+    print(f"Rebuilt {rows:,} patient-days in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Reconcile dialysis_sessions with the Procedures mirrored in HAPI FHIR.
+
+Only ranges whose checksums changed since they were last verified are
+fetched from FHIR unless --full is given. Repairs are queued in the FHIR
+outbox and pushed by the API's outbox worker.
+
+    python scripts/reconcile_fhir.py [--full] [--patient ID ...] [--dry-run]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import json
+
+from app.db.session import Base, engine
+from app.db.fhir_integration import close_fhir_clients
+from app.db.fhir_reconcile import reconcile_fhir
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="re-read every patient's Procedures from FHIR")
+    parser.add_argument("--patient", type=int, action="append", dest="patients", help="limit to these patient ids")
+    parser.add_argument("--dry-run", action="store_true", help="report differences without queueing repairs")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    try:
+        stats = await reconcile_fhir(full=args.full, patient_ids=args.patients, dry_run=args.dry_run)
+    finally:
+        await close_fhir_clients()
+    print(json.dumps(stats, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,8 +9,8 @@ from app.db.session import get_db
 from app.db.models.user import User
 from app.db.models.dialysis import DialysisSession
 from app.core.security import hash_password
-import app.api.analytics as analytics
-from app.db.fhir_integration import sync_fhir_create_patient_resource # (patient_id, name, birth_date, gender, height)
+from app.core.notifications import get_bp_reference_values
+from app.db.fhir_integration import sync_fhir_bulk_upsert_patients
 from datetime import datetime, timedelta
 import random
 import asyncio
@@ -61,7 +61,7 @@ def _create_patient(name_id, age, sex, height):
 
 
 def _gen_stable_patient_dialysis_sessions(patient_id, start_session_id, days, age, gender, height, start_weight):
-    bp_ref = analytics.get_bp_reference_values(age, gender, height)
+    bp_ref = get_bp_reference_values(age, gender, height)
     high_systolic, high_diastolic = bp_ref["90th"]
     low_systolic, low_diastolic = bp_ref["50th"]
 
@@ -123,8 +123,14 @@ def main():
         db.add_all(users)
         db.commit()
 
-        for user in users:
-            resp = sync_fhir_create_patient_resource(user.id, user.name, user.birth_date, user.sex, user.height)
+        outcomes = sync_fhir_bulk_upsert_patients([
+            {"patient_id": user.id, "name": user.name, "birth_date": user.birth_date,
+             "gender": user.sex, "height": user.height}
+            for user in users
+        ])
+        for outcome in outcomes:
+            if not outcome["ok"]:
+                print(f"FHIR upsert of {outcome['url']} failed: {outcome['error']}")
 
     if not db.query(DialysisSession).filter(DialysisSession.session_id == 3).all():
         dialysis_sessions = [data for user,data in records]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app as the scripts do, from the backend directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
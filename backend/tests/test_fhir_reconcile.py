@@ -0,0 +1,81 @@
+"""
+Reconciliation skips patients whose outbox is still catching FHIR up, but
+not patients whose entries were parked as failed.
+
+Runs against the database at DATABASE_URL (migrated, with sessions) and is
+skipped when none is reachable. FHIR is replaced by a search that returns
+nothing, and the runs are dry runs, so nothing is queued.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+import app.db.fhir_reconcile as fhir_reconcile
+from app.db.models.dialysis import DialysisSession
+from app.db.models.fhir_outbox import FhirOutbox
+from app.db.session import SessionLocal
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.connection()
+    except OperationalError:
+        session.close()
+        pytest.skip("no database at DATABASE_URL")
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def patient_id(db):
+    # A patient with sessions whose outbox is idle, so only the test's entry counts
+    active = db.query(FhirOutbox.patient_id).filter(
+        FhirOutbox.status.in_(("pending", "processing")), FhirOutbox.patient_id.isnot(None))
+    row = (
+        db.query(DialysisSession.patient_id)
+        .filter(DialysisSession.patient_id.notin_(active))
+        .group_by(DialysisSession.patient_id)
+        .order_by(func.count().desc())
+        .first()
+    )
+    if row is None:
+        pytest.skip("no patient with sessions and an idle outbox")
+    return row.patient_id
+
+
+@pytest.fixture
+def fhir_lost_everything(monkeypatch):
+    async def search(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(fhir_reconcile, "fhir_search_dialysis_sessions", search)
+
+
+def _outbox_entry(db, patient_id, status):
+    entry = FhirOutbox(resource_type="Procedure", resource_id=f"reconcile-test-{patient_id}",
+                       patient_id=patient_id, operation="upsert", payload={}, status=status, attempts=0)
+    db.add(entry)
+    db.commit()
+    return entry
+
+
+def _reconcile(patient_id):
+    return asyncio.run(fhir_reconcile.reconcile_fhir(full=True, patient_ids=[patient_id], dry_run=True))
+
+
+@pytest.mark.parametrize("status, skipped", [("failed", False), ("pending", True), ("processing", True)])
+def test_outbox_backlog_skips_only_active_entries(db, patient_id, fhir_lost_everything, status, skipped):
+    entry = _outbox_entry(db, patient_id, status)
+    try:
+        stats = _reconcile(patient_id)
+    finally:
+        db.delete(entry)
+        db.commit()
+    assert stats.get("patients_skipped_pending", 0) == int(skipped)
+    if not skipped:
+        assert stats["upserts_queued"] > 0
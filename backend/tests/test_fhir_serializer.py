@@ -0,0 +1,72 @@
+"""
+The template-based dialysis-session Procedure serializer must produce the
+same bytes as the R4B model: fhir_dialysis_session_json(...) against
+_fhir_build_dialysis_session_resource(...).model_dump_json(), and reject
+what the model rejects. scripts/benchmark_fhir_serializer.py times the two.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from app.db.fhir_integration import (
+    _fhir_build_dialysis_session_resource,
+    fhir_dialysis_session_json,
+)
+
+EDGE_CASES = [
+    # Values the endpoints actually send
+    dict(session_type="pre", weight=60.0, diastolic=70, systolic=110, effluent_volume=1.2, duration=None, protein=1.0),
+    dict(session_type="post", weight=72, diastolic=80, systolic=125, effluent_volume=0, duration=-45, protein=0.0),
+    # Numbers fhir.resources renders differently from repr()
+    dict(session_type="pre", weight=1e20, diastolic=70, systolic=110, effluent_volume=2.5e-05, duration=30, protein=1e-7),
+    dict(session_type="pre", weight=0.1 + 0.2, diastolic=70, systolic=110, effluent_volume=-0.0, duration=10**20, protein=1e16),
+    dict(session_type="pre", weight="60.5", diastolic=70, systolic=110, effluent_volume="1.50", duration=30, protein=1),
+    # Strings that need escaping
+    dict(session_type='pr"e\\ \n\t é ✓   /', weight=60.5, diastolic=70, systolic=110, effluent_volume=1.5, duration=30, protein=1),
+    dict(session_type=None, weight=None, diastolic=None, systolic=None, effluent_volume=None, duration=None, protein=None),
+    dict(session_type="  ", weight=60.5, diastolic=70, systolic=110, effluent_volume=1.5, duration=30, protein=1),
+]
+
+
+def assert_serialized_identically(session):
+    try:
+        expected = _fhir_build_dialysis_session_resource(**session).model_dump_json()
+    except ValueError:
+        # Values the model rejects (an empty session_type, say) must be rejected by the template too
+        with pytest.raises(ValueError):
+            fhir_dialysis_session_json(**session)
+        return
+    assert fhir_dialysis_session_json(**session) == expected
+
+
+@pytest.mark.parametrize("case", EDGE_CASES)
+def test_edge_cases(case):
+    assert_serialized_identically(dict(session_id=1, patient_id=2, date="2025-05-01", **case))
+
+
+sessions = st.fixed_dictionaries(dict(
+    session_id=st.integers(1, 10**6),
+    patient_id=st.integers(1, 10**6),
+    date=st.integers(0, 3650).map(lambda days: (date(2020, 1, 1) + timedelta(days=days)).isoformat()),
+    session_type=st.sampled_from(["pre", "post"]),
+    weight=st.one_of(st.floats(40, 120), st.floats(40, 120).map(lambda w: round(w, 1)), st.integers(40, 120)),
+    diastolic=st.integers(50, 100),
+    systolic=st.integers(90, 180),
+    effluent_volume=st.one_of(st.floats(0.1, 3.0).map(lambda v: round(v, 2)), st.integers(0, 3)),
+    duration=st.one_of(st.none(), st.integers(-600, 600)),
+    protein=st.floats(0, 3),
+))
+
+
+@settings(max_examples=300, deadline=None)
+@given(sessions)
+def test_random_sessions(session):
+    assert_serialized_identically(session)
+
+
+@settings(max_examples=300, deadline=None)
+@given(sessions, st.floats(allow_nan=False, allow_infinity=False), st.text())
+def test_any_weight_and_session_type(session, weight, session_type):
+    assert_serialized_identically({**session, "weight": weight, "session_type": session_type})
@@ -0,0 +1,136 @@
+"""
+Property tests of the notification engine (app/core/notifications.py).
+
+The batch engine must agree with the scalar analysis flag for flag, for any
+panel. Patients are drawn as scripts/check_notification_engine.py draws them:
+heights and pressures around the reference values, with a share exactly on a
+percentile or threshold, and positive weights that are sometimes equal.
+"""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from hypothesis import given, settings, strategies as st
+
+from app.core.bp_reference import AGE_BANDS, BP_REFERENCE, HEIGHT_REFERENCE
+from app.core.notifications import (
+    analyze_blood_pressure,
+    analyze_notifications_batch,
+    analyze_weight,
+    default_notifications,
+    evaluate_notifications,
+    evaluate_notifications_batch,
+)
+
+COLUMNS = ["ages", "genders", "heights", "pre_systolic", "pre_diastolic", "post_systolic", "post_diastolic",
+           "pre_weight", "post_weight", "edw"]
+
+
+@st.composite
+def patients(draw):
+    gender = draw(st.sampled_from(["male", "female", "Male", "FEMALE"]))
+    age = draw(st.one_of(st.integers(-1, 20), st.integers(18, 90)))
+    age_range = draw(st.sampled_from(list(AGE_BANDS)))
+    heights = HEIGHT_REFERENCE[gender.lower()][age_range]
+    height = draw(st.one_of(st.sampled_from(heights), st.floats(60, 200)))
+    references = sorted({v for band in BP_REFERENCE[gender.lower()][age_range].values()
+                         for pair in band.values() for v in pair})
+    pressure = st.one_of(
+        st.builds(lambda v, d: v + d, st.sampled_from(references), st.sampled_from([-1, 0, 1])),
+        st.integers(30, 200),
+    )
+    edw = draw(st.floats(10, 120))
+    weight = st.one_of(st.just(edw), st.floats(10, 120))
+    pre_weight = draw(weight)
+    post_weight = draw(st.one_of(st.just(pre_weight), weight))
+    return {
+        "ages": age, "genders": gender, "heights": height,
+        "pre_systolic": draw(pressure), "pre_diastolic": draw(pressure),
+        "post_systolic": draw(pressure), "post_diastolic": draw(pressure),
+        "pre_weight": pre_weight, "post_weight": post_weight, "edw": edw,
+    }
+
+
+def scalar_flags(p):
+    flags = analyze_blood_pressure(p["pre_systolic"], p["pre_diastolic"], p["post_systolic"], p["post_diastolic"],
+                                   p["ages"], p["genders"], p["heights"])
+    flags.update(analyze_weight(p["pre_weight"], p["post_weight"], p["edw"], None))
+    return flags
+
+
+def batch(panel):
+    return analyze_notifications_batch(**{c: [p[c] for p in panel] for c in COLUMNS})
+
+
+@settings(max_examples=300)
+@given(st.lists(patients(), min_size=1, max_size=50))
+def test_batch_matches_scalar(panel):
+    flags = batch(panel)
+    for i, patient in enumerate(panel):
+        for name, expected in scalar_flags(patient).items():
+            assert bool(flags[name][i]) == expected, (name, patient)
+
+
+@given(st.lists(patients(), min_size=1, max_size=20), st.randoms())
+def test_batch_flags_do_not_depend_on_the_panel(panel, rng):
+    order = list(range(len(panel)))
+    rng.shuffle(order)
+    flags = batch(panel)
+    shuffled = batch([panel[i] for i in order])
+    for name in flags:
+        assert [bool(flags[name][i]) for i in order] == [bool(v) for v in shuffled[name]]
+
+
+@given(patients(), st.integers(0, 50))
+def test_higher_pressure_never_clears_high_or_sets_low(patient, rise):
+    raised = {**patient, **{k: patient[k] + rise for k in ("pre_systolic", "pre_diastolic",
+                                                            "post_systolic", "post_diastolic")}}
+    before, after = scalar_flags(patient), scalar_flags(raised)
+    assert after["highBloodPressure"] >= before["highBloodPressure"]
+    assert after["lowBloodPressure"] <= before["lowBloodPressure"]
+
+
+@given(st.floats(10, 120))
+def test_weight_at_edw_raises_nothing(edw):
+    assert not any(analyze_weight(edw, edw, edw, None).values())
+
+
+@given(patients())
+def test_batch_returns_every_flag(patient):
+    flags = batch([patient])
+    assert set(flags) == set(default_notifications())
+    assert not any(default_notifications().values())
+
+
+def _user(user_id, patient):
+    today = date.today()
+    return SimpleNamespace(id=user_id, sex=patient["genders"], height=patient["heights"],
+                           birth_date=date(today.year - max(patient["ages"], 0), 1, 1))
+
+
+def _snapshot(patient):
+    return SimpleNamespace(
+        pre_session_id=1, post_session_id=2, post_effluent_volume=None,
+        pre_systolic=patient["pre_systolic"], pre_diastolic=patient["pre_diastolic"],
+        post_systolic=patient["post_systolic"], post_diastolic=patient["post_diastolic"],
+        pre_weight=patient["pre_weight"], post_weight=patient["post_weight"], edw=patient["edw"],
+        updated_at=datetime(2026, 1, 1),
+    )
+
+
+@given(st.lists(patients(), min_size=1, max_size=20))
+def test_evaluate_batch_matches_single(panel):
+    users = [_user(i, p) for i, p in enumerate(panel)]
+    snapshots = {i: _snapshot(p) for i, p in enumerate(panel)}
+    # A patient without a snapshot, and one without a post session, get every flag off
+    users.append(_user(len(panel), panel[0]))
+    incomplete = _snapshot(panel[0])
+    incomplete.post_session_id = None
+    users.append(_user(len(panel) + 1, panel[0]))
+    snapshots[len(panel) + 1] = incomplete
+
+    results = evaluate_notifications_batch(users, snapshots)
+    for user in users:
+        snapshot = snapshots.get(user.id)
+        expected = default_notifications() if snapshot is None else evaluate_notifications(user, snapshot)
+        assert results[user.id] == expected
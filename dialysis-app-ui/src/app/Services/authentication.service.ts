@@ -4,6 +4,7 @@ import {Router} from '@angular/router';
 import {environment} from "../../environments/environment";
 import {UserCreate, UserResponse} from "../Models/users";
 import {lastValueFrom} from "rxjs";
+import {READ_TOKEN_KEY} from "../interceptors/read-token.interceptor";
 
 @Injectable({providedIn: 'root'})
 export class AuthService {
@@ -100,6 +101,7 @@ export class AuthService {
         localStorage.removeItem('refresh_token');
         localStorage.removeItem('user_role');
         localStorage.removeItem('user_id');
+        localStorage.removeItem(READ_TOKEN_KEY);
         this.router.navigate(['/login']);
     }
 
@@ -0,0 +1,35 @@
+import { HttpEvent, HttpInterceptorFn, HttpResponse } from '@angular/common/http';
+import { tap } from 'rxjs';
+import { environment } from '../../environments/environment';
+
+export const READ_TOKEN_HEADER = 'X-Read-Token';
+export const READ_TOKEN_KEY = 'read_token';
+
+/**
+ * Read-your-writes across the API's read replicas.
+ *
+ * After a write the API answers with an X-Read-Token header: the WAL
+ * position the next reads must see. The API's own read_token cookie is not
+ * sent cross-origin, so the token is kept here and echoed on every API
+ * request; the API then only serves reads from a replica that has caught
+ * up to it, and from the primary otherwise.
+ */
+export const readTokenInterceptor: HttpInterceptorFn = (req, next) => {
+  if (!req.url.startsWith(environment.apiUrl)) {
+    return next(req);
+  }
+
+  const readToken = localStorage.getItem(READ_TOKEN_KEY);
+  if (readToken && !req.headers.has(READ_TOKEN_HEADER)) {
+    req = req.clone({ setHeaders: { [READ_TOKEN_HEADER]: readToken } });
+  }
+
+  return next(req).pipe(
+    tap((event: HttpEvent<unknown>) => {
+      const issued = event instanceof HttpResponse ? event.headers.get(READ_TOKEN_HEADER) : null;
+      if (issued) {
+        localStorage.setItem(READ_TOKEN_KEY, issued);
+      }
+    })
+  );
+};
@@ -2,9 +2,10 @@ import { bootstrapApplication } from '@angular/platform-browser';
 import { appConfig } from './app/app.config';
 import { AppComponent } from './app/app.component';
 import { provideAnimations } from '@angular/platform-browser/animations';
-import { provideHttpClient, withInterceptorsFromDi} from "@angular/common/http";
+import { provideHttpClient, withInterceptors, withInterceptorsFromDi} from "@angular/common/http";
+import { readTokenInterceptor } from './app/interceptors/read-token.interceptor';
 
 bootstrapApplication(AppComponent, {
-  providers: [provideHttpClient(withInterceptorsFromDi()),
+  providers: [provideHttpClient(withInterceptorsFromDi(), withInterceptors([readTokenInterceptor])),
       provideAnimations(), ...appConfig.providers]
 }).catch(err => console.error(err));